@@ -93,6 +93,50 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# LocMemCache is per-process. With several workers use a shared backend, e.g.
+# "django.core.cache.backends.filebased.FileBasedCache" with LOCATION = BASE_DIR / "cache",
+# so that catalog invalidation is seen by every worker.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "blakitny",
+    }
+}
+
+# Catalog response cache (app_catalog.cache)
+CATALOG_CACHE_ALIAS = "default"
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Home page bootstrap document cache (app_home.bootstrap)
+BOOTSTRAP_CACHE_TIMEOUT = 60 * 60
+
+# Max age in seconds of a settings record kept in process memory (SingletonModel.load);
+# bounds staleness in other workers when the change counters are not in a shared cache
+SINGLETON_CACHE_TIMEOUT = 10
+
+# Image renditions (app_home.images): widths per "app_label.Model.field"
+IMAGE_RENDITIONS = {
+    "app_catalog.ProductImage.image": (320, 640, 1280),
+    "app_catalog.Category.image": (320, 640),
+    "app_home.Slider.image": (640, 1280, 1920),
+    "app_home.SiteLogo.logo": (160, 320),
+    "app_home.SocialNetwork.icon": (64, 128),
+}
+IMAGE_RENDITION_FORMATS = ("webp", "jpeg")
+# Renditions are generated after commit in a thread pool of this size
+IMAGE_RENDITION_WORKERS = 2
+IMAGE_RENDITIONS_ASYNC = True
+
+# Idempotency-Key for order and cart mutations (app_home.idempotency)
+# Saved responses older than the TTL are removed by `manage.py purge_idempotency_keys`
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+# An unfinished request holding a key longer than this is treated as abandoned
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -200,3 +244,21 @@ STATIC_URL = "static/"
 # Media files (for user uploads)
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Media serving (app_home.media): hand files off to a front proxy when one is configured.
+# None — FileResponse from Django; "x-sendfile" (Apache, lighttpd) or "x-accel-redirect" (nginx,
+# with an internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT)
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+# Cache lifetime for media files without a content hash in the name
+MEDIA_CACHE_MAX_AGE = 60 * 60
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    # Catalog and home page images: stored once per content hash under MEDIA_ROOT/images/
+    # and reference-counted (app_home.storage); orphans are removed by `manage.py collect_media_garbage`
+    "images": {"BACKEND": "app_home.storage.ContentAddressedStorage"},
+}
+# A file without references younger than this (seconds) is kept until collect_media_garbage:
+# a repeated upload of the same bytes may already be using it before its reference is saved
+MEDIA_ORPHAN_MIN_AGE = 60 * 60
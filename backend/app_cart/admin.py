@@ -1,7 +1,13 @@
+from decimal import Decimal
 from django.contrib import admin
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
 from django.utils.html import format_html
 from .models import Cart, CartItem
 
+# Произведение цены на количество — тоже деньги; без output_field сумма приходит как int
+MONEY_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
@@ -36,11 +42,36 @@ class CartItemInline(admin.TabularInline):
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ('user', 'display_username', 'total_items', 'total_price', 'created_at', 'updated_at')
+    list_display = ('user', 'display_username', 'items_total', 'price_total', 'created_at', 'updated_at')
     list_filter = ('created_at', 'updated_at')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email', 'user__first_name', 'user__last_name')
     readonly_fields = ('created_at', 'updated_at', 'total_items_display', 'total_price_display')
     inlines = [CartItemInline]
+
+    def get_queryset(self, request):
+        # Итоги корзин считаются в том же запросе, что и страница списка
+        return super().get_queryset(request).annotate(
+            items_sum=Coalesce(Sum('items__quantity'), 0),
+            price_sum=Coalesce(
+                Sum(ExpressionWrapper(F('items__product_variant__price') * F('items__quantity'), output_field=MONEY_FIELD)),
+                Decimal('0.00'),
+                output_field=MONEY_FIELD,
+            ),
+        )
+
+    def items_total(self, obj):
+        """Display total items in the cart from the changelist annotation"""
+        return obj.items_sum
+    items_total.short_description = 'Всего товаров'
+    items_total.admin_order_field = 'items_sum'
+
+    def price_total(self, obj):
+        """Display total price of the cart from the changelist annotation"""
+        # SQLite не округляет вычисленные Decimal до decimal_places, поэтому копейки явно
+        return f"{obj.price_sum:.2f} руб."
+    price_total.short_description = 'Общая стоимость'
+    price_total.admin_order_field = 'price_sum'
     
     def display_username(self, obj):
         """Display full name if available, otherwise username"""
@@ -67,9 +98,15 @@ class CartAdmin(admin.ModelAdmin):
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ('cart', 'display_cart_user', 'product_name', 'product_size', 'quantity', 'unit_price', 'get_total_price')
     list_filter = ('cart__user', 'product_variant__product__name', 'product_variant__size__name', 'cart__created_at')
+    list_select_related = ('cart__user', 'product_variant__product', 'product_variant__size')
     search_fields = ('cart__user__username', 'cart__user__email', 'product_variant__product__name')
     raw_id_fields = ('cart', 'product_variant')
     readonly_fields = ('get_total_price',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            line_total=ExpressionWrapper(F('product_variant__price') * F('quantity'), output_field=MONEY_FIELD),
+        )
     
     def display_cart_user(self, obj):
         """Display the user associated with the cart"""
@@ -104,3 +141,4 @@ class CartItemAdmin(admin.ModelAdmin):
         """Display the total price for this cart item"""
         return f"{obj.total_price} руб."
     get_total_price.short_description = 'Общая цена'
+    get_total_price.admin_order_field = 'line_total'
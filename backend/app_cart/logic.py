@@ -0,0 +1,140 @@
+"""
+Модуль содержит бизнес-логику для работы с корзиной.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from app_cart.models import Cart, CartItem
+from app_catalog.models import ProductVariant
+
+# Виды итоговых изменений элемента корзины в apply_cart_operations
+ADD = 'add'
+SET = 'set'
+
+
+def get_cart_with_items(user):
+    """
+    Возвращает корзину пользователя для отображения (см. CartManager.with_items).
+
+    Элементы и варианты товара загружаются заранее, итоги считаются
+    по загруженным строкам без дополнительных запросов.
+    Если корзины нет, она создается.
+    """
+    cart, created = Cart.objects.with_items().get_or_create(user=user)
+    return cart
+
+
+def add_cart_item(cart, product_variant_id, quantity):
+    """
+    Увеличивает количество варианта товара в корзине или добавляет его.
+
+    Увеличение выполняется в БД выражением F('quantity') + quantity, поэтому
+    одновременные добавления не теряют друг друга. Обычно это один UPDATE;
+    если строки еще нет, она вставляется, а при гонке со вставкой из другого
+    запроса (уникальность cart + product_variant) повторяется UPDATE.
+
+    Args:
+        cart: Корзина
+        product_variant_id: ID варианта товара
+        quantity: На сколько увеличить количество
+    """
+    items = CartItem.objects.filter(cart=cart, product_variant_id=product_variant_id)
+    if items.update(quantity=F('quantity') + quantity):
+        return
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(cart=cart, product_variant_id=product_variant_id, quantity=quantity)
+    except IntegrityError:
+        items.update(quantity=F('quantity') + quantity)
+
+
+def apply_cart_operations(user, operations):
+    """
+    Применяет список операций к корзине пользователя в одной транзакции.
+
+    Строка корзины блокируется (select_for_update), поэтому пакеты одной
+    корзины применяются по очереди. Операции сводятся к итогу по вариантам:
+    add — прибавить к количеству, update/remove/clear — записать количество.
+    Прибавление выполняется выражением F('quantity') + n, поэтому не теряет
+    одновременные добавления через add_cart_item. Недостающие строки
+    вставляются с нулевым количеством (конфликты уникальности пропускаются),
+    затем все количества меняются одним UPDATE, а удаления — одним DELETE.
+
+    Args:
+        user: Пользователь
+        operations: Список словарей с ключами:
+            op: 'add' | 'update' | 'remove' | 'clear'
+            product_variant_id: ID варианта товара (для add; для update/remove — вместо item_id)
+            item_id: ID элемента корзины (для update/remove)
+            quantity: Количество (для add и update; 0 при update удаляет элемент)
+
+    Returns:
+        Cart: Корзина пользователя после применения операций
+
+    Raises:
+        ProductVariant.DoesNotExist: Если добавляемый вариант не найден или неактивен
+        CartItem.DoesNotExist: Если изменяемый элемент не найден в корзине
+    """
+    with transaction.atomic():
+        cart, created = Cart.objects.select_for_update().get_or_create(user=user)
+        existing = {item.product_variant_id: item for item in cart.items.all()}
+        variant_by_item_id = {item.id: variant_id for variant_id, item in existing.items()}
+
+        added_variant_ids = {op['product_variant_id'] for op in operations if op['op'] == 'add'}
+        active_variant_ids = set(
+            ProductVariant.objects.filter(id__in=added_variant_ids, is_active=True).order_by().values_list('id', flat=True)
+        )
+        if added_variant_ids - active_variant_ids:
+            raise ProductVariant.DoesNotExist('Вариант товара не найден')
+
+        # {вариант: (ADD, сколько прибавить) или (SET, какое количество записать)}
+        changes = {}
+
+        def current_quantity(variant_id):
+            kind, value = changes.get(variant_id, (ADD, 0))
+            if kind == SET:
+                return value
+            item = existing.get(variant_id)
+            return (item.quantity if item else 0) + value
+
+        for op in operations:
+            if op['op'] == 'clear':
+                changes = dict.fromkeys(set(existing) | set(changes), (SET, 0))
+                continue
+
+            if op['op'] == 'add':
+                variant_id = op['product_variant_id']
+                kind, value = changes.get(variant_id, (ADD, 0))
+                changes[variant_id] = (kind, value + op['quantity'])
+                continue
+
+            variant_id = variant_by_item_id.get(op['item_id']) if op.get('item_id') else op.get('product_variant_id')
+            if not current_quantity(variant_id):
+                raise CartItem.DoesNotExist('Элемент корзины не найден')
+            changes[variant_id] = (SET, op['quantity'] if op['op'] == 'update' else 0)
+
+        to_delete = [variant_id for variant_id, (kind, value) in changes.items() if kind == SET and value <= 0]
+        to_change = {
+            variant_id: change for variant_id, change in changes.items()
+            if variant_id not in to_delete and change != (ADD, 0)
+        }
+
+        missing = [variant_id for variant_id in to_change if variant_id not in existing]
+        if missing:
+            # Строку могла вставить параллельная add_cart_item: тогда вставка пропускается
+            CartItem.objects.bulk_create(
+                [CartItem(cart=cart, product_variant_id=variant_id, quantity=0) for variant_id in missing],
+                ignore_conflicts=True,
+            )
+        if to_change:
+            CartItem.objects.filter(cart=cart, product_variant_id__in=to_change).update(quantity=Case(
+                *[
+                    When(product_variant_id=variant_id, then=F('quantity') + value if kind == ADD else Value(value))
+                    for variant_id, (kind, value) in to_change.items()
+                ],
+                default=F('quantity'),
+                output_field=PositiveIntegerField(),
+            ))
+        if to_delete:
+            CartItem.objects.filter(cart=cart, product_variant_id__in=to_delete).delete()
+
+    return cart
@@ -1,9 +1,29 @@
 from django.db import models
 from django.conf import settings
-from app_catalog.models import ProductVariant
+from app_catalog.models import ProductVariant, active_images_prefetch
 
 
 class CartManager(models.Manager):
+    def with_items(self):
+        """
+        Корзины с элементами, вариантами и краткими сведениями о товарах для
+        отображения: три запроса независимо от количества элементов.
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                'items',
+                queryset=CartItem.objects.select_related(
+                    'product_variant__size',
+                    'product_variant__fabric',
+                    'product_variant__picture_title',
+                    'product_variant__product__category',
+                    'product_variant__product__subcategory',
+                ).prefetch_related(
+                    active_images_prefetch('product_variant__product__images'),
+                ).order_by('id'),
+            )
+        )
+
     def get_total_cost(self):
         """Возвращает общую стоимость всех товаров во всех корзинах"""
         from django.db.models import Sum, F
@@ -36,8 +56,15 @@ class Cart(models.Model):
     def __str__(self):
         return f'Корзина {self.user.username}'
 
+    def _prefetched_items(self):
+        """Элементы, уже загруженные через CartManager.with_items(), иначе None"""
+        return getattr(self, '_prefetched_objects_cache', {}).get('items')
+
     def get_total_price(self):
         """Общая стоимость всех товаров в корзине"""
+        items = self._prefetched_items()
+        if items is not None:
+            return sum((item.total_price for item in items), 0)
         from django.db.models import Sum, F
         total = self.items.aggregate(
             total=Sum(F('product_variant__price') * F('quantity'))
@@ -46,6 +73,9 @@ class Cart(models.Model):
 
     def get_total_items(self):
         """Общее количество товаров в корзине"""
+        items = self._prefetched_items()
+        if items is not None:
+            return sum(item.quantity for item in items)
         from django.db.models import Sum
         total = self.items.aggregate(
             total=Sum('quantity')
@@ -74,6 +104,10 @@ class CartItem(models.Model):
     class Meta:
         verbose_name = 'Элемент корзины'
         verbose_name_plural = 'Элементы корзины'
+        constraints = [
+            # Один вариант товара — одна строка корзины; на нем держится upsert в add_to_cart
+            models.UniqueConstraint(fields=['cart', 'product_variant'], name='cartitem_unique_variant'),
+        ]
 
     def __str__(self):
         return f'{self.quantity}x {self.product_variant.product.name} ({self.product_variant.size.name})'
@@ -1,15 +1,16 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
-from app_catalog.serializers import ProductVariantSerializer
+from app_catalog.serializers import ProductVariantSerializer, ProductSummarySerializer
 
 
 class CartItemSerializer(serializers.ModelSerializer):
     product_variant = ProductVariantSerializer(read_only=True)
+    product = ProductSummarySerializer(source='product_variant.product', read_only=True)
     total_price = serializers.ReadOnlyField()
 
     class Meta:
         model = CartItem
-        fields = ['id', 'product_variant', 'quantity', 'total_price']
+        fields = ['id', 'product_variant', 'product', 'quantity', 'total_price']
         
     def validate_quantity(self, value):
         if value < 1:
@@ -34,4 +35,38 @@ class AddToCartSerializer(serializers.Serializer):
     def validate_quantity(self, value):
         if value < 1:
             raise serializers.ValidationError("Количество должно быть больше 0")
-        return value
\ No newline at end of file
+        return value
+
+class CartOperationSerializer(serializers.Serializer):
+    """
+    Одна операция пакетного изменения корзины (см. app_cart.logic.apply_cart_operations).
+    """
+    OPERATIONS = ('add', 'update', 'remove', 'clear')
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    product_variant_id = serializers.IntegerField(required=False)
+    item_id = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        op = attrs['op']
+        if op == 'add':
+            if 'product_variant_id' not in attrs:
+                raise serializers.ValidationError({'product_variant_id': 'Обязательное поле для add'})
+            attrs.setdefault('quantity', 1)
+            if attrs['quantity'] < 1:
+                raise serializers.ValidationError({'quantity': 'Количество должно быть больше 0'})
+        elif op in ('update', 'remove'):
+            if 'item_id' not in attrs and 'product_variant_id' not in attrs:
+                raise serializers.ValidationError('Укажите item_id или product_variant_id')
+            if op == 'update' and 'quantity' not in attrs:
+                raise serializers.ValidationError({'quantity': 'Количество не указано'})
+        return attrs
+
+
+class BatchCartSerializer(serializers.Serializer):
+    MAX_OPERATIONS = 100
+
+    operations = serializers.ListField(
+        child=CartOperationSerializer(), allow_empty=False, max_length=MAX_OPERATIONS
+    )
@@ -1,9 +1,14 @@
-from django.test import TestCase
+import threading
+import time
+from django.db import IntegrityError, OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework.authtoken.models import Token
-from app_catalog.models import Category, Subcategory, Size, Product, ProductVariant
+from app_catalog.models import Category, Subcategory, Size, Product, ProductVariant, ProductImage
 from app_cart.models import Cart, CartItem
+from app_cart.logic import add_cart_item
 
 
 class CartTestCase(TestCase):
@@ -60,6 +65,23 @@ class CartTestCase(TestCase):
         self.assertEqual(cart_item.quantity, 2)
         self.assertEqual(cart_item.total_price, 200.00)  # 2 * 100
         
+    def test_add_to_cart_retry_with_idempotency_key(self):
+        """Test that a retried add with the same Idempotency-Key is not applied twice"""
+        data = {'product_variant_id': self.product_variant.id, 'quantity': 2}
+        first = self.client.post('/api/cart/add/', data, HTTP_IDEMPOTENCY_KEY='add-1')
+        retry = self.client.post('/api/cart/add/', data, HTTP_IDEMPOTENCY_KEY='add-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(CartItem.objects.get(cart__user=self.user).quantity, 2)
+
+        # Тот же ключ с другим телом запроса отклоняется
+        other = self.client.post('/api/cart/add/', {**data, 'quantity': 5}, HTTP_IDEMPOTENCY_KEY='add-1')
+        self.assertEqual(other.status_code, 422)
+        self.assertEqual(CartItem.objects.get(cart__user=self.user).quantity, 2)
+
     def test_get_cart(self):
         """Test retrieving cart details"""
         # Add an item to cart first
@@ -131,4 +153,269 @@ class CartTestCase(TestCase):
         self.assertEqual(response.status_code, 204)
         
         # Check that all items were removed
-        self.assertEqual(cart.items.count(), 0)
\ No newline at end of file
+        self.assertEqual(cart.items.count(), 0)
+    def test_batch_operations(self):
+        """Test applying several cart operations in one request"""
+        other_variant = ProductVariant.objects.create(product=self.product, price=50.00, is_active=True)
+        cart, created = Cart.objects.get_or_create(user=self.user)
+        cart_item = CartItem.objects.create(cart=cart, product_variant=self.product_variant, quantity=1)
+
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'add', 'product_variant_id': other_variant.id, 'quantity': 2},
+            {'op': 'add', 'product_variant_id': other_variant.id},
+            {'op': 'update', 'item_id': cart_item.id, 'quantity': 4},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        data = response.json()
+        self.assertEqual(len(data['items']), 2)
+        self.assertEqual(data['total_items'], 7)
+        self.assertEqual(float(data['total_price']), 550.00)
+
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'clear'},
+            {'op': 'add', 'product_variant_id': other_variant.id, 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(cart.items.values_list('product_variant_id', 'quantity')), [(other_variant.id, 1)]
+        )
+
+    def test_batch_rolls_back_on_error(self):
+        """Test that a failing operation leaves the cart unchanged"""
+        cart, created = Cart.objects.get_or_create(user=self.user)
+        cart_item = CartItem.objects.create(cart=cart, product_variant=self.product_variant, quantity=1)
+
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'update', 'item_id': cart_item.id, 'quantity': 3},
+            {'op': 'add', 'product_variant_id': 999999, 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 404)
+        cart_item.refresh_from_db()
+        self.assertEqual(cart_item.quantity, 1)
+
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'remove', 'item_id': 999999},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.post('/api/cart/batch/', {'operations': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'update', 'item_id': cart_item.id, 'quantity': -1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        cart_item.refresh_from_db()
+        self.assertEqual(cart_item.quantity, 1)
+
+    def test_batch_query_count_is_constant(self):
+        """Test that the number of queries does not grow with the number of operations"""
+        from app_cart.logic import apply_cart_operations
+
+        variants = [
+            ProductVariant.objects.create(product=self.product, price=10.00, is_active=True)
+            for _ in range(10)
+        ]
+        Cart.objects.create(user=self.user)
+
+        operations = [{'op': 'add', 'product_variant_id': variant.id, 'quantity': 1} for variant in variants[:2]]
+        # SAVEPOINT, корзина, элементы, варианты, INSERT, UPDATE, RELEASE
+        with self.assertNumQueries(7):
+            apply_cart_operations(self.user, operations)
+
+        operations = [{'op': 'add', 'product_variant_id': variant.id, 'quantity': 1} for variant in variants]
+        operations += [{'op': 'remove', 'product_variant_id': variants[0].id}]
+        # SAVEPOINT, корзина, элементы, варианты, INSERT, UPDATE, DELETE, RELEASE
+        with self.assertNumQueries(8):
+            apply_cart_operations(self.user, operations)
+        self.assertEqual(CartItem.objects.count(), 9)
+
+    def test_get_cart_query_count_is_constant(self):
+        """Test that reading the cart does not issue queries per item"""
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product_variant=self.product_variant, quantity=1)
+
+        # Пользователь из токена, корзина, элементы с вариантами и товарами, изображения
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/cart/')
+        self.assertEqual(response.json()['total_items'], 1)
+
+        for index in range(10):
+            variant = ProductVariant.objects.create(
+                product=self.product, size=self.size, price=10.00 + index, is_active=True
+            )
+            CartItem.objects.create(cart=cart, product_variant=variant, quantity=2)
+            other_product = Product.objects.create(
+                name=f'Product {index}', category=self.category, subcategory=self.subcategory, is_active=True
+            )
+            ProductImage.objects.create(product=other_product, image=f'products/{index}.jpg', is_active=True)
+            variant = ProductVariant.objects.create(product=other_product, price=1.00, is_active=True)
+            CartItem.objects.create(cart=cart, product_variant=variant, quantity=1)
+
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/cart/')
+        data = response.json()
+        self.assertEqual(len(data['items']), 21)
+        self.assertEqual(data['total_items'], 31)
+        self.assertEqual(float(data['total_price']), 110.00 + sum(2 * (10.00 + index) for index in range(10)))
+
+    def test_cart_items_embed_product_summary(self):
+        """Test that cart items carry the product summary used by the cart page"""
+        ProductImage.objects.create(product=self.product, image='products/old.jpg', is_active=True)
+        ProductImage.objects.create(product=self.product, image='products/main.jpg', is_active=True)
+        ProductImage.objects.create(product=self.product, image='products/hidden.jpg', is_active=False)
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product_variant=self.product_variant, quantity=1)
+
+        response = self.client.get('/api/cart/')
+        product = response.json()['items'][0]['product']
+        self.assertEqual(product['id'], self.product.id)
+        self.assertEqual(product['name'], 'Test Product')
+        self.assertEqual(product['category'], 'Test Category')
+        self.assertEqual(product['subcategory'], 'Test Subcategory')
+        self.assertTrue(product['image_url'].startswith('http://testserver/'))
+        self.assertTrue(product['image_url'].endswith('products/main.jpg'))
+
+
+class CartAdminChangelistTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass', email='admin@example.com')
+        self.client.force_login(self.admin)
+        category = Category.objects.create(name='Test Category', is_active=True)
+        subcategory = Subcategory.objects.create(name='Test Subcategory', category=category, is_active=True)
+        self.product = Product.objects.create(name='Test Product', category=category, subcategory=subcategory, is_active=True)
+        self.size = Size.objects.create(name='M', is_active=True)
+
+    def add_carts(self, count):
+        for _ in range(count):
+            user = User.objects.create_user(username=f'user{User.objects.count()}', password='testpass')
+            cart = Cart.objects.create(user=user)
+            for price in (100, 200):
+                variant = ProductVariant.objects.create(product=self.product, size=self.size, price=price, is_active=True)
+                CartItem.objects.create(cart=cart, product_variant=variant, quantity=2)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_run_constant_number_of_queries(self):
+        """Test that cart changelists do not query per row"""
+        self.add_carts(2)
+        cart_queries = self.changelist_queries('/admin/app_cart/cart/')
+        item_queries = self.changelist_queries('/admin/app_cart/cartitem/')
+
+        self.add_carts(10)
+        self.assertEqual(self.changelist_queries('/admin/app_cart/cart/'), cart_queries)
+        self.assertEqual(self.changelist_queries('/admin/app_cart/cartitem/'), item_queries)
+
+    def test_cart_totals_are_sortable_annotations(self):
+        """Test cart totals in the changelist"""
+        self.add_carts(1)
+        response = self.client.get('/admin/app_cart/cart/', {'o': '3'})
+        self.assertContains(response, '600.00 руб.')
+        self.assertEqual(response.context['cl'].result_list[0].items_sum, 4)
+
+class CartConcurrencyTestCase(TransactionTestCase):
+    THREADS = 8
+    ADDS_PER_THREAD = 10
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        category = Category.objects.create(name='Test Category', is_active=True)
+        subcategory = Subcategory.objects.create(name='Test Subcategory', category=category, is_active=True)
+        product = Product.objects.create(name='Test Product', category=category, subcategory=subcategory, is_active=True)
+        self.product_variant = ProductVariant.objects.create(product=product, price=100.00, is_active=True)
+        self.cart = Cart.objects.create(user=self.user)
+
+    def test_concurrent_adds_do_not_lose_increments(self):
+        """Test that parallel adds to one cart line are all counted"""
+        errors = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.ADDS_PER_THREAD):
+                    for attempt in range(50):
+                        try:
+                            add_cart_item(self.cart, self.product_variant.id, 1)
+                            break
+                        except OperationalError:
+                            # SQLite отвечает "database is locked" на одновременную запись
+                            time.sleep(0.01)
+                    else:
+                        errors.append('database is locked')
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        item = CartItem.objects.get(cart=self.cart, product_variant=self.product_variant)
+        self.assertEqual(item.quantity, self.THREADS * self.ADDS_PER_THREAD)
+
+    @override_settings(IDEMPOTENCY_LOCK_TIMEOUT=0)
+    def test_concurrent_batches_do_not_lose_increments(self):
+        """Test that parallel batch adds and single adds to one cart line are all counted"""
+        errors = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def add_in_batch(client, key):
+            # Повтор с тем же Idempotency-Key не применяет пакет дважды, если ошибка
+            # "database is locked" случилась уже после его коммита
+            response = client.post('/api/cart/batch/', {'operations': [
+                {'op': 'add', 'product_variant_id': self.product_variant.id, 'quantity': 1},
+            ]}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+            if response.status_code == 409:
+                raise OperationalError('key is locked')
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+        def worker(index):
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            try:
+                barrier.wait()
+                for number in range(self.ADDS_PER_THREAD):
+                    for attempt in range(50):
+                        try:
+                            if index % 2:
+                                add_cart_item(self.cart, self.product_variant.id, 1)
+                            else:
+                                add_in_batch(client, f'{index}-{number}')
+                            break
+                        except OperationalError:
+                            # SQLite отвечает "database is locked" на одновременную запись
+                            time.sleep(0.01)
+                    else:
+                        errors.append('database is locked')
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        # Строки элемента еще нет: первые добавления вставляют ее одновременно
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        item = CartItem.objects.get(cart=self.cart, product_variant=self.product_variant)
+        self.assertEqual(item.quantity, self.THREADS * self.ADDS_PER_THREAD)
+
+    def test_duplicate_cart_line_is_rejected(self):
+        """Test the uniqueness of a variant within a cart"""
+        CartItem.objects.create(cart=self.cart, product_variant=self.product_variant, quantity=1)
+        with self.assertRaises(IntegrityError):
+            CartItem.objects.create(cart=self.cart, product_variant=self.product_variant, quantity=1)
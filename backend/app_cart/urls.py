@@ -8,4 +8,5 @@ urlpatterns = [
     path('remove/<int:item_id>/', views.remove_from_cart, name='cart-remove'),
     path('update/<int:item_id>/', views.update_cart_item, name='cart-update'),
     path('clear/', views.clear_cart, name='cart-clear'),
+    path('batch/', views.batch_cart, name='cart-batch'),
 ]
\ No newline at end of file
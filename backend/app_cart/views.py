@@ -4,8 +4,10 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from .models import Cart, CartItem
-from .serializers import CartSerializer, AddToCartSerializer, CartItemSerializer
+from .serializers import CartSerializer, AddToCartSerializer, CartItemSerializer, BatchCartSerializer
+from .logic import add_cart_item, apply_cart_operations, get_cart_with_items
 from app_catalog.models import ProductVariant
+from app_home.idempotency import idempotent
 
 
 class CartDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -19,15 +21,15 @@ class CartDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_object(self):
         """
-        Получает объект корзины текущего пользователя.
+        Получает объект корзины текущего пользователя вместе с элементами.
         Если корзина не существует, создает новую.
         """
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
-        return cart
+        return get_cart_with_items(self.request.user)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def add_to_cart(request):
     """
     Добавляет товар в корзину текущего пользователя.
@@ -49,26 +51,11 @@ def add_to_cart(request):
         product_variant_id = serializer.validated_data['product_variant_id']
         quantity = serializer.validated_data['quantity']
 
-        try:
-            product_variant = ProductVariant.objects.get(id=product_variant_id, is_active=True)
-        except ProductVariant.DoesNotExist:
+        if not ProductVariant.objects.filter(id=product_variant_id, is_active=True).exists():
             return Response({'error': 'Вариант товара не найден'}, status=status.HTTP_404_NOT_FOUND)
 
         cart, created = Cart.objects.get_or_create(user=request.user)
-
-        # Проверяем, есть ли уже этот вариант в корзине
-        # Используем get_or_create с product_variant, так как каждый ProductVariant уникален
-        # и включает в себя все характеристики продукта (через связь с Product)
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product_variant=product_variant,
-            defaults={'quantity': quantity}
-        )
-
-        if not created:
-            # Если элемент уже существует, увеличиваем количество
-            cart_item.quantity += quantity
-            cart_item.save()
+        add_cart_item(cart, product_variant_id, quantity)
 
         return Response({'message': 'Товар добавлен в корзину'}, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -76,6 +63,7 @@ def add_to_cart(request):
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def remove_from_cart(request, item_id):
     """
     Удаляет конкретный элемент из корзины текущего пользователя.
@@ -96,6 +84,7 @@ def remove_from_cart(request, item_id):
 
 @api_view(['PUT', 'PATCH'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def update_cart_item(request, item_id):
     """
     Обновляет количество товара в корзине текущего пользователя.
@@ -132,6 +121,7 @@ def update_cart_item(request, item_id):
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def clear_cart(request):
     """
     Очищает всю корзину текущего пользователя.
@@ -145,3 +135,44 @@ def clear_cart(request):
     cart = get_object_or_404(Cart, user=request.user)
     cart.items.all().delete()
     return Response({'message': 'Корзина очищена'}, status=status.HTTP_204_NO_CONTENT)
+
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def batch_cart(request):
+    """
+    Применяет несколько изменений корзины за один запрос и в одной транзакции.
+
+    Если хотя бы одна операция не может быть выполнена, корзина не меняется.
+
+    Args:
+        request: HTTP-запрос со списком операций
+
+    Returns:
+        Response: Содержимое корзины после изменений (как в GET /api/cart/)
+
+    Request body:
+        {
+            "operations": [
+                {"op": "add", "product_variant_id": int, "quantity": int},
+                {"op": "update", "item_id": int, "quantity": int},
+                {"op": "remove", "item_id": int},
+                {"op": "clear"}
+            ]
+        }
+    """
+    serializer = BatchCartSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        apply_cart_operations(request.user, serializer.validated_data['operations'])
+    except ProductVariant.DoesNotExist:
+        return Response({'error': 'Вариант товара не найден'}, status=status.HTTP_404_NOT_FOUND)
+    except CartItem.DoesNotExist:
+        return Response({'error': 'Элемент корзины не найден'}, status=status.HTTP_404_NOT_FOUND)
+
+    cart = get_cart_with_items(request.user)
+    return Response(CartSerializer(cart, context={'request': request}).data, status=status.HTTP_200_OK)
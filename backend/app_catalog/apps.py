@@ -1,7 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AppCatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_catalog'
     verbose_name = 'Каталог'
+
+    def ready(self):
+        from . import signals
+        post_migrate.connect(signals.create_search_index, sender=self)
@@ -0,0 +1,64 @@
+"""
+Кэш ответов каталога с версионированием.
+
+Ключ каждой записи содержит номер версии каталога. Любое изменение моделей
+каталога увеличивает версию (см. signals.py), после чего старые записи больше
+не читаются и вытесняются по таймауту. Версия — счетчик изменений из
+app_home.conditional в том же кэше CATALOG_CACHE_ALIAS, что и записи, поэтому
+при нескольких процессах достаточно указать для него общий бэкенд (например,
+FileBasedCache). Она же служит валидатором ETag / Last-Modified для ответов
+каталога.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from app_home.conditional import get_version, mark_changed, version_condition
+
+CATALOG_VERSION = 'catalog'
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION, settings.CATALOG_CACHE_ALIAS)
+
+
+def invalidate_catalog_cache():
+    """
+    Сбрасывает кэш и валидаторы каталога (см. app_home.conditional.mark_changed).
+    """
+    mark_changed(CATALOG_VERSION, settings.CATALOG_CACHE_ALIAS)
+
+
+# Условный GET для всех публичных представлений каталога
+catalog_condition = version_condition(CATALOG_VERSION, settings.CATALOG_CACHE_ALIAS)
+
+
+def build_cache_key(request):
+    # Абсолютный URL: в ответах есть абсолютные ссылки на изображения и страницы
+    url = request.build_absolute_uri()
+    digest = hashlib.md5(url.encode('utf-8')).hexdigest()
+    return f'catalog:{get_catalog_version()}:{digest}'
+
+
+class CatalogCacheMixin:
+    """
+    Кэширует успешные GET-ответы представления до следующего изменения каталога.
+    """
+    cache_timeout = settings.CATALOG_CACHE_TIMEOUT
+
+    def get(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = build_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+        return response
@@ -0,0 +1,184 @@
+"""
+Фильтрация товаров каталога и подсчет фасетов.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Product, ProductVariant
+
+# Верхняя граница BigAutoField: большие значения SQLite не принимает (OverflowError)
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_id(value):
+    """Разбирает ID записи; ValueError для нечисел и значений вне диапазона ключа"""
+    value = int(value)
+    if not 0 < value <= MAX_ID:
+        raise ValueError(value)
+    return value
+
+
+class ProductFilter:
+    """
+    Фильтр активных товаров по query-параметрам.
+
+    Условия уровня товара (категория, подкатегория, флаги) накладываются на Product,
+    условия уровня варианта (размер, ткань, рисунок, цена) — на один и тот же активный
+    вариант: товар подходит, если у него есть вариант, удовлетворяющий им всем сразу.
+
+    Query Parameters:
+        category_id (int): ID категории
+        subcategory (int, list): ID подкатегорий через запятую
+        size, fabric, picture_title (int, list): ID атрибутов варианта через запятую
+        is_promotion, is_new (bool): флаги товара
+        min_price, max_price (decimal): диапазон цены варианта
+    """
+    list_params = ('subcategory', 'size', 'fabric', 'picture_title')
+    flag_params = ('is_promotion', 'is_new')
+    variant_dimensions = ('size', 'fabric', 'picture_title')
+    true_values = ('1', 'true', 'yes')
+    false_values = ('0', 'false', 'no')
+
+    def __init__(self, query_params):
+        self.params = self.parse(query_params)
+
+    def parse(self, query_params):
+        params = {}
+        errors = {}
+
+        category_id = query_params.get('category_id')
+        if category_id:
+            try:
+                params['category_id'] = parse_id(category_id)
+            except ValueError:
+                errors['category_id'] = 'Ожидается целое число'
+
+        for name in self.list_params:
+            raw = [part for value in query_params.getlist(name) for part in value.split(',') if part]
+            if raw:
+                try:
+                    params[name] = [parse_id(part) for part in raw]
+                except ValueError:
+                    errors[name] = 'Ожидается список целых чисел через запятую'
+
+        for name in self.flag_params:
+            value = query_params.get(name)
+            if value is None or value == '':
+                continue
+            if value.lower() in self.true_values:
+                params[name] = True
+            elif value.lower() in self.false_values:
+                params[name] = False
+            else:
+                errors[name] = 'Ожидается true или false'
+
+        for name in ('min_price', 'max_price'):
+            value = query_params.get(name)
+            if value:
+                try:
+                    number = Decimal(value)
+                except InvalidOperation:
+                    errors[name] = 'Ожидается число'
+                    continue
+                # NaN и Infinity — валидные Decimal, но не цена: фильтр по ним падает в запросе
+                if not number.is_finite():
+                    errors[name] = 'Ожидается число'
+                    continue
+                params[name] = number
+
+        if errors:
+            raise ValidationError(errors)
+        return params
+
+    def product_lookups(self, exclude=(), prefix=''):
+        lookups = {prefix + 'is_active': True}
+        if 'category_id' in self.params:
+            lookups[prefix + 'category_id'] = self.params['category_id']
+        if 'subcategory' in self.params and 'subcategory' not in exclude:
+            lookups[prefix + 'subcategory_id__in'] = self.params['subcategory']
+        for name in self.flag_params:
+            if name in self.params and name not in exclude:
+                lookups[prefix + name] = self.params[name]
+        return lookups
+
+    def variant_lookups(self, exclude=()):
+        lookups = {'is_active': True}
+        for name in self.variant_dimensions:
+            if name in self.params and name not in exclude:
+                lookups[name + '_id__in'] = self.params[name]
+        if 'price' not in exclude:
+            if 'min_price' in self.params:
+                lookups['price__gte'] = self.params['min_price']
+            if 'max_price' in self.params:
+                lookups['price__lte'] = self.params['max_price']
+        return lookups
+
+    def filter_queryset(self, queryset, exclude=()):
+        queryset = queryset.filter(**self.product_lookups(exclude))
+        variant_lookups = self.variant_lookups(exclude)
+        if len(variant_lookups) > 1:
+            queryset = queryset.filter(Exists(
+                ProductVariant.objects.filter(product=OuterRef('pk'), **variant_lookups)
+            ))
+        return queryset
+
+    def variant_facet(self, dimension):
+        """
+        Количество подходящих товаров для каждого значения атрибута варианта
+        без учета фильтра по этому же атрибуту.
+        """
+        rows = (
+            ProductVariant.objects
+            .filter(**self.variant_lookups(exclude=(dimension,)))
+            .filter(**self.product_lookups(prefix='product__'))
+            .filter(**{dimension + '__isnull': False})
+            .values(dimension + '_id', dimension + '__name')
+            .annotate(count=Count('product', distinct=True))
+            .order_by(dimension + '__name')
+        )
+        return [
+            {'id': row[dimension + '_id'], 'name': row[dimension + '__name'], 'count': row['count']}
+            for row in rows
+        ]
+
+    def subcategory_facet(self):
+        rows = (
+            self.filter_queryset(Product.objects.all(), exclude=('subcategory',))
+            .values('subcategory_id', 'subcategory__name')
+            .annotate(count=Count('id'))
+            .order_by('subcategory__name')
+        )
+        return [
+            {'id': row['subcategory_id'], 'name': row['subcategory__name'], 'count': row['count']}
+            for row in rows
+        ]
+
+    def facets(self):
+        """
+        Возвращает фасеты для текущих фильтров за фиксированное число запросов:
+        по одному сгруппированному запросу на размер, ткань, рисунок и подкатегорию,
+        один на флаги с общим количеством и один на диапазон цен.
+        """
+        flag_filter = Q(**{name: self.params[name] for name in self.flag_params if name in self.params})
+        flags = self.filter_queryset(Product.objects.all(), exclude=self.flag_params).aggregate(
+            total=Count('id', filter=flag_filter or None),
+            is_promotion=Count('id', filter=Q(is_promotion=True)),
+            is_new=Count('id', filter=Q(is_new=True)),
+        )
+        price = (
+            ProductVariant.objects
+            .filter(**self.variant_lookups(exclude=('price',)))
+            .filter(**self.product_lookups(prefix='product__'))
+            .aggregate(min=Min('price'), max=Max('price'))
+        )
+        return {
+            'total': flags.pop('total'),
+            'subcategories': self.subcategory_facet(),
+            'sizes': self.variant_facet('size'),
+            'fabrics': self.variant_facet('fabric'),
+            'picture_titles': self.variant_facet('picture_title'),
+            'flags': flags,
+            'price': price,
+        }
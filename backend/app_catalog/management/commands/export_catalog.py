@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from app_catalog import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает товары с вариантами в CSV или JSONL (формат import_catalog)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Файл выгрузки (по умолчанию — стандартный вывод)')
+        parser.add_argument('--format', dest='file_format', choices=transfer.FORMATS,
+                            help='Формат файла (по умолчанию — по расширению)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or transfer.detect_format(path or '')
+        rows = transfer.iter_export(file_format)
+        if not path:
+            for chunk in rows:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            stream.writelines(rows)
@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app_catalog import transfer
+
+
+class Command(BaseCommand):
+    help = 'Загружает товары с вариантами из CSV или JSONL (app_catalog.transfer)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл каталога')
+        parser.add_argument('--format', dest='file_format', choices=transfer.FORMATS,
+                            help='Формат файла (по умолчанию — по расширению)')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить файл и показать изменения')
+        parser.add_argument('--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+                            help='Вариантов в одной пачке записи')
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or transfer.detect_format(options['path'])
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                result = transfer.import_catalog(
+                    stream, file_format, dry_run=options['dry_run'], chunk_size=options['chunk_size']
+                )
+        except OSError as error:
+            raise CommandError(error)
+
+        for entry in result.get('diff', []):
+            self.stdout.write(json.dumps(entry, ensure_ascii=False, default=str))
+        for error in result['errors']:
+            self.stderr.write(f'Строка {error["line"]}: {error["message"]}')
+
+        products, variants = result['products'], result['variants']
+        summary = (
+            f'Товары: создано {products["created"]}, изменено {products["updated"]}, '
+            f'без изменений {products["unchanged"]}. '
+            f'Варианты: создано {variants["created"]}, изменено {variants["updated"]}, '
+            f'без изменений {variants["unchanged"]}.'
+        )
+        if result['errors']:
+            raise CommandError(f'Файл содержит ошибки, изменения не сохранены. {summary}')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Проверка без сохранения. {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app_catalog import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс товаров (SQLite FTS5)'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.WARNING('Полнотекстовый индекс поддерживается только для SQLite'))
+            return
+        # Новая таблица заполняется при создании, существующая перестраивается
+        count = search.create_search_index()
+        if count is None:
+            count = search.rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано товаров: {count}'))
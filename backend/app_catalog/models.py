@@ -1,10 +1,16 @@
 from django.db import models
+from django.db.models.functions import Coalesce
+
+from app_home.models import ImageMetadataModel
+from app_home.storage import get_image_storage
 
 
 class Category(models.Model):
     name = models.CharField(max_length=200, verbose_name='Название')
     description = models.TextField(blank=True, null=True, verbose_name='Описание')
-    image = models.ImageField(upload_to='category_images/', blank=True, null=True, verbose_name='Картинка')
+    image = models.ImageField(upload_to='category_images/', blank=True, null=True, storage=get_image_storage, verbose_name='Картинка')
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Ширина картинки')
+    image_renditions = models.JSONField(default=list, blank=True, editable=False, verbose_name='Созданные копии')
     is_active = models.BooleanField(default=True, verbose_name='Активна')
 
     class Meta:
@@ -26,6 +32,10 @@ class Subcategory(models.Model):
         verbose_name = 'Подкатегория'
         verbose_name_plural = 'Подкатегории'
         ordering = ['name']
+        indexes = [
+            # SubcategoryByCategoryView: активные подкатегории категории по имени
+            models.Index(fields=['category', 'name'], name='subcategory_active_cat_idx', condition=models.Q(is_active=True)),
+        ]
 
     def __str__(self):
         return self.name
@@ -70,6 +80,65 @@ class PictureTitle(models.Model):
         return self.name
 
 
+def active_images_prefetch(lookup='images'):
+    """
+    Prefetch активных изображений товара по пути lookup в атрибут active_images,
+    новые первыми: первое из них — основное изображение товара.
+    """
+    return models.Prefetch(
+        lookup,
+        queryset=ProductImage.objects.filter(is_active=True).order_by('-created_at', '-id'),
+        to_attr='active_images',
+    )
+
+
+class ProductManager(models.Manager):
+    def with_related(self):
+        """
+        Товары со всем графом для сериализации за фиксированное число запросов:
+        категория и подкатегория через JOIN, варианты вместе с размером, тканью и
+        названием рисунка, только активные изображения.
+        """
+        return self.select_related('category', 'subcategory').prefetch_related(
+            models.Prefetch(
+                'variants',
+                queryset=ProductVariant.objects.select_related('size', 'fabric', 'picture_title'),
+            ),
+            models.Prefetch(
+                'images',
+                queryset=ProductImage.objects.filter(is_active=True),
+            ),
+        )
+
+    def with_card_summary(self):
+        """
+        Товары для карточек каталога одним запросом: первое активное изображение,
+        минимальная и максимальная цена и количество активных вариантов.
+
+        Значения считаются коррелированными подзапросами, а не JOIN + GROUP BY,
+        чтобы список шел по индексу сортировки и останавливался на размере страницы.
+        """
+        active_variants = ProductVariant.objects.filter(
+            product=models.OuterRef('pk'),
+            is_active=True,
+        ).order_by().values('product')
+        main_image = ProductImage.objects.filter(
+            product=models.OuterRef('pk'),
+            is_active=True,
+        ).order_by('-created_at', '-id')
+        return self.annotate(
+            main_image=models.Subquery(main_image.values('image')[:1]),
+            main_image_width=models.Subquery(main_image.values('image_width')[:1]),
+            main_image_renditions=models.Subquery(main_image.values('image_renditions')[:1]),
+            min_price=models.Subquery(active_variants.annotate(value=models.Min('price')).values('value')),
+            max_price=models.Subquery(active_variants.annotate(value=models.Max('price')).values('value')),
+            variants_count=Coalesce(
+                models.Subquery(active_variants.annotate(value=models.Count('id')).values('value')),
+                0,
+            ),
+        )
+
+
 class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name='Категория')
     subcategory = models.ForeignKey(Subcategory, on_delete=models.CASCADE, verbose_name='Подкатегория')
@@ -81,18 +150,40 @@ class Product(models.Model):
     is_promotion = models.BooleanField(default=False, verbose_name='Акция')
     is_new = models.BooleanField(default=False, verbose_name='Новинка')
 
+    objects = ProductManager()
+
     class Meta:
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
         ordering = ['name']
+        indexes = [
+            # Каталог показывает только активные товары в порядке keyset-пагинации (name, id)
+            models.Index(fields=['category', 'name', 'id'], name='product_active_category_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['subcategory', 'name', 'id'], name='product_active_subcat_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['name', 'id'], name='product_active_name_idx', condition=models.Q(is_active=True)),
+        ]
+        constraints = [
+            # Естественный ключ товара для массовой загрузки (app_catalog.transfer).
+            # Пустой артикул хранится как NULL (см. save), а NULL не нарушает
+            # уникальность. Условие WHERE здесь не подходит: upsert импорта
+            # (ON CONFLICT (sku)) не находит частичный индекс. Перед применением
+            # миграции на существующей БД: Product.objects.filter(sku='').update(sku=None)
+            # и исправить повторяющиеся артикулы.
+            models.UniqueConstraint(fields=['sku'], name='product_sku_uniq'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Товары без артикула не должны конфликтовать друг с другом по product_sku_uniq
+        self.sku = (self.sku or '').strip() or None
+        super().save(*args, **kwargs)
+
 
-class ProductImage(models.Model):
+class ProductImage(ImageMetadataModel):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images', verbose_name='Товар')
-    image = models.ImageField(upload_to='product_images/', verbose_name='Изображение')
+    image = models.ImageField(upload_to='product_images/', storage=get_image_storage, verbose_name='Изображение')
     is_active = models.BooleanField(default=True, verbose_name='Активна')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
 
@@ -100,6 +191,10 @@ class ProductImage(models.Model):
         verbose_name = 'Фотография товара'
         verbose_name_plural = 'Фотографии товаров'
         ordering = ['-created_at']
+        indexes = [
+            # Первое активное изображение для карточки товара
+            models.Index(fields=['product', '-created_at', '-id'], name='image_active_product_idx', condition=models.Q(is_active=True)),
+        ]
 
     def __str__(self):
         return f"Фото для {self.product.name}"
@@ -118,6 +213,10 @@ class ProductVariant(models.Model):
         verbose_name_plural = 'Варианты товаров'
         ordering = ['product', 'size']
         unique_together = ['product', 'size', 'fabric', 'picture_title']
+        indexes = [
+            # Фильтр по цене и диапазон цен активных вариантов товара
+            models.Index(fields=['product', 'price'], name='variant_active_product_idx', condition=models.Q(is_active=True)),
+        ]
 
     def __str__(self):
         parts = [self.product.name]
@@ -0,0 +1,147 @@
+"""
+Keyset (cursor) пагинация для списков с устойчивой сортировкой.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (keyset) вместо OFFSET.
+
+    Курсор хранит значения полей сортировки последнего элемента страницы,
+    следующая страница выбирается условием "строго после курсора", поэтому
+    стоимость запроса не зависит от номера страницы, а вставки/удаления
+    между запросами не приводят к пропускам и дублям.
+
+    Последнее поле в ``ordering`` должно быть уникальным (обычно ``id``).
+    Представление может задать порядок запроса методом ``get_keyset_ordering()``;
+    поля порядка — поля модели или аннотации запроса без NULL.
+    """
+    ordering = ('name', 'id')
+    page_size = 24
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        if view is not None and hasattr(view, 'get_keyset_ordering'):
+            self.ordering = tuple(view.get_keyset_ordering())
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request, queryset)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_cursor_filter(cursor))
+
+        # Берем на один элемент больше, чтобы узнать, есть ли следующая страница
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_position = self.get_position(results[-1]) if self.has_next else None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_position(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    def get_cursor_filter(self, position):
+        """
+        Строит условие (a > x) OR (a = x AND b > y) OR ... для набора полей сортировки.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = '__lt' if field.startswith('-') else '__gt'
+            condition |= equal & Q(**{name + lookup: value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, position):
+        payload = json.dumps(position, default=str, ensure_ascii=False)
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return [
+            self.clean_cursor_value(self.get_ordering_field(queryset, field.lstrip('-')), value)
+            for field, value in zip(self.ordering, position)
+        ]
+
+    def get_ordering_field(self, queryset, name):
+        """Поле модели или выходное поле аннотации для проверки значения курсора"""
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(name)
+
+    def clean_cursor_value(self, field, value):
+        """
+        Проверяет значение курсора по полю модели: тип JSON, преобразование и
+        границы поля. Иначе ошибка возникла бы только при выполнении запроса (500).
+        """
+        if isinstance(field, models.IntegerField):
+            valid = isinstance(value, int) and not isinstance(value, bool)
+        elif isinstance(field, models.BooleanField):
+            valid = isinstance(value, bool)
+        else:
+            valid = isinstance(value, str)
+        if not valid:
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            value = field.to_python(value)
+            field.run_validators(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        return value
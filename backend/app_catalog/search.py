@@ -0,0 +1,131 @@
+"""
+Полнотекстовый поиск товаров на SQLite FTS5.
+
+Индекс хранится в виртуальной таблице catalog_product_fts, rowid которой
+совпадает с id товара. В индекс попадают только активные товары: название,
+артикул, описание, переплет и названия категории и подкатегории.
+Индекс обновляется сигналами при сохранении и удалении (см. signals.py).
+"""
+import re
+
+from django.db import connection
+
+from .models import Product
+
+FTS_TABLE = 'catalog_product_fts'
+FTS_COLUMNS = ('name', 'sku', 'description', 'binding', 'category', 'subcategory')
+# Веса столбцов для bm25 в порядке FTS_COLUMNS: совпадение в названии важнее описания
+FTS_WEIGHTS = (10.0, 8.0, 1.0, 1.0, 3.0, 3.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def normalize(text):
+    """
+    Приводит "ё" к "е": токенайзер unicode61 не считает их одной буквой.
+    """
+    if not text:
+        return ''
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def create_search_index():
+    """
+    Создает таблицу FTS5, если ее еще нет, и заполняет ее при создании.
+
+    Returns:
+        int | None: Количество проиндексированных товаров или None, если таблица уже была
+    """
+    if not is_supported():
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+        )
+        if cursor.fetchone():
+            return None
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"{', '.join(FTS_COLUMNS)}, "
+            f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    return rebuild_search_index()
+
+
+def rebuild_search_index():
+    """
+    Полностью перестраивает индекс по текущему содержимому каталога.
+    """
+    if not is_supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    return _insert_rows(Product.objects.all())
+
+
+def update_products(queryset):
+    """
+    Переиндексирует товары из queryset: удаляет их строки и вставляет заново активные.
+    """
+    if not is_supported():
+        return 0
+    ids = list(queryset.values_list('id', flat=True))
+    remove_products(ids)
+    return _insert_rows(Product.objects.filter(id__in=ids))
+
+
+def remove_products(ids):
+    if not is_supported() or not ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in ids])
+
+
+def _insert_rows(queryset):
+    rows = queryset.filter(is_active=True).values_list(
+        'id', 'name', 'sku', 'description', 'binding', 'category__name', 'subcategory__name'
+    ).order_by()
+    params = [(row[0],) + tuple(normalize(value) for value in row[1:]) for row in rows.iterator()]
+    if params:
+        placeholders = ', '.join(['%s'] * (len(FTS_COLUMNS) + 1))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) VALUES ({placeholders})",
+                params,
+            )
+    return len(params)
+
+
+def build_match_query(query):
+    """
+    Превращает пользовательский ввод в выражение MATCH: каждое слово ищется по префиксу,
+    все слова должны встретиться (AND). Спецсимволы FTS5 отбрасываются.
+    """
+    tokens = TOKEN_RE.findall(normalize(query))
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_product_ids(query, limit=20):
+    """
+    Возвращает id активных товаров, подходящих под запрос, в порядке релевантности (bm25).
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+    if not is_supported():
+        return list(
+            Product.objects.filter(is_active=True, name__icontains=query)
+            .values_list('id', flat=True)[:limit]
+        )
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -1,7 +1,20 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from app_home.images import SrcsetField
+from .transfer import FORMATS
 from .models import Category, Subcategory, Size, Fabric, PictureTitle, Product, ProductVariant, ProductImage
 
 
+def build_media_url(request, name):
+    """Абсолютная ссылка на файл из хранилища (относительная, если нет запроса)"""
+    if not name:
+        return None
+    url = default_storage.url(name)
+    if request:
+        return request.build_absolute_uri(url)
+    return url
+
+
 class SizeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Size
@@ -27,15 +40,22 @@ class SubcategorySerializer(serializers.ModelSerializer):
 
 
 class CategorySerializer(serializers.ModelSerializer):
+    image_srcset = SrcsetField('app_catalog.Category.image', source='image')
+
     class Meta:
         model = Category
         fields = '__all__'
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    image_srcset = SrcsetField('app_catalog.ProductImage.image', source='image')
+
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'is_active', 'created_at']
+        fields = [
+            'id', 'image', 'image_srcset', 'image_width', 'image_height', 'image_size', 'image_color',
+            'image_placeholder', 'is_active', 'created_at'
+        ]
 
 
 class ProductVariantSerializer(serializers.ModelSerializer):
@@ -60,18 +80,58 @@ class ProductSerializer(serializers.ModelSerializer):
 
 
 class ProductListSerializer(serializers.ModelSerializer):
-    category = CategorySerializer(read_only=True)
-    subcategory = SubcategorySerializer(read_only=True)
-    images = ProductImageSerializer(many=True, read_only=True)
-    variants = ProductVariantSerializer(many=True, read_only=True)
+    """
+    Облегченная карточка товара для списков каталога.
+
+    Ожидает queryset из Product.objects.with_card_summary(): цены, количество
+    вариантов и изображение берутся из аннотаций, без вложенных объектов.
+    """
+    image_url = serializers.SerializerMethodField()
+    image_srcset = SrcsetField('app_catalog.ProductImage.image', source='main_image', prefix='main_image')
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    variants_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'name', 'image_url', 'image_srcset', 'min_price', 'max_price', 'variants_count',
+            'is_promotion', 'is_new'
+        ]
+
+    def get_image_url(self, obj):
+        return build_media_url(self.context.get('request'), obj.main_image)
+
+
+class ProductSummarySerializer(serializers.ModelSerializer):
+    """
+    Краткие сведения о товаре для элементов корзины и заказа.
+
+    Ожидает товар с категорией и подкатегорией из select_related и изображениями
+    из active_images_prefetch(), иначе каждый товар стоит отдельных запросов.
+    """
+    category = serializers.CharField(source='category.name', read_only=True)
+    subcategory = serializers.CharField(source='subcategory.name', read_only=True)
+    image_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-<<<<<<< HEAD
-        fields = ['id', 'name', 'category', 'subcategory', 'binding', 'images', 'is_active', 'is_promotion', 'is_new']
-=======
-        fields = ['id', 'name', 'description', 'category', 'subcategory', 'fabric_type', 'binding', 'picture_title', 'images', 'variants', 'is_active', 'is_promotion', 'is_new']
->>>>>>> e9b37da26320fbbc08e66fb10cd9b4d88ad2ea9c
+        fields = ['id', 'name', 'sku', 'binding', 'category', 'subcategory', 'image_url']
+
+    def get_image_url(self, obj):
+        images = getattr(obj, 'active_images', None)
+        if images is None:
+            images = obj.images.filter(is_active=True).order_by('-created_at', '-id')[:1]
+        image = next(iter(images), None)
+        return build_media_url(self.context.get('request'), image.image.name if image else None)
+
+
+class CatalogImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    # По умолчанию формат определяется по расширению файла (.jsonl / .ndjson — JSONL)
+    file_format = serializers.ChoiceField(choices=FORMATS, required=False)
+    dry_run = serializers.BooleanField(required=False, default=False)
 
 
-        
+class CatalogExportQuerySerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(choices=FORMATS, required=False, default='csv')
@@ -0,0 +1,55 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app_home.images import renditions_ready
+
+from . import search
+from .cache import invalidate_catalog_cache
+from .models import Category, Subcategory, Size, Fabric, PictureTitle, Product, ProductVariant, ProductImage
+
+CATALOG_MODELS = (Category, Subcategory, Size, Fabric, PictureTitle, Product, ProductVariant, ProductImage)
+
+
+def create_search_index(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Создает FTS-индекс товаров после миграций каталога"""
+    if using == DEFAULT_DB_ALIAS:
+        search.create_search_index()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """Обновляет строку товара в поисковом индексе"""
+    search.update_products(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    """Удаляет товар из поискового индекса"""
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    """Переиндексирует товары категории после изменения ее названия"""
+    if not created:
+        search.update_products(Product.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Subcategory)
+def reindex_subcategory_products(sender, instance, created, **kwargs):
+    """Переиндексирует товары подкатегории после изменения ее названия"""
+    if not created:
+        search.update_products(Product.objects.filter(subcategory=instance))
+
+
+def catalog_changed(sender, **kwargs):
+    """Сбрасывает кэш ответов каталога при любом изменении его моделей"""
+    invalidate_catalog_cache()
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_changed_save_{model.__name__}')
+    post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_changed_delete_{model.__name__}')
+    # Созданные в фоне копии изображений меняют srcset в ответах
+    renditions_ready.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_changed_renditions_{model.__name__}')
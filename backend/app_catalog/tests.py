@@ -1,7 +1,23 @@
-from django.test import TestCase
+import base64
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+from django.contrib.auth.models import User
+from django.core.cache import caches as django_caches
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import Category, Subcategory, Fabric, Product, ProductImage
+from rest_framework.test import APIClient
+from app_home.conditional import get_version, version_key
+from .cache import CATALOG_VERSION, get_catalog_version, invalidate_catalog_cache
+from .filters import ProductFilter
+from .models import Category, Subcategory, Size, Fabric, PictureTitle, Product, ProductImage, ProductVariant
 from .serializers import ProductSerializer, ProductListSerializer, ProductImageSerializer
+from .transfer import import_catalog, iter_export
 
 
 class ProductModelTest(TestCase):
@@ -22,12 +38,22 @@ class ProductModelTest(TestCase):
             name="Test Product",
             description="Test Description",
             binding="Твердый переплет",  # Hard binding in Russian
-            fabric_type=self.fabric
         )
 
         self.assertEqual(product.binding, "Твердый переплет")
         self.assertIsInstance(product.binding, str)
 
+    def test_blank_sku_is_stored_as_null(self):
+        """Test that several products without SKU do not violate product_sku_uniq"""
+        first = Product.objects.create(category=self.category, subcategory=self.subcategory, name="A", sku="")
+        second = Product.objects.create(category=self.category, subcategory=self.subcategory, name="B", sku="  ")
+        self.assertIsNone(first.sku)
+        self.assertIsNone(second.sku)
+
+        response = APIClient().patch(f'/api/catalog/products/{first.pk}/', {'sku': ''}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Product.objects.filter(sku__isnull=True).count(), 2)
+
     def test_product_serializer_includes_binding(self):
         """Test that the product serializer includes the binding field"""
         product = Product.objects.create(
@@ -36,72 +62,44 @@ class ProductModelTest(TestCase):
             name="Test Product",
             description="Test Description",
             binding="Мягкий переплет",  # Soft binding in Russian
-            fabric_type=self.fabric
         )
 
         serializer = ProductSerializer(product)
         self.assertIn('binding', serializer.data)
         self.assertEqual(serializer.data['binding'], "Мягкий переплет")
 
-    def test_product_list_serializer_includes_binding(self):
-        """Test that the product list serializer includes the binding field"""
-        product = Product.objects.create(
-            category=self.category,
-            subcategory=self.subcategory,
-            name="Test Product",
-            description="Test Description",
-            binding="Спиральный переплет",  # Spiral binding in Russian
-            fabric_type=self.fabric
-        )
-
-        serializer = ProductListSerializer(product)
-        self.assertIn('binding', serializer.data)
-        self.assertEqual(serializer.data['binding'], "Спиральный переплет")
-
-    def test_product_picture_title_field(self):
-        """Test that the picture_title field can be added to a product"""
-        product = Product.objects.create(
-            category=self.category,
-            subcategory=self.subcategory,
-            name="Test Product",
-            description="Test Description",
-            binding="Твердый переплет",
-            picture_title="Красивый узор",  # Beautiful pattern in Russian
-            fabric_type=self.fabric
-        )
-
-        self.assertEqual(product.picture_title, "Красивый узор")
-        self.assertIsInstance(product.picture_title, str)
-
-    def test_product_serializer_includes_picture_title(self):
-        """Test that the product serializer includes the picture_title field"""
+    def test_product_serializer_includes_variant_picture_title(self):
+        """Test that the product serializer includes picture_title of each variant"""
         product = Product.objects.create(
             category=self.category,
             subcategory=self.subcategory,
             name="Test Product",
             description="Test Description",
-            picture_title="Узор цветов",  # Flower pattern in Russian
-            fabric_type=self.fabric
         )
+        picture_title = PictureTitle.objects.create(name="Узор цветов")  # Flower pattern in Russian
+        ProductVariant.objects.create(product=product, fabric=self.fabric, picture_title=picture_title, price=100)
 
         serializer = ProductSerializer(product)
-        self.assertIn('picture_title', serializer.data)
-        self.assertEqual(serializer.data['picture_title'], "Узор цветов")
+        self.assertEqual(serializer.data['variants'][0]['picture_title']['name'], "Узор цветов")
+        self.assertEqual(serializer.data['variants'][0]['fabric']['name'], "Test Fabric")
 
-    def test_product_list_serializer_includes_picture_title(self):
-        """Test that the product list serializer includes the picture_title field"""
+    def test_product_list_serializer_price_summary(self):
+        """Test that the product list serializer summarizes active variant prices"""
         product = Product.objects.create(
             category=self.category,
             subcategory=self.subcategory,
             name="Test Product",
-            description="Test Description",
-            picture_title="Геометрический дизайн",  # Geometric design in Russian
-            fabric_type=self.fabric
         )
+        ProductVariant.objects.create(product=product, size=Size.objects.create(name="S"), price=150)
+        ProductVariant.objects.create(product=product, size=Size.objects.create(name="M"), price=90)
+        ProductVariant.objects.create(product=product, size=Size.objects.create(name="L"), price=10, is_active=False)
 
-        serializer = ProductListSerializer(product)
-        self.assertIn('picture_title', serializer.data)
-        self.assertEqual(serializer.data['picture_title'], "Геометрический дизайн")
+        serializer = ProductListSerializer(Product.objects.with_card_summary().get(pk=product.pk))
+        self.assertEqual(serializer.data['min_price'], "90.00")
+        self.assertEqual(serializer.data['max_price'], "150.00")
+        self.assertEqual(serializer.data['variants_count'], 2)
+        self.assertIsNone(serializer.data['image_url'])
+        self.assertNotIn('variants', serializer.data)
 
 
 class ProductImageModelTest(TestCase):
@@ -112,15 +110,12 @@ class ProductImageModelTest(TestCase):
             description="Test Description",
             category=self.category
         )
-        self.fabric = Fabric.objects.create(name="Test Fabric")
         self.product = Product.objects.create(
             category=self.category,
             subcategory=self.subcategory,
             name="Test Product",
             description="Test Description",
             binding="Твердый переплет",
-            picture_title="Красивый узор",
-            fabric_type=self.fabric
         )
 
     def test_product_image_creation(self):
@@ -185,23 +180,502 @@ class ProductImageModelTest(TestCase):
         self.assertEqual(serializer.data['images'][0]['id'], product_image.id)
         self.assertEqual(serializer.data['images'][0]['is_active'], True)
 
-    def test_product_list_serializer_includes_images(self):
-        """Test that the product list serializer includes the images field"""
-        # Create a simple image file for testing
-        image = SimpleUploadedFile(
-            name='test_list_image.jpg',
-            content=b'test image content',
-            content_type='image/jpeg'
+    def test_product_list_serializer_includes_first_active_image(self):
+        """Test that the product list serializer exposes the newest active image only"""
+        ProductImage.objects.create(product=self.product, image='product_images/old.jpg')
+        newest = ProductImage.objects.create(product=self.product, image='product_images/new.jpg')
+        ProductImage.objects.create(product=self.product, image='product_images/hidden.jpg', is_active=False)
+
+        serializer = ProductListSerializer(Product.objects.with_card_summary().get(pk=self.product.pk))
+        self.assertEqual(serializer.data['image_url'], newest.image.url)
+        self.assertNotIn('images', serializer.data)
+
+
+class ProductListViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Постельное белье")
+        self.subcategory = Subcategory.objects.create(name="Комплекты", category=self.category)
+        self.size = Size.objects.create(name="Евро")
+        self.fabric = Fabric.objects.create(name="Сатин")
+
+    def create_products(self, count, name="Товар"):
+        for i in range(count):
+            product = Product.objects.create(
+                category=self.category,
+                subcategory=self.subcategory,
+                name=name,
+            )
+            ProductVariant.objects.create(product=product, size=self.size, fabric=self.fabric, price=100 + i)
+            ProductImage.objects.create(product=product, image=f'product_images/{i}.jpg')
+            ProductImage.objects.create(product=product, image=f'product_images/{i}_old.jpg', is_active=False)
+
+    def test_pages_cover_all_products_in_stable_order(self):
+        """Курсор проходит все товары с одинаковыми именами без пропусков и дублей"""
+        self.create_products(5)
+        ids = []
+        url = '/api/catalog/products/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, sorted(Product.objects.values_list('id', flat=True)))
+
+    def collect_ids(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_orderings_span_pages(self):
+        """Порядок по цене и флагам применяет сервер, курсор сохраняет его между страницами"""
+        self.create_products(5)
+        products = list(Product.objects.order_by('id'))
+        prices = [300, 100, 500, 100, 200]
+        for product, price in zip(products, prices):
+            ProductVariant.objects.filter(product=product).update(price=price)
+        Product.objects.filter(pk__in=[products[1].pk, products[4].pk]).update(is_new=True)
+        no_price = Product.objects.create(category=self.category, subcategory=self.subcategory, name="Без цены")
+
+        ids = [product.pk for product in products]
+        self.assertEqual(
+            self.collect_ids('/api/catalog/products/?ordering=price_asc&page_size=2'),
+            [ids[1], ids[3], ids[4], ids[0], ids[2], no_price.pk],
+        )
+        self.assertEqual(
+            self.collect_ids('/api/catalog/products/?ordering=price_desc&page_size=2'),
+            [ids[2], ids[0], ids[4], ids[3], ids[1], no_price.pk],
+        )
+        self.assertEqual(
+            self.collect_ids('/api/catalog/products/?ordering=new&page_size=2'),
+            [ids[1], ids[4], no_price.pk, ids[0], ids[2], ids[3]],
+        )
+        # Неизвестный порядок — по названию
+        self.assertEqual(
+            self.collect_ids('/api/catalog/products/?ordering=rating&page_size=2'),
+            [no_price.pk] + ids,
         )
 
-        product_image = ProductImage.objects.create(
-            product=self.product,
-            image=image,
-            is_active=True
+    def test_list_returns_cards(self):
+        self.create_products(1)
+        response = self.client.get('/api/catalog/products/')
+        card = response.data['results'][0]
+        self.assertTrue(card['image_url'].endswith('/media/product_images/0.jpg'))
+        self.assertEqual(card['variants_count'], 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        """Страница карточек собирается одним запросом"""
+        self.create_products(30)
+        with self.assertNumQueries(1):
+            self.client.get('/api/catalog/products/?page_size=2')
+        with self.assertNumQueries(1):
+            self.client.get('/api/catalog/products/?page_size=30')
+
+    def test_detail_returns_full_graph(self):
+        self.create_products(1)
+        product = Product.objects.get()
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/catalog/products/{product.pk}/')
+        self.assertEqual(response.data['category']['name'], "Постельное белье")
+        self.assertEqual(response.data['variants'][0]['size']['name'], "Евро")
+        self.assertEqual(len(response.data['images']), 1)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/catalog/products/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+        for position in (["a", "x"], [None, None], ["a", 10 ** 30], [1, 2], ["a", True]):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            response = self.client.get('/api/catalog/products/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, position)
+        for position in (["x", "a", 1], [True, "a", 1], [True, "1e999", 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            response = self.client.get('/api/catalog/products/', {'cursor': cursor, 'ordering': 'price_asc'})
+            self.assertEqual(response.status_code, 404, position)
+
+
+class ProductFilterTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Постельное белье")
+        self.sets = Subcategory.objects.create(name="Комплекты", category=self.category)
+        self.pillows = Subcategory.objects.create(name="Наволочки", category=self.category)
+        self.euro = Size.objects.create(name="Евро")
+        self.double = Size.objects.create(name="Двуспальный")
+        self.satin = Fabric.objects.create(name="Сатин")
+        self.calico = Fabric.objects.create(name="Бязь")
+
+        self.satin_set = self.create_product("Сатиновый комплект", self.sets, is_new=True)
+        ProductVariant.objects.create(product=self.satin_set, size=self.euro, fabric=self.satin, price=5000)
+        ProductVariant.objects.create(product=self.satin_set, size=self.double, fabric=self.satin, price=4000)
+
+        self.calico_set = self.create_product("Комплект из бязи", self.sets, is_promotion=True)
+        ProductVariant.objects.create(product=self.calico_set, size=self.euro, fabric=self.calico, price=2500)
+
+        self.pillowcase = self.create_product("Наволочка", self.pillows)
+        ProductVariant.objects.create(product=self.pillowcase, fabric=self.satin, price=700)
+
+        hidden = self.create_product("Скрытый товар", self.sets, is_active=False)
+        ProductVariant.objects.create(product=hidden, size=self.euro, fabric=self.satin, price=100)
+
+    def create_product(self, name, subcategory, **kwargs):
+        return Product.objects.create(category=self.category, subcategory=subcategory, name=name, **kwargs)
+
+    def list_names(self, query):
+        response = self.client.get(f'/api/catalog/products/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return {item['name'] for item in response.data['results']}
+
+    def test_list_excludes_inactive_products(self):
+        self.assertEqual(self.list_names(''), {"Сатиновый комплект", "Комплект из бязи", "Наволочка"})
+
+    def test_variant_filters_apply_to_the_same_variant(self):
+        """Товар подходит, только если один вариант удовлетворяет всем условиям сразу"""
+        self.assertEqual(self.list_names(f'size={self.double.id}&fabric={self.satin.id}'), {"Сатиновый комплект"})
+        self.assertEqual(self.list_names(f'size={self.double.id}&min_price=4500'), set())
+        self.assertEqual(self.list_names(f'fabric={self.satin.id},{self.calico.id}&max_price=3000'), {"Комплект из бязи", "Наволочка"})
+
+    def test_product_filters(self):
+        self.assertEqual(self.list_names(f'subcategory={self.pillows.id}'), {"Наволочка"})
+        self.assertEqual(self.list_names('is_promotion=true'), {"Комплект из бязи"})
+        self.assertEqual(self.list_names('is_new=1&is_promotion=false'), {"Сатиновый комплект"})
+
+    def test_invalid_parameters(self):
+        response = self.client.get('/api/catalog/products/?size=abc&is_new=maybe')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('size', response.data)
+        self.assertIn('is_new', response.data)
+
+    def test_out_of_range_parameters(self):
+        for query in ('min_price=NaN', 'max_price=sNaN', 'min_price=Infinity', 'category_id=99999999999999999999',
+                      'size=99999999999999999999', 'fabric=1,-5', 'subcategory=0'):
+            response = self.client.get(f'/api/catalog/products/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            response = self.client.get(f'/api/catalog/products/facets/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+        self.assertEqual(self.list_names('min_price=1e30'), set())
+
+    def test_facets_ignore_own_dimension(self):
+        with self.assertNumQueries(6):
+            response = self.client.get(f'/api/catalog/products/facets/?fabric={self.satin.id}')
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(
+            [(item['name'], item['count']) for item in data['fabrics']],
+            [("Бязь", 1), ("Сатин", 2)],
         )
+        self.assertEqual(
+            [(item['name'], item['count']) for item in data['sizes']],
+            [("Двуспальный", 1), ("Евро", 1)],
+        )
+        self.assertEqual(
+            [(item['name'], item['count']) for item in data['subcategories']],
+            [("Комплекты", 1), ("Наволочки", 1)],
+        )
+        self.assertEqual(data['flags'], {'is_promotion': 0, 'is_new': 1})
+        self.assertEqual(data['price']['min'], 700)
+        self.assertEqual(data['price']['max'], 5000)
 
-        serializer = ProductListSerializer(self.product)
-        self.assertIn('images', serializer.data)
-        self.assertEqual(len(serializer.data['images']), 1)
-        self.assertEqual(serializer.data['images'][0]['id'], product_image.id)
-        self.assertEqual(serializer.data['images'][0]['is_active'], True)
+
+@skipUnless(connection.vendor == 'sqlite', 'Планы запросов проверяются на SQLite')
+class CatalogIndexUsageTest(TestCase):
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return '\n'.join(row[3] for row in cursor.fetchall())
+
+    def test_category_listing_uses_partial_index_in_page_order(self):
+        queryset = ProductFilter(QueryDict('category_id=1')).filter_queryset(Product.objects.with_card_summary())
+        plan = self.query_plan(queryset.order_by('name', 'id'))
+        self.assertIn('USING INDEX product_active_category_idx', plan)
+        self.assertIn('USING INDEX image_active_product_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_full_listing_uses_name_index(self):
+        plan = self.query_plan(Product.objects.filter(is_active=True).order_by('name', 'id'))
+        self.assertIn('USING INDEX product_active_name_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_variant_filter_uses_price_index(self):
+        queryset = ProductFilter(QueryDict('size=1&max_price=1000')).filter_queryset(Product.objects.all())
+        self.assertIn('USING INDEX variant_active_product_idx', self.query_plan(queryset))
+
+    def test_subcategories_by_category_use_partial_index(self):
+        plan = self.query_plan(Subcategory.objects.filter(category_id=1, is_active=True))
+        self.assertIn('USING INDEX subcategory_active_cat_idx', plan)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Полнотекстовый поиск работает на SQLite FTS5')
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Постельное белье")
+        self.subcategory = Subcategory.objects.create(name="Комплекты", category=self.category)
+        self.satin = Product.objects.create(
+            category=self.category, subcategory=self.subcategory,
+            name="Комплект Ёлочка", description="Мягкий сатин", sku="SAT-001",
+        )
+        self.calico = Product.objects.create(
+            category=self.category, subcategory=self.subcategory,
+            name="Бязь классика", description="Комплект из бязи",
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/catalog/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_prefix_search_in_cyrillic_is_case_insensitive(self):
+        self.assertEqual(self.search("САТ"), [self.satin.id])
+        self.assertEqual(self.search("елочк"), [self.satin.id])
+        self.assertEqual(self.search("sat-001"), [self.satin.id])
+
+    def test_name_match_ranks_above_description_match(self):
+        self.assertEqual(self.search("комплект"), [self.satin.id, self.calico.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.calico.name = "Перкаль"
+        self.calico.save()
+        self.assertEqual(self.search("перкаль"), [self.calico.id])
+
+        self.calico.is_active = False
+        self.calico.save()
+        self.assertEqual(self.search("перкаль"), [])
+
+        self.category.name = "Текстиль"
+        self.category.save()
+        self.assertEqual(self.search("текстиль"), [self.satin.id])
+
+        self.satin.delete()
+        self.assertEqual(self.search("текстиль"), [])
+
+    def test_special_characters_are_ignored(self):
+        self.assertEqual(self.search('"*(^'), [])
+        self.assertEqual(self.search('бязь ("-'), [self.calico.id])
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Постельное белье")
+        self.subcategory = Subcategory.objects.create(name="Комплекты", category=self.category)
+        self.product = Product.objects.create(category=self.category, subcategory=self.subcategory, name="Комплект")
+        self.variant = ProductVariant.objects.create(product=self.product, price=1000)
+
+    def assert_cached_until_change(self, url, change, field_getter):
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(first.data, cached.data)
+
+        change()
+        fresh = self.client.get(url)
+        self.assertNotEqual(field_getter(first.data), field_getter(fresh.data))
+
+    def test_product_list_is_invalidated_by_variant_change(self):
+        def change():
+            self.variant.price = 1500
+            self.variant.save()
+        self.assert_cached_until_change(
+            '/api/catalog/products/', change, lambda data: data['results'][0]['max_price'],
+        )
+
+    def test_product_detail_is_invalidated_by_size_change(self):
+        size = Size.objects.create(name="Евро")
+        self.variant.size = size
+        self.variant.save()
+
+        def change():
+            size.name = "Евро макси"
+            size.save()
+        self.assert_cached_until_change(
+            f'/api/catalog/products/{self.product.pk}/', change, lambda data: data['variants'][0]['size']['name'],
+        )
+
+    def test_subcategories_are_invalidated_by_create(self):
+        self.assert_cached_until_change(
+            f'/api/catalog/categories/{self.category.pk}/subcategories/',
+            lambda: Subcategory.objects.create(name="Пледы", category=self.category),
+            len,
+        )
+
+    def test_category_list_is_invalidated_after_create(self):
+        self.assert_cached_until_change(
+            '/api/catalog/categories/',
+            lambda: self.client.post('/api/catalog/categories/', {'name': "Полотенца"}),
+            len,
+        )
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            caches = {'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}
+            with override_settings(CACHES=caches):
+                def change():
+                    self.product.name = "Комплект Люкс"
+                    self.product.save()
+                self.assert_cached_until_change(
+                    '/api/catalog/products/', change, lambda data: data['results'][0]['name'],
+                )
+
+    def test_version_is_kept_in_catalog_cache(self):
+        caches = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+            'catalog': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog'},
+        }
+        with override_settings(CACHES=caches, CATALOG_CACHE_ALIAS='catalog'):
+            version = get_catalog_version()
+            invalidate_catalog_cache()
+            self.assertGreater(get_version(CATALOG_VERSION, 'catalog'), version)
+            self.assertIsNone(django_caches['default'].get(version_key(CATALOG_VERSION)))
+
+
+class CatalogTransferTest(TestCase):
+    HEADER = 'sku;name;category;subcategory;description;binding;is_active;is_promotion;is_new;size;fabric;picture_title;price;variant_is_active\n'
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Постельное белье")
+        self.subcategory = Subcategory.objects.create(name="Комплекты", category=self.category)
+        self.euro = Size.objects.create(name="Евро")
+        self.family = Size.objects.create(name="Семейный")
+        self.satin = Fabric.objects.create(name="Сатин")
+        self.product = Product.objects.create(
+            category=self.category, subcategory=self.subcategory, name="Комплект Ёлочка", sku="SAT-001"
+        )
+        self.variant = ProductVariant.objects.create(product=self.product, size=self.euro, fabric=self.satin, price=100)
+
+    def csv(self, *rows):
+        return StringIO(self.HEADER + ''.join(row + '\n' for row in rows))
+
+    def test_csv_import_creates_and_updates(self):
+        result = import_catalog(self.csv(
+            'SAT-001;Комплект Ёлочка;Постельное белье;Комплекты;;;1;0;0;Евро;Сатин;;120,50;1',
+            'SAT-002;Комплект Снег;Постельное белье;Комплекты;Новинка;;1;0;1;Евро;Сатин;;150;1',
+            'SAT-002;Комплект Снег;Постельное белье;Комплекты;Новинка;;1;0;1;Семейный;;;180;0',
+        ), 'csv')
+
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(result['products'], {'created': 1, 'updated': 0, 'unchanged': 1})
+        self.assertEqual(result['variants'], {'created': 2, 'updated': 1, 'unchanged': 0})
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.price, Decimal('120.50'))
+        snow = Product.objects.get(sku='SAT-002')
+        self.assertTrue(snow.is_new)
+        self.assertEqual(
+            sorted(snow.variants.values_list('size__name', 'fabric__name', 'price', 'is_active')),
+            [("Евро", "Сатин", Decimal('150.00'), True), ("Семейный", None, Decimal('180.00'), False)],
+        )
+
+        # Повторная загрузка того же файла ничего не меняет
+        result = import_catalog(self.csv(
+            'SAT-002;Комплект Снег;Постельное белье;Комплекты;Новинка;;1;0;1;Семейный;;;180;0',
+        ), 'csv')
+        self.assertEqual(result['products']['unchanged'], 1)
+        self.assertEqual(result['variants']['unchanged'], 1)
+        self.assertEqual(ProductVariant.objects.filter(product=snow).count(), 2)
+
+    def test_dry_run_returns_diff_without_saving(self):
+        result = import_catalog(self.csv(
+            'SAT-001;Комплект Ёлочка Люкс;Постельное белье;Комплекты;;;1;0;0;Евро;Сатин;;100;1',
+            'SAT-003;Комплект Луч;Постельное белье;Комплекты;;;1;0;0;;;;;',
+        ), 'csv', dry_run=True)
+
+        self.assertEqual(result['diff'], [
+            {'line': 2, 'sku': 'SAT-001', 'action': 'update',
+             'changes': {'name': ["Комплект Ёлочка", "Комплект Ёлочка Люкс"]}},
+            {'line': 3, 'sku': 'SAT-003', 'action': 'create'},
+        ])
+        self.assertEqual(result['variants']['unchanged'], 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, "Комплект Ёлочка")
+        self.assertFalse(Product.objects.filter(sku='SAT-003').exists())
+
+    def test_errors_roll_back_whole_file(self):
+        result = import_catalog(self.csv(
+            'SAT-001;Комплект Ёлочка;Постельное белье;Комплекты;;;1;0;0;Евро;Сатин;;999;1',
+            'SAT-004;Комплект;Постельное белье;Комплекты;;;1;0;0;Полуторный;;;100;1',
+            ';Без артикула;Постельное белье;Комплекты;;;1;0;0;;;;;',
+        ), 'csv')
+
+        self.assertEqual([error['line'] for error in result['errors']], [3, 4])
+        self.assertIn("Полуторный", result['errors'][0]['message'])
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.price, Decimal('100.00'))
+
+    def test_unreadable_files_are_reported_as_errors(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='staff', password='pass', is_staff=True))
+        content = self.HEADER + 'SAT-005;Комплект Ель;Постельное белье;Комплекты;;;1;0;0;;;;;\n'
+        upload = SimpleUploadedFile('catalog.csv', content.encode('cp1251'))
+        response = client.post('/api/catalog/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('UTF-8', response.data['errors'][0]['message'])
+
+        result = import_catalog(self.csv('SAT-005;Комплект\x00Ель;Постельное белье;Комплекты;;;1;0;0;;;;;'), 'csv')
+        self.assertEqual(result['errors'], [{'line': 2, 'message': 'Значение содержит символ NUL'}])
+
+        result = import_catalog(self.csv('SAT-005;"Комплект;Постельное белье;Комплекты;;;1;0;0;;;;;'), 'csv')
+        self.assertEqual(len(result['errors']), 1)
+        self.assertFalse(Product.objects.filter(sku='SAT-005').exists())
+
+    def test_csv_export_escapes_formulas(self):
+        self.product.name = '=HYPERLINK("http://example.com")'
+        self.product.save()
+        content = ''.join(iter_export('csv'))
+        self.assertIn('SAT-001;"\'=HYPERLINK(""http://example.com"")";', content)
+
+        # Загрузка выгруженного файла снимает экранирование
+        result = import_catalog(StringIO(content.lstrip('\ufeff')), 'csv')
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(result['products']['unchanged'], 1)
+
+    def test_query_count_does_not_grow_with_file_size(self):
+        def rows(count):
+            return [
+                f'BULK-{i};Товар {i};Постельное белье;Комплекты;;;1;0;0;{size};Сатин;;{100 + i};1'
+                for i in range(count) for size in ("Евро", "Семейный")
+            ]
+
+        with CaptureQueriesContext(connection) as small:
+            import_catalog(self.csv(*rows(2)), 'csv')
+        ProductVariant.objects.filter(product__sku__startswith='BULK-').delete()
+        Product.objects.filter(sku__startswith='BULK-').delete()
+        with CaptureQueriesContext(connection) as large:
+            import_catalog(self.csv(*rows(200)), 'csv')
+        # Рост только за счет пачек INSERT, ограниченных числом параметров запроса
+        self.assertLess(len(large), len(small) + 10)
+        self.assertEqual(ProductVariant.objects.filter(product__sku__startswith='BULK-').count(), 400)
+
+    def test_staff_api_round_trip(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/catalog/export/').status_code, 401)
+        client.force_authenticate(User.objects.create_user(username='staff', password='pass', is_staff=True))
+
+        response = client.get('/api/catalog/export/', {'file_format': 'jsonl'})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        record = json.loads(lines[0])
+        self.assertEqual(record['sku'], 'SAT-001')
+        self.assertEqual(record['variants'][0]['size'], "Евро")
+
+        record['variants'][0]['price'] = '130.00'
+        upload = SimpleUploadedFile('catalog.jsonl', json.dumps(record).encode('utf-8'))
+        response = client.post('/api/catalog/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['variants']['updated'], 1)
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.price, Decimal('130.00'))
+
+        response = client.get('/api/catalog/export/')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeffsku;name;category'))
+        self.assertIn('SAT-001;Комплект Ёлочка;Постельное белье;Комплекты;;;1;0;0;Евро;Сатин;;130.00;1', content)
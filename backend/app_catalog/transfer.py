@@ -0,0 +1,443 @@
+"""
+Массовая загрузка и выгрузка товаров с вариантами (CSV и JSONL).
+
+CSV — одна строка на вариант товара (поля товара повторяются), строка без
+размера, ткани, рисунка и цены задает только товар. JSONL — один товар на
+строку со списком variants. Товар определяется артикулом (sku), вариант —
+товаром, размером, тканью и рисунком.
+
+Файл читается потоком и записывается пачками: категории, подкатегории,
+размеры, ткани и рисунки ищутся по названию в словарях, загруженных один раз,
+а товары и варианты пачки записываются двумя bulk_create(update_conflicts=True).
+Загрузка идет в одной транзакции: при любой ошибке в файле ничего не
+сохраняется. В режиме dry_run все записывается и откатывается, а в результат
+попадает список изменений. Варианты, которых нет в файле, не удаляются.
+"""
+import csv
+import io
+import json
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.http import StreamingHttpResponse
+
+from app_home.csv_export import Echo, escape_formula, unescape_formula
+
+from . import search
+from .cache import invalidate_catalog_cache
+from .models import Category, Subcategory, Size, Fabric, PictureTitle, Product, ProductVariant
+
+FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 1000
+# Сколько ошибок и изменений возвращается в результате
+ERRORS_LIMIT = 100
+DIFF_LIMIT = 1000
+
+PRODUCT_COLUMNS = ('sku', 'name', 'category', 'subcategory', 'description', 'binding', 'is_active', 'is_promotion', 'is_new')
+VARIANT_COLUMNS = ('size', 'fabric', 'picture_title', 'price', 'is_active')
+# В CSV is_active варианта отличается от is_active товара префиксом
+CSV_COLUMNS = PRODUCT_COLUMNS + tuple(f'variant_{column}' if column == 'is_active' else column for column in VARIANT_COLUMNS)
+
+PRODUCT_FIELDS = ('name', 'category_id', 'subcategory_id', 'description', 'binding', 'is_active', 'is_promotion', 'is_new')
+VARIANT_FIELDS = ('price', 'is_active')
+
+TRUE_VALUES = {'1', 'true', 'yes', 'да', '+'}
+FALSE_VALUES = {'0', 'false', 'no', 'нет', '-'}
+
+
+class RecordError(ValueError):
+    """Ошибка в строке файла загрузки"""
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def _read_errors(reader):
+    """
+    Ошибки чтения файла — запись RecordError с номером строки, на которой
+    остановилось чтение, вместо исключения (500) из середины загрузки.
+    """
+    line = 1
+    try:
+        for line, record in reader:
+            yield line, record
+    except UnicodeDecodeError:
+        yield line + 1, RecordError('Файл не в кодировке UTF-8')
+    except csv.Error as error:
+        yield line + 1, RecordError(f'Некорректная строка CSV: {error}')
+
+
+def read_csv(stream):
+    """(номер строки, запись) из CSV с разделителем ";" или ","."""
+    header = stream.readline()
+    if not header.strip():
+        return
+    delimiter = ';' if header.count(';') >= header.count(',') else ','
+    columns = [column.strip() for column in next(csv.reader([header], delimiter=delimiter))]
+    for line, row in enumerate(csv.reader(stream, delimiter=delimiter), start=2):
+        if not any(value.strip() for value in row):
+            continue
+        values = dict(zip(columns, map(unescape_formula, row)))
+        product = {column: values.get(column) for column in PRODUCT_COLUMNS}
+        variant = {
+            column: values.get(f'variant_{column}' if column == 'is_active' else column)
+            for column in VARIANT_COLUMNS
+        }
+        has_variant = any((variant[column] or '').strip() for column in ('size', 'fabric', 'picture_title', 'price'))
+        yield line, {**product, 'variants': [variant] if has_variant else []}
+
+
+def read_jsonl(stream):
+    """(номер строки, запись) из JSONL: один товар с вариантами на строку."""
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as error:
+            yield line, RecordError(f'Некорректный JSON: {error}')
+            continue
+        if not isinstance(record, dict) or not isinstance(record.get('variants', []), list):
+            yield line, RecordError('Ожидается объект товара со списком variants')
+            continue
+        yield line, record
+
+
+def read_records(stream, file_format):
+    """
+    Записи файла по одной. stream — текстовый поток; двоичный файл (загрузка
+    через API) оборачивается в UTF-8, BOM отбрасывается.
+    """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = read_jsonl if file_format == 'jsonl' else read_csv
+    return _read_errors(reader(stream))
+
+
+def _text(value, default=''):
+    if value is None:
+        return default
+    text = str(value).strip()
+    if '\x00' in text:
+        raise RecordError('Значение содержит символ NUL')
+    return text
+
+
+def _bool(value, default):
+    if isinstance(value, bool):
+        return value
+    text = _text(value).lower()
+    if not text:
+        return default
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RecordError(f'Некорректное логическое значение "{value}"')
+
+
+def _price(value):
+    try:
+        price = Decimal(_text(value).replace(',', '.'))
+    except InvalidOperation:
+        raise RecordError(f'Некорректная цена "{value}"')
+    if not price.is_finite() or price < 0 or price >= Decimal('1e8'):
+        raise RecordError(f'Некорректная цена "{value}"')
+    return price.quantize(Decimal('0.01'))
+
+
+class CatalogImporter:
+    """
+    Загрузка записей каталога пачками по chunk_size вариантов.
+
+    Пример:
+        result = CatalogImporter(dry_run=True).run(read_records(file, 'csv'))
+    """
+
+    def __init__(self, dry_run=False, chunk_size=CHUNK_SIZE):
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size
+        self.stats = Counter()
+        self.errors = []
+        self.diff = []
+
+    def run(self, records):
+        """
+        Returns:
+            dict: dry_run, products и variants ({"created", "updated", "unchanged"}),
+                  errors ([{"line", "message"}]) и diff (только в режиме dry_run)
+        """
+        with transaction.atomic():
+            self.load_lookups()
+            chunk, size = [], 0
+            for line, record in records:
+                item = self.parse(line, record)
+                if item is None or self.errors:
+                    continue
+                chunk.append(item)
+                size += max(len(item['variants']), 1)
+                if size >= self.chunk_size:
+                    self.write(chunk)
+                    chunk, size = [], 0
+            if not self.errors:
+                self.write(chunk)
+            if self.errors or self.dry_run:
+                transaction.set_rollback(True)
+            else:
+                transaction.on_commit(invalidate_catalog_cache)
+        return self.result()
+
+    def result(self):
+        result = {
+            'dry_run': self.dry_run,
+            'products': {key: self.stats[f'products_{key}'] for key in ('created', 'updated', 'unchanged')},
+            'variants': {key: self.stats[f'variants_{key}'] for key in ('created', 'updated', 'unchanged')},
+            'errors': self.errors[:ERRORS_LIMIT],
+        }
+        if self.dry_run:
+            result['diff'] = self.diff[:DIFF_LIMIT]
+        return result
+
+    def load_lookups(self):
+        """Словари "название -> id" для справочников (при повторах — запись с меньшим id)"""
+        def names(model):
+            return dict(model.objects.order_by('-id').values_list('name', 'id'))
+
+        self.categories = names(Category)
+        self.sizes = names(Size)
+        self.fabrics = names(Fabric)
+        self.pictures = names(PictureTitle)
+        self.subcategories = {
+            (category_id, name): pk
+            for category_id, name, pk in Subcategory.objects.order_by('-id').values_list('category_id', 'name', 'id')
+        }
+        self.labels = {
+            'category_id': {pk: name for name, pk in self.categories.items()},
+            'subcategory_id': {pk: name for (_, name), pk in self.subcategories.items()},
+        }
+
+    def error(self, line, message):
+        self.errors.append({'line': line, 'message': message})
+
+    def resolve(self, table, name, title):
+        name = _text(name)
+        if not name:
+            return None
+        if name not in table:
+            raise RecordError(f'{title} "{name}" не найден(а)')
+        return table[name]
+
+    def parse(self, line, record):
+        if isinstance(record, Exception):
+            self.error(line, str(record))
+            return None
+        try:
+            sku, name = _text(record.get('sku')), _text(record.get('name'))
+            if not sku:
+                raise RecordError('Не указан артикул (sku)')
+            if len(sku) > Product._meta.get_field('sku').max_length:
+                raise RecordError(f'Слишком длинный артикул "{sku}"')
+            if not name:
+                raise RecordError('Не указано название товара')
+            category_id = self.resolve(self.categories, record.get('category'), 'Категория')
+            if category_id is None:
+                raise RecordError('Не указана категория')
+            subcategory = _text(record.get('subcategory'))
+            if (category_id, subcategory) not in self.subcategories:
+                raise RecordError(f'Подкатегория "{subcategory}" не найдена в категории "{_text(record.get("category"))}"')
+            product = {
+                'sku': sku,
+                'name': name,
+                'category_id': category_id,
+                'subcategory_id': self.subcategories[(category_id, subcategory)],
+                'description': _text(record.get('description')) or None,
+                'binding': _text(record.get('binding')) or None,
+                'is_active': _bool(record.get('is_active'), True),
+                'is_promotion': _bool(record.get('is_promotion'), False),
+                'is_new': _bool(record.get('is_new'), False),
+            }
+            variants = []
+            for variant in record.get('variants') or []:
+                if _text(variant.get('price')) == '':
+                    raise RecordError('Не указана цена варианта')
+                variants.append({
+                    'size_id': self.resolve(self.sizes, variant.get('size'), 'Размер'),
+                    'fabric_id': self.resolve(self.fabrics, variant.get('fabric'), 'Ткань'),
+                    'picture_title_id': self.resolve(self.pictures, variant.get('picture_title'), 'Рисунок'),
+                    'price': _price(variant.get('price')),
+                    'is_active': _bool(variant.get('is_active'), True),
+                    'label': ' / '.join(_text(variant.get(column)) or '-' for column in ('size', 'fabric', 'picture_title')),
+                })
+        except (RecordError, AttributeError) as error:
+            self.error(line, str(error) if isinstance(error, RecordError) else 'Некорректная запись')
+            return None
+        return {'line': line, 'product': product, 'variants': variants}
+
+    def changes(self, fields, old, new, labels=None):
+        labels = labels or {}
+        result = {}
+        for field in fields:
+            if old[field] != new[field]:
+                names = labels.get(field, {})
+                result[field.removesuffix('_id')] = [names.get(old[field], old[field]), names.get(new[field], new[field])]
+        return result
+
+    def record_diff(self, entry):
+        if self.dry_run and len(self.diff) < DIFF_LIMIT:
+            self.diff.append(entry)
+
+    def write(self, chunk):
+        if not chunk:
+            return
+        # Повторы артикула внутри пачки объединяются: поля — из последней записи
+        items = {}
+        for item in chunk:
+            merged = items.setdefault(item['product']['sku'], {'line': item['line'], 'variants': []})
+            merged['product'] = item['product']
+            merged['variants'].extend(item['variants'])
+
+        existing = {
+            row['sku']: row
+            for row in Product.objects.filter(sku__in=items).values('id', 'sku', *PRODUCT_FIELDS)
+        }
+        products = []
+        for sku, item in items.items():
+            new, old = item['product'], existing.get(sku)
+            if old is None:
+                self.stats['products_created'] += 1
+                self.record_diff({'line': item['line'], 'sku': sku, 'action': 'create'})
+            else:
+                changes = self.changes(PRODUCT_FIELDS, old, new, self.labels)
+                if not changes:
+                    self.stats['products_unchanged'] += 1
+                    continue
+                self.stats['products_updated'] += 1
+                self.record_diff({'line': item['line'], 'sku': sku, 'action': 'update', 'changes': changes})
+            products.append(Product(**new))
+
+        Product.objects.bulk_create(
+            products, update_conflicts=True, unique_fields=['sku'], update_fields=list(PRODUCT_FIELDS)
+        )
+        product_ids = {sku: row['id'] for sku, row in existing.items()}
+        product_ids.update((product.sku, product.pk) for product in products if product.pk is not None)
+        if len(product_ids) < len(items):
+            # База не вернула id вставленных строк
+            product_ids.update(Product.objects.filter(sku__in=items).values_list('sku', 'id'))
+        if products:
+            search.update_products(Product.objects.filter(sku__in=[product.sku for product in products]))
+
+        self.write_variants(items, product_ids)
+
+    def write_variants(self, items, product_ids):
+        existing = {
+            (row['product_id'], row['size_id'], row['fabric_id'], row['picture_title_id']): row
+            for row in ProductVariant.objects.filter(product_id__in=product_ids.values()).values(
+                'id', 'product_id', 'size_id', 'fabric_id', 'picture_title_id', *VARIANT_FIELDS
+            )
+        }
+        # Повторы варианта внутри пачки: учитывается последнее значение
+        incoming = {}
+        for sku, item in items.items():
+            for variant in item['variants']:
+                key = (product_ids[sku], variant['size_id'], variant['fabric_id'], variant['picture_title_id'])
+                incoming[key] = (sku, item['line'], variant)
+
+        variants = []
+        for key, (sku, line, variant) in incoming.items():
+            old = existing.get(key)
+            entry = {'line': line, 'sku': sku, 'variant': variant['label']}
+            if old is None:
+                self.stats['variants_created'] += 1
+                self.record_diff({**entry, 'action': 'create'})
+            else:
+                changes = self.changes(VARIANT_FIELDS, old, variant)
+                if not changes:
+                    self.stats['variants_unchanged'] += 1
+                    continue
+                self.stats['variants_updated'] += 1
+                self.record_diff({**entry, 'action': 'update', 'changes': changes})
+            variants.append(ProductVariant(
+                pk=old['id'] if old else None,
+                product_id=key[0],
+                size_id=key[1],
+                fabric_id=key[2],
+                picture_title_id=key[3],
+                **{field: variant[field] for field in VARIANT_FIELDS}
+            ))
+        # Существующие варианты обновляются по первичному ключу: в ключе варианта могут
+        # быть NULL, а уникальность (product, size, fabric, picture_title) их не сравнивает
+        ProductVariant.objects.bulk_create(
+            variants, update_conflicts=True, unique_fields=['id'], update_fields=list(VARIANT_FIELDS)
+        )
+
+
+def import_catalog(stream, file_format, dry_run=False, chunk_size=CHUNK_SIZE):
+    """Загружает файл каталога; см. CatalogImporter.run()"""
+    return CatalogImporter(dry_run=dry_run, chunk_size=chunk_size).run(read_records(stream, file_format))
+
+
+def iter_products(chunk_size=CHUNK_SIZE):
+    """
+    Товары с вариантами в виде записей JSONL, по порядку id. На каждую пачку
+    товаров — один запрос товаров (курсор) и один запрос их вариантов.
+    """
+    products = (
+        Product.objects.order_by('id')
+        .values_list('id', 'sku', 'name', 'category__name', 'subcategory__name', 'description', 'binding',
+                     'is_active', 'is_promotion', 'is_new')
+        .iterator(chunk_size=chunk_size)
+    )
+    while True:
+        batch = list(islice(products, chunk_size))
+        if not batch:
+            return
+        variants = {}
+        rows = (
+            ProductVariant.objects.filter(product_id__in=[row[0] for row in batch])
+            .order_by('product_id', 'id')
+            .values_list('product_id', 'size__name', 'fabric__name', 'picture_title__name', 'price', 'is_active')
+        )
+        for product_id, *values in rows:
+            variants.setdefault(product_id, []).append(dict(zip(VARIANT_COLUMNS, values)))
+        for product_id, *values in batch:
+            yield {**dict(zip(PRODUCT_COLUMNS, values)), 'variants': variants.get(product_id, [])}
+
+
+def iter_csv_rows():
+    yield CSV_COLUMNS
+    for product in iter_products():
+        values = [product[column] for column in PRODUCT_COLUMNS]
+        for variant in product['variants'] or [dict.fromkeys(VARIANT_COLUMNS)]:
+            yield values + [variant[column] for column in VARIANT_COLUMNS]
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return int(value)
+    return escape_formula(value)
+
+
+def iter_export(file_format):
+    """Строки файла выгрузки: CSV (UTF-8 с BOM, разделитель ";") или JSONL"""
+    if file_format == 'jsonl':
+        for product in iter_products():
+            yield json.dumps(product, ensure_ascii=False, default=str) + '\n'
+        return
+    writer = csv.writer(Echo(), delimiter=';')
+    yield '\ufeff'
+    for row in iter_csv_rows():
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def export_catalog_response(file_format, filename):
+    content_type = 'application/x-ndjson' if file_format == 'jsonl' else 'text/csv; charset=utf-8'
+    return StreamingHttpResponse(
+        iter_export(file_format),
+        content_type=content_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
@@ -20,8 +20,16 @@ urlpatterns = [
 
     # Product endpoints (with variants included in detail view)
     path('products/', views.ProductListView.as_view(), name='product-list'),
+    path('products/facets/', views.ProductFacetsView.as_view(), name='product-facets'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
 
+    # Bulk catalog import/export for staff (CSV / JSONL)
+    path('import/', views.CatalogImportView.as_view(), name='catalog-import'),
+    path('export/', views.CatalogExportView.as_view(), name='catalog-export'),
+
+    # Full-text product search
+    path('search/', views.ProductSearchView.as_view(), name='product-search'),
+
     # Subcategory by category endpoint
     path('categories/<int:category_id>/subcategories/', views.SubcategoryByCategoryView.as_view(), name='subcategory-by-category'),
 ]
\ No newline at end of file
@@ -1,96 +1,211 @@
-from rest_framework import generics
-from rest_framework.permissions import AllowAny
+from decimal import Decimal
+from django.db.models import BooleanField, ExpressionWrapper, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from rest_framework import generics, status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from .models import Category, Subcategory, Size, Fabric, Product
 from .serializers import (
     CategorySerializer, SubcategorySerializer,
     SizeSerializer, FabricSerializer,
-    ProductSerializer
+    ProductSerializer, ProductListSerializer, CatalogImportSerializer, CatalogExportQuerySerializer
 )
+from . import search, transfer
+from .cache import CatalogCacheMixin, catalog_condition
+from .filters import ProductFilter
+from .pagination import KeysetPagination
 
 
-class CategoryListCreateView(generics.ListCreateAPIView):
+@method_decorator(catalog_condition, name='get')
+class CategoryListCreateView(CatalogCacheMixin, generics.ListCreateAPIView):
     permission_classes = [AllowAny]
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
 
+@method_decorator(catalog_condition, name='get')
 class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [AllowAny]
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
 
+@method_decorator(catalog_condition, name='get')
 class SubcategoryListCreateView(generics.ListCreateAPIView):
     permission_classes = [AllowAny]
     queryset = Subcategory.objects.all()
     serializer_class = SubcategorySerializer
 
 
+@method_decorator(catalog_condition, name='get')
 class SubcategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [AllowAny]
     queryset = Subcategory.objects.all()
     serializer_class = SubcategorySerializer
 
 
+@method_decorator(catalog_condition, name='get')
 class SizeListCreateView(generics.ListCreateAPIView):
     permission_classes = [AllowAny]
     queryset = Size.objects.all()
     serializer_class = SizeSerializer
 
 
+@method_decorator(catalog_condition, name='get')
 class SizeDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [AllowAny]
     queryset = Size.objects.all()
     serializer_class = SizeSerializer
 
 
+@method_decorator(catalog_condition, name='get')
 class FabricListCreateView(generics.ListCreateAPIView):
     permission_classes = [AllowAny]
     queryset = Fabric.objects.all()
     serializer_class = FabricSerializer
 
 
+@method_decorator(catalog_condition, name='get')
 class FabricDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [AllowAny]
     queryset = Fabric.objects.all()
     serializer_class = FabricSerializer
 
 
-class ProductListView(generics.ListAPIView):
+@method_decorator(catalog_condition, name='get')
+class ProductListView(CatalogCacheMixin, generics.ListAPIView):
     """
-    Возвращает список товаров.
+    Возвращает список карточек активных товаров постранично.
 
-    Опционально поддерживает фильтрацию по категории через query-параметр.
-    Каждый товар включает в себя варианты (variants), изображения, категорию, подкатегорию и тип ткани.
+    Поддерживает фильтрацию по категории, подкатегории, размеру, ткани, рисунку,
+    флагам акции/новинки и диапазону цены (см. ProductFilter).
+    Каждая карточка содержит первое активное изображение, диапазон цен и количество
+    активных вариантов; полный граф товара отдает только ProductDetailView.
+    Используется keyset-пагинация по полям выбранного порядка (ordering): ссылка на
+    следующую страницу приходит в поле "next" и сохраняет порядок. Товары без активных
+    вариантов при сортировке по цене идут последними.
+    Страница собирается одним запросом к БД.
 
     Query Parameters:
         category_id (int, optional): ID категории для фильтрации товаров
+        subcategory, size, fabric, picture_title (str, optional): ID через запятую
+        is_promotion, is_new (bool, optional): Флаги товара
+        min_price, max_price (decimal, optional): Диапазон цены варианта
+        ordering (str, optional): name (по умолчанию), new — сначала новинки, promo — сначала
+            акции, price_asc / price_desc — по минимальной цене варианта
+        page_size (int, optional): Размер страницы (по умолчанию 24, максимум 100)
+        cursor (str, optional): Курсор следующей страницы из поля "next"
 
     Returns:
-        list: Список товаров с вариантами и изображениями
+        object: {"next": str | null, "results": [...]} — страница карточек товаров
 
     Example:
-        GET /api/catalog/products/ — все товары
+        GET /api/catalog/products/ — первая страница товаров
         GET /api/catalog/products/?category_id=1 — товары категории 1
+        GET /api/catalog/products/?size=1,2&fabric=3&max_price=5000 — товары с подходящим вариантом
+        GET /api/catalog/products/?ordering=price_asc — сначала дешевые
     """
     permission_classes = [AllowAny]
-    serializer_class = ProductSerializer
+    serializer_class = ProductListSerializer
+    pagination_class = KeysetPagination
+    # Порядки списка: поля keyset-пагинации, последнее уникально
+    orderings = {
+        'name': ('name', 'id'),
+        'new': ('-is_new', 'name', 'id'),
+        'promo': ('-is_promotion', 'name', 'id'),
+        'price_asc': ('-has_price', 'sort_price', 'id'),
+        'price_desc': ('-has_price', '-sort_price', '-id'),
+    }
+    default_ordering = 'name'
+
+    def get_ordering_key(self):
+        ordering = self.request.query_params.get('ordering')
+        return ordering if ordering in self.orderings else self.default_ordering
+
+    def get_keyset_ordering(self):
+        return self.orderings[self.get_ordering_key()]
 
     def get_queryset(self):
-        queryset = Product.objects.prefetch_related('variants', 'images', 'category', 'subcategory', 'fabric_type')
-        category_id = self.request.query_params.get('category_id')
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
+        product_filter = ProductFilter(self.request.query_params)
+        queryset = product_filter.filter_queryset(Product.objects.with_card_summary())
+        if self.get_ordering_key().startswith('price_'):
+            # Курсор не сравнивает NULL: цена без вариантов заменяется нулем, а флаг
+            # has_price ставит такие товары в конец
+            queryset = queryset.annotate(
+                has_price=ExpressionWrapper(Q(min_price__isnull=False), output_field=BooleanField()),
+                sort_price=Coalesce('min_price', Value(Decimal('0'))),
+            )
         return queryset
 
 
-class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
+@method_decorator(catalog_condition, name='get')
+class ProductFacetsView(APIView):
+    """
+    Возвращает фасеты каталога для текущих фильтров.
+
+    Для каждого значения размера, ткани, рисунка и подкатегории считается количество
+    активных товаров, подходящих под остальные фильтры; также возвращаются общее
+    количество товаров, количество акций/новинок и диапазон цен.
+    Принимает те же query-параметры, что и ProductListView.
+
+    Example:
+        GET /api/catalog/products/facets/?category_id=1&fabric=3
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response(ProductFilter(request.query_params).facets())
+
+
+@method_decorator(catalog_condition, name='get')
+class ProductSearchView(APIView):
+    """
+    Полнотекстовый поиск активных товаров.
+
+    Ищет по названию, артикулу, описанию, переплету и названиям категории и подкатегории.
+    Каждое слово запроса ищется по префиксу ("компл" найдет "комплект"), результаты
+    упорядочены по релевантности.
+
+    Query Parameters:
+        q (str): Поисковый запрос
+        limit (int, optional): Количество результатов (по умолчанию 20, максимум 100)
+
+    Returns:
+        object: {"results": [...]} — карточки товаров в порядке релевантности
+
+    Example:
+        GET /api/catalog/search/?q=сатин евро
+    """
+    permission_classes = [AllowAny]
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        ids = search.search_product_ids(request.query_params.get('q', ''), limit=max(limit, 1))
+        products = Product.objects.with_card_summary().filter(id__in=ids, is_active=True).in_bulk()
+        serializer = ProductListSerializer(
+            [products[pk] for pk in ids if pk in products],
+            many=True,
+            context={'request': request},
+        )
+        return Response({'results': serializer.data})
+
+
+@method_decorator(catalog_condition, name='get')
+class ProductDetailView(CatalogCacheMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Возвращает, обновляет или удаляет конкретный товар.
 
-    Возвращает полную информацию о товаре, включая варианты (variants), изображения,
-    категорию, подкатегорию и тип ткани.
+    Возвращает полную информацию о товаре, включая варианты (variants) с размером,
+    тканью и названием рисунка, активные изображения, категорию и подкатегорию.
 
     Returns:
         object: Объект товара с вариантами и изображениями
@@ -101,11 +216,12 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
         DELETE /api/catalog/products/1/ — удалить товар с ID=1
     """
     permission_classes = [AllowAny]
-    queryset = Product.objects.all()
+    queryset = Product.objects.with_related()
     serializer_class = ProductSerializer
 
 
-class SubcategoryByCategoryView(generics.ListAPIView):
+@method_decorator(catalog_condition, name='get')
+class SubcategoryByCategoryView(CatalogCacheMixin, generics.ListAPIView):
     """
     Возвращает все подкатегории для указанной категории.
     """
@@ -117,3 +233,54 @@ class SubcategoryByCategoryView(generics.ListAPIView):
         return Subcategory.objects.filter(category_id=category_id, is_active=True)
 
 
+class CatalogImportView(APIView):
+    """
+    Массовая загрузка товаров с вариантами из CSV или JSONL для сотрудников.
+
+    Файл обрабатывается в одной транзакции (см. app_catalog.transfer): при
+    ошибках в файле ничего не сохраняется и возвращается 400 со списком ошибок.
+
+    Form Data:
+        file (file): Файл каталога
+        file_format (str, optional): csv или jsonl (по умолчанию — по расширению файла)
+        dry_run (bool, optional): Только проверить файл и вернуть список изменений
+
+    Returns:
+        object: Количество созданных, измененных и неизмененных товаров и вариантов,
+                errors и (для dry_run) diff
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        serializer = CatalogImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        upload = serializer.validated_data['file']
+        file_format = serializer.validated_data.get('file_format') or transfer.detect_format(upload.name)
+        upload.open('rb')
+        result = transfer.import_catalog(upload.file, file_format, dry_run=serializer.validated_data['dry_run'])
+        response_status = status.HTTP_400_BAD_REQUEST if result['errors'] else status.HTTP_200_OK
+        return Response(result, status=response_status)
+
+
+class CatalogExportView(APIView):
+    """
+    Выгружает товары с вариантами для сотрудников потоком, в формате,
+    который принимает CatalogImportView.
+
+    Query Parameters:
+        file_format (str, optional): csv (по умолчанию) или jsonl
+
+    Returns:
+        StreamingHttpResponse: Файл каталога
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        serializer = CatalogExportQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        file_format = serializer.validated_data['file_format']
+        filename = f'catalog-{timezone.localdate():%Y-%m-%d}.{file_format}'
+        return transfer.export_catalog_response(file_format, filename)
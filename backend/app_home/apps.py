@@ -5,3 +5,7 @@ class AppHomeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_home'
     verbose_name = 'Главная'
+
+    def ready(self):
+        # Подключаем обработчики сигналов
+        from . import signals
@@ -0,0 +1,101 @@
+"""
+Сборка документа для первой отрисовки главной страницы (/api/bootstrap/).
+
+Каждый блок совпадает с телом ответа соответствующего отдельного эндпоинта.
+Готовые блоки кэшируются по версии app_home: любое изменение моделей главной
+страницы увеличивает ее (см. signals.py), и следующий запрос пересобирает блоки.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .conditional import get_version
+from .models import Slider, CompanyDetails, SiteLogo, SocialNetwork, DeliveryPayment, AboutUs, DeliveryOption, PhoneNumber, Store
+from .serializers import SliderSerializer, CompanyDetailsSerializer, SiteLogoSerializer, SocialNetworkSerializer, DeliveryPaymentSerializer, AboutUsSerializer, DeliveryOptionSerializer, PhoneNumberSerializer, StoreSerializer
+
+BOOTSTRAP_VERSION = 'app_home'
+
+
+def slider_block(request):
+    queryset = Slider.objects.filter(is_active=True)
+    return {'sliders': SliderSerializer(queryset, many=True, context={'request': request}).data}
+
+
+def company_details_block(request):
+    instance = CompanyDetails.objects.first()
+    if instance is None:
+        return {'company_details': None}
+    return {'company_details': CompanyDetailsSerializer(instance, context={'request': request}).data}
+
+
+def site_logo_block(request):
+    instance = SiteLogo.load()
+    if not instance.logo:
+        return {'site_name': 'BLAKITNY'}
+    return {'logo': SiteLogoSerializer(instance, context={'request': request}).data}
+
+
+def social_networks_block(request):
+    queryset = SocialNetwork.objects.filter(is_active=True)
+    return SocialNetworkSerializer(queryset, many=True, context={'request': request}).data
+
+
+def delivery_payment_block(request):
+    return DeliveryPaymentSerializer(DeliveryPayment.load(), context={'request': request}).data
+
+
+def about_us_block(request):
+    return AboutUsSerializer(AboutUs.load(), context={'request': request}).data
+
+
+def delivery_options_block(request):
+    queryset = DeliveryOption.objects.filter(is_active=True)
+    return {'delivery_options': DeliveryOptionSerializer(queryset, many=True, context={'request': request}).data}
+
+
+def stores_block(request):
+    return StoreSerializer(Store.objects.all(), many=True, context={'request': request}).data
+
+
+def phone_numbers_block(request):
+    queryset = PhoneNumber.objects.filter(is_active=True)
+    return {'phone_numbers': PhoneNumberSerializer(queryset, many=True, context={'request': request}).data}
+
+
+BLOCKS = {
+    'slider': slider_block,
+    'company_details': company_details_block,
+    'site_logo': site_logo_block,
+    'social_networks': social_networks_block,
+    'delivery_payment': delivery_payment_block,
+    'about_us': about_us_block,
+    'delivery_options': delivery_options_block,
+    'stores': stores_block,
+    'phone_numbers': phone_numbers_block,
+}
+
+
+def build_bootstrap(request, names):
+    """
+    Возвращает словарь {имя блока: данные} для запрошенных блоков.
+
+    Блоки берутся из кэша одним get_many; отсутствующие собираются и сохраняются set_many.
+    Ключ учитывает хост, потому что в блоках есть абсолютные ссылки на изображения.
+    """
+    host = hashlib.md5(request.build_absolute_uri('/').encode('utf-8')).hexdigest()
+    prefix = f'bootstrap:{get_version(BOOTSTRAP_VERSION)}:{host}'
+    keys = {name: f'{prefix}:{name}' for name in names}
+    cached = cache.get_many(keys.values())
+
+    document = {}
+    missing = {}
+    for name in names:
+        if keys[name] in cached:
+            document[name] = cached[keys[name]]
+        else:
+            document[name] = BLOCKS[name](request)
+            missing[keys[name]] = document[name]
+    if missing:
+        cache.set_many(missing, settings.BOOTSTRAP_CACHE_TIMEOUT)
+    return document
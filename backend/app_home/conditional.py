@@ -0,0 +1,92 @@
+"""
+Валидаторы для условных GET-запросов (ETag / Last-Modified / 304).
+
+Для моделей без поля updated_at используется счетчик изменений в кэше:
+его значение — время последнего изменения в миллисекундах, увеличивается
+сигналами post_save/post_delete. Валидаторы вычисляются до сериализации
+ответа и не требуют запросов к БД.
+
+Счетчик хранится в кэше using (по умолчанию — default); кэш ответов, который
+он версионирует, должен передавать тот же using, иначе общий бэкенд записей не
+даст общей инвалидации.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import transaction
+from django.views.decorators.http import condition
+
+
+def version_key(name):
+    return f'changes:{name}'
+
+
+def get_version(name, using=DEFAULT_CACHE_ALIAS):
+    cache = caches[using]
+    version = cache.get(version_key(name))
+    if version is None:
+        # Начальное значение от времени: вытесненный счетчик не повторит старую версию
+        cache.add(version_key(name), int(time.time() * 1000), timeout=None)
+        version = cache.get(version_key(name))
+    return version
+
+
+def bump_version(name, using=DEFAULT_CACHE_ALIAS):
+    """
+    Увеличивает счетчик: новое значение не меньше текущего времени и строго больше прежнего.
+    """
+    cache = caches[using]
+    current = cache.get(version_key(name)) or 0
+    cache.set(version_key(name), max(current + 1, int(time.time() * 1000)), timeout=None)
+
+
+def mark_changed(name, using=DEFAULT_CACHE_ALIAS):
+    """
+    Увеличивает счетчик сразу и еще раз после коммита транзакции: иначе запрос,
+    прочитавший старые данные до коммита, получил бы уже новую версию.
+    """
+    bump_version(name, using)
+    transaction.on_commit(lambda: bump_version(name, using))
+
+
+def version_to_datetime(version):
+    return datetime.fromtimestamp(version / 1000, tz=timezone.utc)
+
+
+def _with_format(request, etag):
+    # Браузерный API и JSON — разные представления одного ресурса
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None:
+        return f'{etag}:{renderer.format}'
+    return etag
+
+
+def version_condition(name, using=DEFAULT_CACHE_ALIAS):
+    """
+    Декоратор condition() с валидаторами от счетчика изменений name из кэша using.
+    """
+    def etag(request, *args, **kwargs):
+        return _with_format(request, f'{name}:{get_version(name, using)}')
+
+    def last_modified(request, *args, **kwargs):
+        return version_to_datetime(get_version(name, using))
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def updated_at_condition(model):
+    """
+    Декоратор condition() с валидаторами от поля updated_at синглтона (SingletonModel).
+    Экземпляр берется из model.load(), поэтому при неизменных данных запросов к БД нет.
+    """
+    def etag(request, *args, **kwargs):
+        updated_at = model.load().updated_at
+        if updated_at is None:
+            return None
+        return _with_format(request, f'{model._meta.label_lower}:{updated_at.timestamp()}')
+
+    def last_modified(request, *args, **kwargs):
+        return model.load().updated_at
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
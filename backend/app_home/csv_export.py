@@ -0,0 +1,30 @@
+"""
+Общие части потоковой выгрузки CSV (заказы, каталог).
+
+Строку, которая начинается с символа формулы, Excel и LibreOffice выполнят
+(CSV injection), поэтому при выгрузке она экранируется апострофом, а при
+загрузке выгруженного файла апостроф снимается.
+"""
+# Строку с такого символа табличный редактор считает формулой
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: write() возвращает строку, а не копит ее."""
+
+    def write(self, value):
+        return value
+
+
+def escape_formula(value):
+    """Экранирует апострофом строку, которую табличный редактор выполнил бы как формулу"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def unescape_formula(value):
+    """Снимает апостроф, добавленный escape_formula"""
+    if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
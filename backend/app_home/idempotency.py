@@ -0,0 +1,114 @@
+"""
+Идемпотентные POST/PUT/DELETE-запросы по заголовку Idempotency-Key.
+
+Первый запрос с ключом занимает запись IdempotencyKey, выполняет
+представление и в той же транзакции сохраняет успешный ответ. Повтор с тем же
+ключом возвращает сохраненный ответ, не выполняя представление еще раз.
+Неуспешные ответы не сохраняются: запрос с тем же ключом можно повторить.
+"""
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def request_fingerprint(request):
+    """
+    Отпечаток запроса: ключ нельзя переиспользовать для другого запроса.
+    """
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _claim(user, key, fingerprint):
+    """
+    Занимает ключ. Возвращает (запись, True) для нового или просроченного
+    ключа и (запись, False), если ключ уже использован.
+    """
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user=user, key=key, fingerprint=fingerprint), True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is None:
+        # Запись удалена между вставкой и чтением: первый запрос завершился ошибкой
+        return None, False
+
+    now = timezone.now()
+    expired = record.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    abandoned = (
+        record.status_code is None
+        and record.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    )
+    if not (expired or abandoned):
+        return record, False
+
+    # Условное обновление: просроченный ключ займет только один из параллельных запросов
+    claimed = IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).update(
+        fingerprint=fingerprint, status_code=None, response=None, created_at=now,
+    )
+    if not claimed:
+        return None, False
+    record.fingerprint, record.status_code, record.response, record.created_at = fingerprint, None, None, now
+    return record, True
+
+
+def idempotent(view):
+    """
+    Декоратор функции-представления DRF (под @api_view и @permission_classes).
+    Без заголовка Idempotency-Key представление выполняется как обычно.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response({'error': 'Слишком длинный Idempotency-Key'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        record, created = _claim(request.user, key, fingerprint)
+
+        if not created:
+            if record is None or record.status_code is None:
+                return Response(
+                    {'error': 'Запрос с этим Idempotency-Key еще выполняется'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {'error': 'Idempotency-Key уже использован для другого запроса'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+        try:
+            with transaction.atomic():
+                response = view(request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    record.status_code = response.status_code
+                    record.response = response.data
+                    record.save(update_fields=['status_code', 'response'])
+        except Exception:
+            record.delete()
+            raise
+
+        if not status.is_success(response.status_code):
+            record.delete()
+        return response
+
+    return wrapper
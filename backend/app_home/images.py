@@ -0,0 +1,424 @@
+"""
+Производные изображения (renditions) для загруженных картинок.
+
+Для каждого поля из settings.IMAGE_RENDITIONS после сохранения записи в пуле
+фоновых потоков создаются копии фиксированной ширины в форматах
+IMAGE_RENDITION_FORMATS. Копии лежат рядом с оригиналом и называются
+предсказуемо (<имя>.w<ширина>.<формат>). Изображение не увеличивается: если
+оригинал уже заданной ширины, копия сохраняется в исходном размере.
+
+Ширина оригинала (<поле>_width) записывается при сохранении записи, а список
+созданных копий (<поле>_renditions) — после их создания в фоне; затем сигнал
+renditions_ready увеличивает счетчик изменений модели, чтобы кэш и ETag не
+оставили srcset без копий. В srcset попадают только записанные копии меньшей,
+чем у оригинала, ширины и сам оригинал: сериализаторы не обращаются к
+хранилищу, а URL еще не созданного файла браузер загрузил бы с ошибкой.
+
+Метаданные изображения (размеры, размер файла, основной цвет и крошечная
+размытая заглушка) считаются при сохранении записи (ImageMetadataModel) и
+хранятся в БД, чтобы сериализаторы не открывали файлы.
+"""
+import base64
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': {'extension': 'webp', 'format': 'WEBP', 'options': {'quality': 80, 'method': 4}},
+    'jpeg': {'extension': 'jpg', 'format': 'JPEG', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+}
+
+_executor = None
+
+# Отправляется после записи созданных копий в записи модели sender; обработчики
+# приложений увеличивают счетчики изменений (app_home.signals, app_catalog.signals)
+renditions_ready = Signal()
+
+
+def rendition_name(name, width, image_format):
+    stem, _ = os.path.splitext(name)
+    return f'{stem}.w{width}.{FORMATS[image_format]["extension"]}'
+
+
+def get_widths(key):
+    """Ширины копий для поля "app_label.Model.field" из settings.IMAGE_RENDITIONS"""
+    return tuple(settings.IMAGE_RENDITIONS.get(key, ()))
+
+
+def all_widths():
+    """Все ширины из settings.IMAGE_RENDITIONS: файл может использоваться в разных полях"""
+    return tuple(sorted({width for widths in settings.IMAGE_RENDITIONS.values() for width in widths}))
+
+
+# Сторона заглушки LQIP в пикселях: data URI занимает несколько сотен байт
+PLACEHOLDER_SIZE = 16
+# EXIF Orientation, при которых ширина и высота меняются местами
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def flatten(image):
+    """Изображение в RGB: прозрачные области заливаются белым"""
+    if image.mode == 'RGB':
+        return image
+    rgba = image.convert('RGBA')
+    background = Image.new('RGB', rgba.size, 'white')
+    background.paste(rgba, mask=rgba.getchannel('A'))
+    return background
+
+
+def _encode(image, width, image_format):
+    spec = FORMATS[image_format]
+    resized = image.copy()
+    if resized.width > width:
+        resized.thumbnail((width, resized.height), Image.Resampling.LANCZOS)
+    if spec['format'] == 'JPEG':
+        resized = flatten(resized)
+    buffer = BytesIO()
+    resized.save(buffer, spec['format'], **spec['options'])
+    return buffer.getvalue()
+
+
+def generate_renditions(name, widths, force=False, storage=default_storage):
+    """
+    Создает производные изображения для файла name.
+
+    Если все копии уже есть и force не задан, файл не открывается.
+
+    Returns:
+        int: Количество созданных файлов
+    """
+    targets = [
+        (width, image_format, rendition_name(name, width, image_format))
+        for width in widths for image_format in settings.IMAGE_RENDITION_FORMATS
+    ]
+    if not force:
+        targets = [target for target in targets if not storage.exists(target[2])]
+    if not targets:
+        return 0
+
+    with storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    for width, image_format, target in targets:
+        content = _encode(image, width, image_format)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(content))
+    return len(targets)
+
+
+def read_metadata(file):
+    """
+    Метаданные изображения из открытого файла: width, height (с учетом EXIF
+    Orientation), dominant_color ("#rrggbb") и placeholder (data URI JPEG).
+    """
+    image = Image.open(file)
+    width, height = image.size
+    if image.getexif().get(ExifTags.Base.Orientation) in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    # Для JPEG декодируется уменьшенная копия: полный кадр не нужен
+    image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+    small = flatten(ImageOps.exif_transpose(image))
+    small.thumbnail((PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+
+    # Основной цвет — самый частый из пяти цветов уменьшенной палитры
+    palette = small.quantize(colors=5)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = BytesIO()
+    small.save(buffer, 'JPEG', quality=50)
+    return {
+        'width': width,
+        'height': height,
+        'dominant_color': f'#{red:02x}{green:02x}{blue:02x}',
+        'placeholder': 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii'),
+    }
+
+
+def read_stored_metadata(name, storage=default_storage):
+    """
+    Метаданные файла из хранилища, включая size. Выполняется в процессах
+    пула команды recompute_image_metadata, поэтому не обращается к БД.
+    """
+    with storage.open(name, 'rb') as file:
+        metadata = read_metadata(file)
+    metadata['size'] = storage.size(name)
+    return metadata
+
+
+def image_width(file):
+    """Ширина изображения из открытого файла по заголовку (с учетом EXIF Orientation)"""
+    image = Image.open(file)
+    width, height = image.size
+    return height if image.getexif().get(ExifTags.Base.Orientation) in TRANSPOSED_ORIENTATIONS else width
+
+
+def read_width(name, storage=default_storage):
+    """Ширина изображения name из хранилища. None, если файл не читается."""
+    try:
+        with storage.open(name, 'rb') as file:
+            return image_width(file)
+    except (OSError, ValueError, UnidentifiedImageError, Image.DecompressionBombError):
+        return None
+
+
+def upload_width(file):
+    """Ширина изображения FieldFile, в том числе только что загруженного"""
+    if file._committed:
+        return read_width(file.name, file.storage)
+    try:
+        file.open('rb')
+        try:
+            return image_width(file)
+        finally:
+            # Загруженный файл затем читается хранилищем с начала
+            file.seek(0)
+    except (OSError, ValueError, UnidentifiedImageError, Image.DecompressionBombError):
+        return None
+
+
+def update_image_metadata(instance, field_name='image'):
+    """
+    Заполняет поля ImageMetadataModel для нового файла или если они пусты.
+    Файл, который не удалось прочитать, оставляет поля пустыми.
+    """
+    file = getattr(instance, field_name)
+    if not file:
+        instance.set_image_metadata(None)
+        return
+    # _committed == False — файл только что загружен и еще не сохранен в хранилище
+    if file._committed and instance.image_width is not None:
+        return
+    try:
+        if file._committed:
+            metadata = read_stored_metadata(file.name, file.storage)
+        else:
+            file.open('rb')
+            try:
+                metadata = read_metadata(file)
+            finally:
+                # Загруженный файл затем читается хранилищем с начала
+                file.seek(0)
+            metadata['size'] = file.size
+    except (OSError, ValueError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('Не удалось прочитать метаданные изображения %s', file.name, exc_info=True)
+        metadata = None
+    instance.set_image_metadata(metadata)
+
+
+def delete_renditions(name, widths, storage=default_storage):
+    for width in widths:
+        for image_format in FORMATS:
+            target = rendition_name(name, width, image_format)
+            if storage.exists(target):
+                storage.delete(target)
+
+
+def available_renditions(name, widths, original_width, storage=default_storage):
+    """Ширины меньше original_width, для которых созданы копии во всех форматах"""
+    if not original_width:
+        return []
+    return [
+        width for width in widths
+        if width < original_width and all(
+            storage.exists(rendition_name(name, width, image_format))
+            for image_format in settings.IMAGE_RENDITION_FORMATS
+        )
+    ]
+
+
+def record_renditions(model, field_name, name, widths):
+    """
+    Записывает ширину оригинала и созданные копии файла name во все записи
+    model, которые на него ссылаются.
+
+    Returns:
+        int: Количество обновленных записей
+    """
+    records = model._base_manager.filter(**{field_name: name})
+    original_width = records.exclude(**{f'{field_name}_width': None}).values_list(
+        f'{field_name}_width', flat=True
+    ).first()
+    if original_width is None:
+        # Записи, сохраненные до появления поля ширины
+        original_width = read_width(name, model._meta.get_field(field_name).storage)
+    return records.update(**{
+        f'{field_name}_width': original_width,
+        f'{field_name}_renditions': available_renditions(name, widths, original_width),
+    })
+
+
+def process_renditions(model, field_name, name, widths):
+    """Создает копии файла name, записывает их в записи model и сообщает об этом"""
+    generate_renditions(name, widths)
+    if record_renditions(model, field_name, name, widths):
+        renditions_ready.send(sender=model)
+
+
+def _process_safely(model, field_name, name, widths):
+    try:
+        process_renditions(model, field_name, name, widths)
+    except Exception:
+        logger.exception('Не удалось создать производные изображения для %s', name)
+    finally:
+        # Потоки пула живут долго: соединение с БД не должно оставаться открытым
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_RENDITION_WORKERS, thread_name_prefix='image-renditions'
+        )
+    return _executor
+
+
+def schedule_renditions(model, field_name, name, widths):
+    """
+    Ставит создание копий в очередь пула после коммита транзакции
+    (с IMAGE_RENDITIONS_ASYNC = False — выполняет сразу после коммита).
+    """
+    def run():
+        if settings.IMAGE_RENDITIONS_ASYNC:
+            get_executor().submit(_process_safely, model, field_name, name, widths)
+        else:
+            process_renditions(model, field_name, name, widths)
+
+    transaction.on_commit(run)
+
+
+def build_srcset(request, name, renditions, original_width, storage=default_storage):
+    """
+    Словарь {формат: srcset} для файла name шириной original_width, например
+    {"webp": "https://.../a.w320.webp 320w, https://.../a.jpg 800w", ...}.
+
+    renditions — записанные ширины созданных копий; оригинал добавляется
+    последним кандидатом. Без ширины оригинала srcset не строится.
+    """
+    if not name or not original_width:
+        return None
+
+    def absolute(url):
+        return request.build_absolute_uri(url) if request else url
+
+    original = f'{absolute(storage.url(name))} {original_width}w'
+    srcset = {}
+    for image_format in settings.IMAGE_RENDITION_FORMATS:
+        candidates = [
+            f'{absolute(storage.url(rendition_name(name, width, image_format)))} {width}w'
+            for width in sorted(renditions or ()) if width < original_width
+        ]
+        candidates.append(original)
+        srcset[image_format] = ', '.join(candidates)
+    return srcset
+
+
+class SrcsetField(serializers.Field):
+    """
+    Поле сериализатора с srcset для изображения из атрибута source (FieldFile
+    или имя файла из аннотации). key — поле в settings.IMAGE_RENDITIONS.
+
+    Ширина оригинала и созданные копии берутся из атрибутов <поле>_width и
+    <поле>_renditions записи; если source — имя файла, префикс атрибутов
+    объекта задает prefix (например, "main_image" для аннотаций).
+    """
+
+    def __init__(self, key, prefix=None, **kwargs):
+        kwargs['read_only'] = True
+        self.key = key
+        self.prefix = prefix
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        value = super().get_attribute(instance)
+        if self.prefix:
+            owner, prefix = instance, self.prefix
+        elif value:
+            owner, prefix = value.instance, value.field.name
+        else:
+            return value, None, None
+        return value, getattr(owner, f'{prefix}_width', None), getattr(owner, f'{prefix}_renditions', None)
+
+    def to_representation(self, value):
+        file, width, renditions = value
+        label, field_name = self.key.rsplit('.', 1)
+        storage = apps.get_model(label)._meta.get_field(field_name).storage
+        name = getattr(file, 'name', file)
+        return build_srcset(self.context.get('request'), name, renditions, width, storage=storage)
+
+
+def image_changing(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Записывает ширину нового файла и сбрасывает список его копий: они
+    создаются после коммита и записываются record_renditions.
+    """
+    fields = [field_name for field_name, _ in _registered_fields(sender)]
+    # Как и метаданные ImageMetadataModel, при сохранении части полей не пересчитывается
+    if raw or update_fields is not None or not fields:
+        return
+    stored = {}
+    if not instance._state.adding:
+        stored = sender._base_manager.filter(pk=instance.pk).values(*fields).first() or {}
+    for field_name in fields:
+        file = getattr(instance, field_name)
+        # _committed == False — файл только что загружен и еще не сохранен в хранилище
+        if file._committed and (file.name or '') == (stored.get(field_name) or '') and not instance._state.adding:
+            continue
+        setattr(instance, f'{field_name}_width', upload_width(file) if file else None)
+        setattr(instance, f'{field_name}_renditions', [])
+
+
+def image_changed(sender, instance, **kwargs):
+    for field_name, widths in _registered_fields(sender):
+        file = getattr(instance, field_name)
+        if file:
+            schedule_renditions(sender, field_name, file.name, widths)
+
+
+def image_deleted(sender, instance, **kwargs):
+    for field_name, widths in _registered_fields(sender):
+        file = getattr(instance, field_name)
+        # Общие файлы (app_home.storage) удаляются вместе с копиями, когда на них не остается ссылок
+        if file and not getattr(file.storage, 'reference_counted', False):
+            transaction.on_commit(lambda name=file.name, widths=widths: delete_renditions(name, widths))
+
+
+def _registered_fields(model):
+    return [
+        (key.rsplit('.', 1)[1], tuple(widths))
+        for key, widths in settings.IMAGE_RENDITIONS.items()
+        if key.rsplit('.', 1)[0] == model._meta.label
+    ]
+
+
+def registered_models():
+    """Модели, для полей которых настроены производные изображения"""
+    labels = {key.rsplit('.', 1)[0] for key in settings.IMAGE_RENDITIONS}
+    return [apps.get_model(label) for label in sorted(labels)]
+
+
+def connect_signals():
+    for model in registered_models():
+        pre_save.connect(image_changing, sender=model, dispatch_uid=f'renditions_pre_save_{model._meta.label}')
+        post_save.connect(image_changed, sender=model, dispatch_uid=f'renditions_save_{model._meta.label}')
+        post_delete.connect(image_deleted, sender=model, dispatch_uid=f'renditions_delete_{model._meta.label}')
@@ -0,0 +1,101 @@
+import os
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app_home.models import StoredFile
+from app_home.storage import BLOB_DIR, get_image_storage, reference_counted_fields
+
+RENDITION_RE = re.compile(r'^(?P<stem>.+)\.w\d+\.[0-9a-z]+$')
+
+
+def walk(storage, path):
+    """Имена всех файлов каталога path хранилища (рекурсивно)"""
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield f'{path}/{name}'
+    for directory in directories:
+        yield from walk(storage, f'{path}/{directory}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает ссылки на файлы хранилища изображений (app_home.storage) и удаляет '
+        'файлы и производные изображения, на которые не ссылается ни одна запись'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=settings.MEDIA_ORPHAN_MIN_AGE,
+                            help='Не трогать файлы моложе стольких секунд (загрузки в процессе)')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        storage = get_image_storage()
+        references = Counter()
+        directories = {BLOB_DIR}
+        for model, fields in reference_counted_fields():
+            for field_name in fields:
+                upload_to = model._meta.get_field(field_name).upload_to
+                if isinstance(upload_to, str) and upload_to.strip('/'):
+                    directories.add(upload_to.strip('/'))
+                names = model._base_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                references.update(names.values_list(field_name, flat=True).iterator())
+
+        if not options['dry_run']:
+            self.recount(storage, references)
+
+        stems = {os.path.splitext(name)[0] for name in references}
+        expires = time.time() - options['min_age']
+        deleted = freed = 0
+        for directory in sorted(directories):
+            for name in walk(storage, directory):
+                rendition = RENDITION_RE.match(name)
+                if name in references or (rendition and rendition['stem'] in stems):
+                    continue
+                path = storage.path(name)
+                stat = os.stat(path)
+                if stat.st_mtime > expires:
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(name)
+                elif not self.delete(storage, name):
+                    continue
+                deleted += 1
+                freed += stat.st_size
+
+        action = 'К удалению' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{action} файлов: {deleted}, {freed} байт'))
+
+    def delete(self, storage, name):
+        # Файл мог получить ссылку после подсчета: удаляем, только если строки
+        # StoredFile нет или счетчик в ней по-прежнему нулевой
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is not None:
+                if stored.ref_count:
+                    return False
+                stored.delete()
+            storage.delete(name)
+        return True
+
+    def recount(self, storage, references):
+        """Приводит StoredFile.ref_count к фактическому количеству ссылок"""
+        blobs = {name: count for name, count in references.items() if storage.is_blob(name)}
+        changed = []
+        with transaction.atomic():
+            for stored in StoredFile.objects.select_for_update().iterator():
+                count = blobs.pop(stored.name, 0)
+                if stored.ref_count != count:
+                    stored.ref_count = count
+                    changed.append(stored)
+            StoredFile.objects.bulk_update(changed, ['ref_count'], batch_size=500)
+            StoredFile.objects.bulk_create([
+                StoredFile(name=name, size=storage.size(name), ref_count=count)
+                for name, count in blobs.items() if storage.exists(name)
+            ])
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app_home import images
+
+
+class Command(BaseCommand):
+    help = 'Создает производные изображения (settings.IMAGE_RENDITIONS) для уже загруженных файлов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_RENDITION_WORKERS * 2,
+                            help='Количество параллельных потоков')
+        parser.add_argument('--force', action='store_true', help='Пересоздать существующие копии')
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        updated_models = set()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {}
+            for key, widths in settings.IMAGE_RENDITIONS.items():
+                label, field_name = key.rsplit('.', 1)
+                model = apps.get_model(label)
+                names = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                for name in names.values_list(field_name, flat=True).distinct().iterator():
+                    future = executor.submit(images.generate_renditions, name, tuple(widths), options['force'])
+                    futures[future] = (model, field_name, name, tuple(widths))
+
+            for future in as_completed(futures):
+                model, field_name, name, widths = futures[future]
+                try:
+                    created += future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                # Созданные копии записываются в записи из основного потока
+                if images.record_renditions(model, field_name, name, widths):
+                    updated_models.add(model)
+
+        for model in updated_models:
+            images.renditions_ready.send(sender=model)
+        self.stdout.write(self.style.SUCCESS(f'Создано файлов: {created}, ошибок: {failed}'))
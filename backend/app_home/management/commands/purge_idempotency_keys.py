@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app_home.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Удаляет сохраненные ответы Idempotency-Key старше IDEMPOTENCY_KEY_TTL'
+
+    def handle(self, *args, **options):
+        expires = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+        count, _ = IdempotencyKey.objects.filter(created_at__lt=expires).delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено ключей: {count}'))
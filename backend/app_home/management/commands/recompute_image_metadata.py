@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from app_home.images import read_stored_metadata
+from app_home.models import ImageMetadataModel
+
+BATCH_SIZE = 200
+FIELDS = ['image_width', 'image_height', 'image_size', 'image_color', 'image_placeholder']
+
+
+def read_metadata_or_error(name):
+    """Выполняется в процессе пула: только чтение файла, без БД"""
+    try:
+        return read_stored_metadata(name), None
+    except Exception as error:
+        return None, f'{name}: {error}'
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает метаданные изображений (размеры, размер файла, цвет, заглушку) в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Количество процессов (1 — без пула, в текущем процессе)')
+        parser.add_argument('--all', action='store_true', help='Пересчитать и уже заполненные записи')
+
+    def handle(self, *args, **options):
+        updated = failed = 0
+        models = [model for model in apps.get_models() if issubclass(model, ImageMetadataModel)]
+        if options['workers'] > 1:
+            pool = ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup)
+        else:
+            pool = nullcontext()
+        with pool as executor:
+            for model in models:
+                queryset = model._default_manager.exclude(image='').order_by('pk').only('pk', 'image')
+                if not options['all']:
+                    queryset = queryset.filter(image_width__isnull=True)
+
+                # Пачки по ключу: записи обновляются между чтениями
+                last_pk = 0
+                while batch := list(queryset.filter(pk__gt=last_pk)[:BATCH_SIZE]):
+                    done, errors = self.process(model, batch, executor)
+                    updated, failed, last_pk = updated + done, failed + errors, batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f'Обновлено записей: {updated}, ошибок: {failed}'))
+
+    def process(self, model, batch, executor):
+        changed = []
+        errors = 0
+        names = [instance.image.name for instance in batch]
+        results = executor.map(read_metadata_or_error, names) if executor else map(read_metadata_or_error, names)
+        for instance, (metadata, error) in zip(batch, results):
+            if error:
+                errors += 1
+                self.stderr.write(error)
+                continue
+            instance.set_image_metadata(metadata)
+            changed.append(instance)
+        model._default_manager.bulk_update(changed, FIELDS)
+        return len(changed), errors
@@ -1,5 +1,86 @@
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
+from .conditional import get_version
+from .storage import get_image_storage
+
+# Экземпляры синглтонов в памяти процесса: {label: (версия, время загрузки, экземпляр)}
+_singleton_instances = {}
+
+
+class SingletonModel(models.Model):
+    """
+    Базовая модель настроек с единственной записью (pk=1).
+
+    load() только читает: экземпляр хранится в памяти процесса и сверяется со
+    счетчиком изменений модели (app_home.conditional), который увеличивается
+    сигналами при сохранении. Счетчик в LocMemCache виден только своему
+    процессу, поэтому экземпляр к тому же перечитывается не реже раза в
+    SINGLETON_CACHE_TIMEOUT секунд: другие процессы увидят изменение не позже.
+    Если записи еще нет, возвращается несохраненный экземпляр со значениями по
+    умолчанию — создается запись только из админки.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.pk = 1
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def load(cls):
+        """
+        Возвращает запись настроек без обращения к БД, если она не менялась.
+        Возвращаемый экземпляр общий для запросов процесса — его нельзя изменять.
+        """
+        label = cls._meta.label_lower
+        # Версию читаем до запроса к БД: изменение между ними приведет к перечитыванию
+        version = get_version(label)
+        now = time.monotonic()
+        cached = _singleton_instances.get(label)
+        if cached is not None and cached[0] == version and now - cached[1] < settings.SINGLETON_CACHE_TIMEOUT:
+            return cached[2]
+        instance = cls.objects.filter(pk=1).first() or cls(pk=1)
+        _singleton_instances[label] = (version, now, instance)
+        return instance
+
+
+
+class ImageMetadataModel(models.Model):
+    """
+    Базовая модель с сохраненными метаданными изображения из поля image.
+
+    Метаданные считаются при сохранении нового файла (app_home.images), поэтому
+    сериализаторы отдают размеры и заглушку без обращения к файлам. Пустые поля
+    у старых записей заполняет команда recompute_image_metadata.
+    """
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Ширина')
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Высота')
+    image_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name='Размер файла')
+    image_color = models.CharField(max_length=7, blank=True, editable=False, verbose_name='Основной цвет')
+    image_placeholder = models.TextField(blank=True, editable=False, verbose_name='Заглушка')
+    image_renditions = models.JSONField(default=list, blank=True, editable=False, verbose_name='Созданные копии')
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None:
+            from .images import update_image_metadata
+            update_image_metadata(self)
+        super().save(*args, **kwargs)
+
+    def set_image_metadata(self, metadata):
+        metadata = metadata or {}
+        self.image_width = metadata.get('width')
+        self.image_height = metadata.get('height')
+        self.image_size = metadata.get('size')
+        self.image_color = metadata.get('dominant_color', '')
+        self.image_placeholder = metadata.get('placeholder', '')
 
 class PhoneNumber(models.Model):
     """
@@ -66,8 +147,8 @@ class Feedback(models.Model):
         return f'Обратная связь от {self.name}'
 
 
-class Slider(models.Model):
-    image = models.ImageField(upload_to='slider_images/', verbose_name='Изображение')
+class Slider(ImageMetadataModel):
+    image = models.ImageField(upload_to='slider_images/', storage=get_image_storage, verbose_name='Изображение')
     alt_text = models.CharField(max_length=200, verbose_name='Описание изображения (alt текст)')
     is_active = models.BooleanField(default=True, verbose_name='Отображать')
 
@@ -93,8 +174,10 @@ class CompanyDetails(models.Model):
         return self.name
 
 
-class SiteLogo(models.Model):
-    logo = models.ImageField(upload_to='logo/', verbose_name='Логотип', blank=True, null=True)
+class SiteLogo(SingletonModel):
+    logo = models.ImageField(upload_to='logo/', storage=get_image_storage, verbose_name='Логотип', blank=True, null=True)
+    logo_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Ширина логотипа')
+    logo_renditions = models.JSONField(default=list, blank=True, editable=False, verbose_name='Созданные копии')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
@@ -107,15 +190,12 @@ class SiteLogo(models.Model):
     def __str__(self):
         return f"Логотип сайта ({'установлен' if self.logo else 'не установлен'})"
 
-    @classmethod
-    def load(cls):
-        obj, created = cls.objects.get_or_create(pk=1)
-        return obj
-
 
 class SocialNetwork(models.Model):
     name = models.CharField(max_length=100, verbose_name='Название')
-    icon = models.ImageField(upload_to='social_icons/', verbose_name='Иконка')
+    icon = models.ImageField(upload_to='social_icons/', storage=get_image_storage, verbose_name='Иконка')
+    icon_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Ширина иконки')
+    icon_renditions = models.JSONField(default=list, blank=True, editable=False, verbose_name='Созданные копии')
     link = models.URLField(verbose_name='Ссылка')
     is_active = models.BooleanField(default=True, verbose_name='Активен')
 
@@ -128,7 +208,7 @@ class SocialNetwork(models.Model):
         return self.name
 
 
-class DeliveryPayment(models.Model):
+class DeliveryPayment(SingletonModel):
     delivery_info = models.TextField(verbose_name='Информация о доставке')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
@@ -140,13 +220,8 @@ class DeliveryPayment(models.Model):
     def __str__(self):
         return "Информация о доставке"
 
-    @classmethod
-    def load(cls):
-        obj, created = cls.objects.get_or_create(pk=1)
-        return obj
 
-
-class AboutUs(models.Model):
+class AboutUs(SingletonModel):
     title = models.CharField(max_length=200, verbose_name='Заголовок')
     content = models.TextField(verbose_name='Текстовая информация о компании')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
@@ -159,7 +234,45 @@ class AboutUs(models.Model):
     def __str__(self):
         return self.title
 
-    @classmethod
-    def load(cls):
-        obj, created = cls.objects.get_or_create(pk=1)
-        return obj
+
+class IdempotencyKey(models.Model):
+    """
+    Сохраненный ответ на запрос с заголовком Idempotency-Key (app_home.idempotency).
+
+    Пока запрос выполняется, status_code пуст. Записи старше
+    IDEMPOTENCY_KEY_TTL удаляет команда purge_idempotency_keys.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name='Пользователь')
+    key = models.CharField(max_length=255, verbose_name='Ключ')
+    fingerprint = models.CharField(max_length=64, verbose_name='Отпечаток запроса')
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Код ответа')
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name='Тело ответа')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')
+
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class StoredFile(models.Model):
+    """
+    Файл хранилища с адресацией по содержимому (app_home.storage) и количество
+    ссылающихся на него записей. Файл без ссылок удаляется.
+    """
+    name = models.CharField(max_length=255, unique=True, verbose_name='Имя файла')
+    size = models.PositiveBigIntegerField(verbose_name='Размер файла')
+    ref_count = models.PositiveIntegerField(default=0, verbose_name='Количество ссылок')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+
+    class Meta:
+        verbose_name = 'Загруженный файл'
+        verbose_name_plural = 'Загруженные файлы'
+
+    def __str__(self):
+        return self.name
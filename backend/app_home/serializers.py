@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .images import SrcsetField
 from .models import Slider, CompanyDetails, SiteLogo, SocialNetwork, DeliveryPayment, AboutUs, Feedback, DeliveryOption, PhoneNumber, Store
 
 
@@ -22,10 +23,14 @@ class DeliveryOptionSerializer(serializers.ModelSerializer):
 
 class SliderSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = SrcsetField('app_home.Slider.image', source='image')
 
     class Meta:
         model = Slider
-        fields = ['id', 'image_url', 'alt_text']
+        fields = [
+            'id', 'image_url', 'image_srcset', 'image_width', 'image_height', 'image_size', 'image_color',
+            'image_placeholder', 'alt_text'
+        ]
 
     def get_image_url(self, obj):
         request = self.context.get('request')
@@ -44,10 +49,11 @@ class CompanyDetailsSerializer(serializers.ModelSerializer):
 
 class SiteLogoSerializer(serializers.ModelSerializer):
     logo_url = serializers.SerializerMethodField()
+    logo_srcset = SrcsetField('app_home.SiteLogo.logo', source='logo')
 
     class Meta:
         model = SiteLogo
-        fields = ['id', 'logo_url', 'created_at', 'updated_at']
+        fields = ['id', 'logo_url', 'logo_srcset', 'created_at', 'updated_at']
 
     def get_logo_url(self, obj):
         request = self.context.get('request')
@@ -60,10 +66,11 @@ class SiteLogoSerializer(serializers.ModelSerializer):
 
 class SocialNetworkSerializer(serializers.ModelSerializer):
     icon_url = serializers.SerializerMethodField()
+    icon_srcset = SrcsetField('app_home.SocialNetwork.icon', source='icon')
 
     class Meta:
         model = SocialNetwork
-        fields = ['id', 'name', 'icon_url', 'link', 'is_active']
+        fields = ['id', 'name', 'icon_url', 'icon_srcset', 'link', 'is_active']
 
     def get_icon_url(self, obj):
         request = self.context.get('request')
@@ -0,0 +1,43 @@
+from django.db.models.signals import post_delete, post_save
+
+from . import images, storage
+from .bootstrap import BOOTSTRAP_VERSION
+from .conditional import mark_changed
+from .models import Slider, CompanyDetails, SiteLogo, SocialNetwork, DeliveryPayment, AboutUs, DeliveryOption, PhoneNumber, Store
+
+# Модели с собственным счетчиком изменений: валидаторы ETag / Last-Modified для моделей
+# без updated_at и сверка экземпляров синглтонов в памяти процесса (SingletonModel.load)
+VERSIONED_MODELS = (Slider, CompanyDetails, SocialNetwork, DeliveryOption, Store, PhoneNumber, SiteLogo, DeliveryPayment, AboutUs)
+# Модели, из которых собирается /api/bootstrap/
+BOOTSTRAP_MODELS = VERSIONED_MODELS
+
+
+def model_changed(sender, **kwargs):
+    """Увеличивает счетчик изменений модели"""
+    mark_changed(sender._meta.label_lower)
+
+
+def bootstrap_changed(sender, **kwargs):
+    """Сбрасывает кэш и валидаторы /api/bootstrap/"""
+    mark_changed(BOOTSTRAP_VERSION)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(model_changed, sender=model, dispatch_uid=f'home_changed_save_{model.__name__}')
+    post_delete.connect(model_changed, sender=model, dispatch_uid=f'home_changed_delete_{model.__name__}')
+
+for model in BOOTSTRAP_MODELS:
+    post_save.connect(bootstrap_changed, sender=model, dispatch_uid=f'bootstrap_changed_save_{model.__name__}')
+    post_delete.connect(bootstrap_changed, sender=model, dispatch_uid=f'bootstrap_changed_delete_{model.__name__}')
+
+# Созданные в фоне копии изображений меняют srcset в ответах
+for model in VERSIONED_MODELS:
+    images.renditions_ready.connect(model_changed, sender=model, dispatch_uid=f'home_changed_renditions_{model.__name__}')
+for model in BOOTSTRAP_MODELS:
+    images.renditions_ready.connect(bootstrap_changed, sender=model, dispatch_uid=f'bootstrap_changed_renditions_{model.__name__}')
+
+# Производные изображения для полей из settings.IMAGE_RENDITIONS (в том числе каталога)
+images.connect_signals()
+
+# Счетчики ссылок на файлы хранилища с адресацией по содержимому
+storage.connect_signals()
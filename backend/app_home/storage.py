@@ -0,0 +1,184 @@
+"""
+Хранилище загруженных изображений с адресацией по содержимому.
+
+Имя файла — SHA-256 содержимого (images/ab/ab12...ef.jpg), поэтому одинаковые
+файлы, загруженные в разные записи, хранятся один раз, а URL можно кэшировать
+навсегда (Cache-Control: immutable в app_home.media). upload_to полей на имя
+не влияет. Производные изображения (app_home.images) лежат рядом с оригиналом
+и тоже общие.
+
+Ссылки на файлы учитываются в StoredFile: счетчик меняется сигналами моделей,
+поля которых используют это хранилище. Когда ссылок не остается, файл и его
+производные удаляются после коммита, если файл старше MEDIA_ORPHAN_MIN_AGE:
+повторная загрузка тех же байтов обновляет время изменения файла и получает
+его имя раньше, чем сохраняется ссылка. Такие файлы, файлы, загруженные до
+перехода на это хранилище, и сбои счетчика обрабатывает команда
+collect_media_garbage.
+"""
+import hashlib
+import os
+import re
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+
+BLOB_DIR = 'images'
+BLOB_NAME_RE = re.compile(r'^%s/[0-9a-f]{2}/[0-9a-f]{64}(\.[0-9a-z]+)?$' % BLOB_DIR)
+
+
+def get_image_storage():
+    """Хранилище для полей изображений (STORAGES["images"])"""
+    return storages['images']
+
+
+def file_digest(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage, сохраняющее файл под именем из хеша содержимого.
+    Если такой файл уже есть, повторная запись не выполняется.
+    """
+    reference_counted = True
+
+    def blob_name(self, digest, name):
+        extension = os.path.splitext(name)[1].lower()
+        if not re.fullmatch(r'\.[0-9a-z]+', extension):
+            extension = ''
+        return f'{BLOB_DIR}/{digest[:2]}/{digest}{extension}'
+
+    def is_blob(self, name):
+        return bool(name) and BLOB_NAME_RE.match(name) is not None
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.blob_name(file_digest(content), name)
+        try:
+            # Свежее время изменения защищает файл от delete_if_orphaned и
+            # collect_media_garbage, пока запись со ссылкой на него не сохранена
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            # Файла нет или его только что удалили как файл без ссылок: записываем заново
+            pass
+        # При параллельной загрузке тех же байтов базовый класс добавит к имени
+        # суффикс: файл сохранится дважды, но с тем же содержимым
+        return super().save(name, content, max_length=max_length)
+
+
+def _reference_fields(model):
+    return [
+        field.name for field in model._meta.get_fields()
+        if getattr(getattr(field, 'storage', None), 'reference_counted', False)
+    ]
+
+
+def reference_counted_fields():
+    """Пары (модель, [поля]) для всех полей с хранилищем ContentAddressedStorage"""
+    result = []
+    for model in apps.get_models():
+        fields = _reference_fields(model)
+        if fields:
+            result.append((model, fields))
+    return result
+
+
+def add_reference(name, storage):
+    from .models import StoredFile
+
+    if not storage.is_blob(name):
+        return
+    files = StoredFile.objects.filter(name=name)
+    if files.update(ref_count=F('ref_count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            StoredFile.objects.create(name=name, size=storage.size(name), ref_count=1)
+    except IntegrityError:
+        # Запись создал параллельный запрос
+        files.update(ref_count=F('ref_count') + 1)
+
+
+def remove_reference(name, storage):
+    from .models import StoredFile
+
+    if not storage.is_blob(name):
+        return
+    StoredFile.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    transaction.on_commit(lambda: delete_if_orphaned(name, storage))
+
+
+def delete_if_orphaned(name, storage):
+    """
+    Удаляет файл и его производные, если на него не осталось ссылок и файл
+    старше MEDIA_ORPHAN_MIN_AGE. Более новый файл мог только что получить
+    повторная загрузка (см. ContentAddressedStorage.save): его строка StoredFile
+    с нулевым счетчиком остается для collect_media_garbage.
+
+    Returns:
+        bool: Файл удален
+    """
+    from .images import all_widths, delete_renditions
+    from .models import StoredFile
+
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(name=name, ref_count=0).first()
+        if stored is None:
+            return False
+        try:
+            age = time.time() - os.stat(storage.path(name)).st_mtime
+        except FileNotFoundError:
+            age = None
+        if age is not None and age < settings.MEDIA_ORPHAN_MIN_AGE:
+            return False
+        stored.delete()
+        storage.delete(name)
+    delete_renditions(name, all_widths(), storage=storage)
+    return True
+
+
+def remember_files(sender, instance, **kwargs):
+    """Запоминает имена файлов до сохранения, чтобы после него сравнить их с новыми"""
+    fields = _reference_fields(sender)
+    old_names = {}
+    if not instance._state.adding and instance.pk is not None:
+        old_names = sender._base_manager.filter(pk=instance.pk).values(*fields).first() or {}
+    instance._stored_file_names = old_names
+
+
+def files_saved(sender, instance, **kwargs):
+    old_names = getattr(instance, '_stored_file_names', {})
+    for field_name in _reference_fields(sender):
+        file = getattr(instance, field_name)
+        old_name, new_name = old_names.get(field_name) or '', file.name or ''
+        if old_name == new_name:
+            continue
+        add_reference(new_name, file.storage)
+        remove_reference(old_name, file.storage)
+
+
+def files_deleted(sender, instance, **kwargs):
+    for field_name in _reference_fields(sender):
+        file = getattr(instance, field_name)
+        remove_reference(file.name or '', file.storage)
+
+
+def connect_signals():
+    for model, _ in reference_counted_fields():
+        label = model._meta.label
+        pre_save.connect(remember_files, sender=model, dispatch_uid=f'stored_files_pre_save_{label}')
+        post_save.connect(files_saved, sender=model, dispatch_uid=f'stored_files_save_{label}')
+        post_delete.connect(files_deleted, sender=model, dispatch_uid=f'stored_files_delete_{label}')
@@ -1,5 +1,24 @@
-from django.test import TestCase
-from .models import Store
+import os
+import shutil
+import tempfile
+from unittest import mock
+from datetime import timedelta
+from io import BytesIO, StringIO
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from .bootstrap import BOOTSTRAP_VERSION
+from .conditional import get_version
+from .images import get_widths, process_renditions, rendition_name
+from .models import Store, Slider, AboutUs, PhoneNumber, SiteLogo, DeliveryPayment, IdempotencyKey, StoredFile
+from .serializers import SliderSerializer
 
 
 class StoreTestCase(TestCase):
@@ -52,4 +71,429 @@ class StoreTestCase(TestCase):
         self.assertEqual(stores[0].city, "Москва")
         self.assertEqual(stores[0].address, "Тверская ул., д. 1")
         self.assertEqual(stores[1].address, "ул. Арбат, д. 10")
-        self.assertEqual(stores[2].city, "Санкт-Петербург")
\ No newline at end of file
+        self.assertEqual(stores[2].city, "Санкт-Петербург")
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_endpoint_returns_304_without_queries(self):
+        """Тест ETag для списка: повторный запрос не обращается к БД"""
+        Slider.objects.create(image='slider_images/1.jpg', alt_text="Слайд")
+        response = self.client.get('/api/slider/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/slider/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        Slider.objects.create(image='slider_images/2.jpg', alt_text="Новый слайд")
+        changed = self.client.get('/api/slider/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.data['sliders']), 2)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_singleton_validators_follow_updated_at(self):
+        """Тест валидаторов синглтона по полю updated_at"""
+        about = AboutUs.objects.create(pk=1, title="О нас", content="Текст")
+        response = self.client.get('/api/about-us/')
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/about-us/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(
+            self.client.get('/api/about-us/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304
+        )
+
+        about.content = "Новый текст"
+        about.save()
+        changed = self.client.get('/api/about-us/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data['content'], "Новый текст")
+
+    def test_catalog_endpoint_returns_304(self):
+        """Тест условного запроса к каталогу"""
+        response = self.client.get('/api/catalog/categories/')
+        cached = self.client.get('/api/catalog/categories/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+
+class BootstrapTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        Store.objects.create(city="Минск", address="пр. Независимости, 1", work_schedule="Пн-Вс")
+        PhoneNumber.objects.create(phone_number="+375291234567")
+
+    def test_bootstrap_contains_all_blocks(self):
+        """Тест: документ содержит все блоки в формате отдельных эндпоинтов"""
+        response = self.client.get('/api/bootstrap/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {
+            'slider', 'company_details', 'site_logo', 'social_networks', 'delivery_payment',
+            'about_us', 'delivery_options', 'stores', 'phone_numbers',
+        })
+        self.assertEqual(response.data['site_logo'], {'site_name': 'BLAKITNY'})
+        self.assertEqual(response.data['stores'][0]['city'], "Минск")
+        self.assertEqual(response.data['phone_numbers']['phone_numbers'][0]['phone_number'], "+375291234567")
+
+    def test_selected_blocks_are_served_from_cache(self):
+        """Тест: повторный запрос блоков не обращается к БД"""
+        url = '/api/bootstrap/?blocks=stores,phone_numbers'
+        response = self.client.get(url)
+        self.assertEqual(set(response.data), {'stores', 'phone_numbers'})
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached.data, response.data)
+
+    def test_bootstrap_is_invalidated_by_home_models(self):
+        """Тест: изменение модели главной страницы пересобирает документ"""
+        url = '/api/bootstrap/?blocks=stores'
+        response = self.client.get(url)
+        Store.objects.create(city="Гродно", address="ул. Советская, 2", work_schedule="Пн-Пт")
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.data['stores']), 2)
+
+    def test_unknown_block(self):
+        response = self.client.get('/api/bootstrap/?blocks=stores,weather')
+        self.assertEqual(response.status_code, 400)
+
+
+class SingletonLoadTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_public_get_does_not_create_record(self):
+        """Тест: GET без записи в БД отдает значения по умолчанию и ничего не создает"""
+        response = self.client.get('/api/delivery-payment/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['delivery_info'], '')
+        self.assertEqual(self.client.get('/api/site-logo/').data, {'site_name': 'BLAKITNY'})
+        self.assertFalse(DeliveryPayment.objects.exists())
+        self.assertFalse(SiteLogo.objects.exists())
+
+    def test_load_is_served_from_memory_until_saved(self):
+        """Тест: повторная загрузка без запросов к БД, сохранение обновляет экземпляр"""
+        AboutUs.objects.create(title="О нас", content="Первая версия")
+        self.assertEqual(AboutUs.load().content, "Первая версия")
+        with self.assertNumQueries(0):
+            self.client.get('/api/about-us/')
+
+        about = AboutUs.objects.get()
+        about.content = "Вторая версия"
+        about.save()
+        self.assertEqual(AboutUs.load().content, "Вторая версия")
+
+    def test_load_rereads_after_timeout(self):
+        """Тест: изменение из другого процесса (без счетчика) видно после SINGLETON_CACHE_TIMEOUT"""
+        AboutUs.objects.create(title="О нас", content="Первая версия")
+        self.assertEqual(AboutUs.load().content, "Первая версия")
+        # update() не отправляет сигналы, как запись из другого процесса с локальным счетчиком
+        AboutUs.objects.update(content="Вторая версия")
+        self.assertEqual(AboutUs.load().content, "Первая версия")
+
+        with override_settings(SINGLETON_CACHE_TIMEOUT=0):
+            self.assertEqual(AboutUs.load().content, "Вторая версия")
+
+    def test_record_is_always_saved_with_pk_1(self):
+        """Тест: запись из админки сохраняется с pk=1"""
+        about = AboutUs(title="О нас", content="Текст")
+        about.save()
+        self.assertEqual(about.pk, 1)
+        self.assertEqual(AboutUs.load().title, "О нас")
+
+
+class IdempotencyKeyPurgeTestCase(TestCase):
+    def test_purge_removes_only_expired_keys(self):
+        """Тест удаления ключей идемпотентности старше IDEMPOTENCY_KEY_TTL"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        expired = IdempotencyKey.objects.create(user=user, key='old', fingerprint='x', status_code=201)
+        fresh = IdempotencyKey.objects.create(user=user, key='new', fingerprint='x', status_code=201)
+        IdempotencyKey.objects.filter(pk=expired.pk).update(
+            created_at=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL + 1)
+        )
+
+        call_command('purge_idempotency_keys', stdout=StringIO())
+
+        self.assertEqual(list(IdempotencyKey.objects.values_list('pk', flat=True)), [fresh.pk])
+
+
+class UploadedImagesTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, IMAGE_RENDITIONS_ASYNC=False, MEDIA_ORPHAN_MIN_AGE=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, width, height):
+        buffer = BytesIO()
+        Image.new('RGBA', (width, height), (200, 30, 30, 128)).save(buffer, 'PNG')
+        return SimpleUploadedFile('slide.png', buffer.getvalue(), content_type='image/png')
+
+    def rendition_size(self, name, width, image_format):
+        with default_storage.open(rendition_name(name, width, image_format), 'rb') as file:
+            return Image.open(file).size
+
+    def test_renditions_are_created_after_upload(self):
+        """Тест создания копий фиксированной ширины после загрузки"""
+        with self.captureOnCommitCallbacks(execute=True):
+            slider = Slider.objects.create(image=self.upload(1600, 800), alt_text='Слайд')
+        name = slider.image.name
+
+        self.assertEqual(self.rendition_size(name, 640, 'webp'), (640, 320))
+        self.assertEqual(self.rendition_size(name, 1280, 'jpeg'), (1280, 640))
+        # Оригинал шириной 1600 не увеличивается до 1920
+        self.assertEqual(self.rendition_size(name, 1920, 'jpeg'), (1600, 800))
+
+        # Созданные копии записываются в запись, сериализатор не обращается к хранилищу
+        slider.refresh_from_db()
+        self.assertEqual(slider.image_renditions, [640, 1280])
+        with mock.patch.object(type(slider.image.storage), 'exists') as exists, \
+                mock.patch('app_home.images.Image.open') as image_open:
+            srcset = SliderSerializer(slider).data['image_srcset']
+        exists.assert_not_called()
+        image_open.assert_not_called()
+        self.assertEqual(set(srcset), {'webp', 'jpeg'})
+        self.assertEqual(srcset['webp'], ', '.join([
+            f'{default_storage.url(rendition_name(name, 640, "webp"))} 640w',
+            f'{default_storage.url(rendition_name(name, 1280, "webp"))} 1280w',
+            # Копия 1920 не шире оригинала и не попадает в srcset, оригинал — последний кандидат
+            f'{default_storage.url(name)} 1600w',
+        ]))
+
+    def test_srcset_lists_only_existing_renditions(self):
+        """Тест: пока копии не созданы, srcset содержит только оригинал"""
+        slider = Slider.objects.create(image=self.upload(800, 400), alt_text='Слайд')
+        srcset = SliderSerializer(slider).data['image_srcset']
+        self.assertEqual(srcset['jpeg'], f'{default_storage.url(slider.image.name)} 800w')
+
+    def test_created_renditions_bump_versions(self):
+        """Тест: запись созданных копий сбрасывает кэш и валидаторы ответов"""
+        slider = Slider.objects.create(image=self.upload(1600, 800), alt_text='Слайд')
+        versions = (get_version('app_home.slider'), get_version(BOOTSTRAP_VERSION))
+
+        process_renditions(Slider, 'image', slider.image.name, get_widths('app_home.Slider.image'))
+
+        self.assertNotEqual(versions[0], get_version('app_home.slider'))
+        self.assertNotEqual(versions[1], get_version(BOOTSTRAP_VERSION))
+
+    def test_renditions_are_deleted_with_record(self):
+        """Тест удаления копий вместе с записью"""
+        with self.captureOnCommitCallbacks(execute=True):
+            slider = Slider.objects.create(image=self.upload(800, 400), alt_text='Слайд')
+        name = slider.image.name
+        self.assertTrue(default_storage.exists(rendition_name(name, 640, 'webp')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            slider.delete()
+        self.assertFalse(default_storage.exists(rendition_name(name, 640, 'webp')))
+
+    def test_backfill_command_processes_existing_images(self):
+        """Тест команды создания копий для уже загруженных изображений"""
+        slider = Slider.objects.create(image=self.upload(800, 400), alt_text='Слайд')
+        name = slider.image.name
+        self.assertFalse(default_storage.exists(rendition_name(name, 640, 'jpeg')))
+
+        call_command('generate_image_renditions', stdout=StringIO())
+
+        self.assertEqual(self.rendition_size(name, 640, 'jpeg'), (640, 320))
+        self.assertEqual(self.rendition_size(name, 1280, 'webp'), (800, 400))
+        slider.refresh_from_db()
+        self.assertEqual(slider.image_renditions, [640])
+
+    def test_new_file_resets_recorded_renditions(self):
+        """Тест: при замене файла записанные копии сбрасываются до их создания"""
+        with self.captureOnCommitCallbacks(execute=True):
+            slider = Slider.objects.create(image=self.upload(1600, 800), alt_text='Слайд')
+        slider.refresh_from_db()
+        self.assertEqual(slider.image_renditions, [640, 1280])
+
+        slider.image = self.upload(700, 350)
+        slider.save()
+        slider.refresh_from_db()
+        self.assertEqual((slider.image_width, slider.image_renditions), (700, []))
+        self.assertEqual(
+            SliderSerializer(slider).data['image_srcset']['webp'], f'{default_storage.url(slider.image.name)} 700w'
+        )
+
+    def test_metadata_is_saved_with_upload(self):
+        """Тест сохранения размеров, цвета и заглушки при загрузке"""
+        upload = self.upload(1600, 800)
+        slider = Slider.objects.create(image=upload, alt_text='Слайд')
+        slider.refresh_from_db()
+
+        self.assertEqual((slider.image_width, slider.image_height), (1600, 800))
+        self.assertEqual(slider.image_size, upload.size)
+        self.assertRegex(slider.image_color, r'^#[0-9a-f]{6}$')
+        self.assertTrue(slider.image_placeholder.startswith('data:image/jpeg;base64,'))
+
+        # Сериализатор не открывает файл
+        with mock.patch('app_home.images.Image.open') as image_open:
+            data = SliderSerializer(slider).data
+        image_open.assert_not_called()
+        self.assertEqual((data['image_width'], data['image_height']), (1600, 800))
+        self.assertEqual(data['image_placeholder'], slider.image_placeholder)
+
+    def test_unreadable_image_leaves_metadata_empty(self):
+        """Тест записи с отсутствующим файлом"""
+        slider = Slider.objects.create(image='slider_images/missing.jpg', alt_text='Слайд')
+        self.assertIsNone(slider.image_width)
+        self.assertEqual(slider.image_placeholder, '')
+
+    def test_recompute_command_fills_missing_metadata(self):
+        """Тест команды пересчета метаданных"""
+        slider = Slider.objects.create(image=self.upload(800, 400), alt_text='Слайд')
+        Slider.objects.filter(pk=slider.pk).update(image_width=None, image_height=None, image_placeholder='')
+
+        call_command('recompute_image_metadata', workers=1, stdout=StringIO())
+
+        slider.refresh_from_db()
+        self.assertEqual((slider.image_width, slider.image_height), (800, 400))
+        self.assertTrue(slider.image_placeholder)
+
+    def test_identical_uploads_share_one_file(self):
+        """Тест хранения одинаковых загрузок одним файлом со счетчиком ссылок"""
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Slider.objects.create(image=self.upload(800, 400), alt_text='Слайд 1')
+            second = Slider.objects.create(image=self.upload(800, 400), alt_text='Слайд 2')
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertRegex(name, r'^images/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(rendition_name(name, 640, 'webp')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(rendition_name(name, 640, 'webp')))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_replaced_image_is_released(self):
+        """Тест освобождения старого файла при замене изображения"""
+        slider = Slider.objects.create(image=self.upload(800, 400), alt_text='Слайд')
+        old_name = slider.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            slider.image = self.upload(400, 200)
+            slider.save()
+        self.assertNotEqual(slider.image.name, old_name)
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertEqual(StoredFile.objects.get(name=slider.image.name).ref_count, 1)
+
+    @override_settings(MEDIA_ORPHAN_MIN_AGE=60 * 60)
+    def test_recent_orphan_is_kept_for_repeated_upload(self):
+        """Тест: свежий файл без ссылок не удаляется сразу, его может получить повторная загрузка"""
+        with self.captureOnCommitCallbacks(execute=True):
+            slider = Slider.objects.create(image=self.upload(800, 400), alt_text='Слайд')
+        name = slider.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            slider.delete()
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            again = Slider.objects.create(image=self.upload(800, 400), alt_text='Слайд')
+        self.assertEqual(again.image.name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 1)
+
+        call_command('collect_media_garbage', min_age=0, stdout=StringIO())
+        self.assertTrue(default_storage.exists(name))
+
+    def test_garbage_collection_removes_orphans(self):
+        """Тест удаления файлов без ссылок командой collect_media_garbage"""
+        slider = Slider.objects.create(image=self.upload(800, 400), alt_text='Слайд')
+        legacy = default_storage.save('slider_images/legacy.png', ContentFile(b'legacy'))
+        orphan = default_storage.save(rendition_name('images/00/orphan.png', 640, 'webp'), ContentFile(b'orphan'))
+        StoredFile.objects.filter(name=slider.image.name).update(ref_count=5)
+
+        call_command('collect_media_garbage', min_age=0, dry_run=True, stdout=StringIO())
+        self.assertTrue(default_storage.exists(legacy))
+
+        call_command('collect_media_garbage', min_age=0, stdout=StringIO())
+        self.assertFalse(default_storage.exists(legacy))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(slider.image.name))
+        self.assertEqual(StoredFile.objects.get(name=slider.image.name).ref_count, 1)
+
+
+class MediaServingTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_SENDFILE=None)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.content = bytes(range(100))
+        default_storage.save('files/data.bin', ContentFile(self.content))
+
+    def get(self, path, **headers):
+        response = self.client.get(path, headers=headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_full_file_with_validators(self):
+        """Тест отдачи файла целиком с ETag и Last-Modified"""
+        response = self.get('/media/files/data.bin')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}')
+
+        not_modified = self.get('/media/files/data.bin', if_none_match=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.get('/media/files/data.bin', if_modified_since=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_range_requests(self):
+        """Тест ответов на Range"""
+        response = self.get('/media/files/data.bin', range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        response = self.get('/media/files/data.bin', range='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+
+        response = self.get('/media/files/data.bin', range='bytes=200-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+        # Устаревший If-Range: отдается весь файл
+        response = self.get('/media/files/data.bin', range='bytes=10-19', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_hashed_names_are_immutable(self):
+        """Тест долгого кэширования файлов с хешем содержимого в имени"""
+        default_storage.save('files/0123456789abcdef0123.w320.webp', ContentFile(b'webp'))
+        response = self.get('/media/files/0123456789abcdef0123.w320.webp')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_sendfile_handoff(self):
+        """Тест передачи файла фронт-прокси"""
+        with self.settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.get('/media/files/data.bin')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/files/data.bin')
+        self.assertEqual(response.content, b'')
+
+        with self.settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.get('/media/files/data.bin')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'files', 'data.bin'))
+
+    def test_missing_and_outside_files(self):
+        """Тест 404 для отсутствующих файлов и путей вне MEDIA_ROOT"""
+        self.assertEqual(self.get('/media/files/missing.bin').status_code, 404)
+        self.assertEqual(self.get('/media/files/').status_code, 404)
+        self.assertEqual(self.get('/media/../_settings/settings.py').status_code, 404)
+        self.assertEqual(self.client.post('/media/files/data.bin').status_code, 405)
@@ -12,4 +12,5 @@ urlpatterns = [
     path("phone-numbers/", views.PhoneNumberListView.as_view(), name="phone_numbers_api"),
     path("about-us/", views.AboutUsView.as_view(), name="about_us_api"),
     path("feedback/", views.FeedbackCreateView.as_view(), name="feedback_api"),
+    path("bootstrap/", views.BootstrapView.as_view(), name="bootstrap_api"),
 ]
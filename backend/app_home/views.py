@@ -3,10 +3,14 @@ from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework import status
+from django.utils.decorators import method_decorator
+from .bootstrap import BLOCKS, BOOTSTRAP_VERSION, build_bootstrap
+from .conditional import version_condition, updated_at_condition
 from .models import Slider, CompanyDetails, SiteLogo, SocialNetwork, DeliveryPayment, AboutUs, Feedback, DeliveryOption, PhoneNumber, Store
 from .serializers import SliderSerializer, CompanyDetailsSerializer, SiteLogoSerializer, SocialNetworkSerializer, DeliveryPaymentSerializer, AboutUsSerializer, FeedbackSerializer, DeliveryOptionSerializer, PhoneNumberSerializer, StoreSerializer
 
 
+@method_decorator(version_condition('app_home.slider'), name='get')
 class SliderListView(generics.ListAPIView):
     """
     API endpoint that returns active slider images
@@ -30,6 +34,7 @@ class SliderListView(generics.ListAPIView):
         return Response({"sliders": serializer.data})
 
 
+@method_decorator(version_condition('app_home.companydetails'), name='get')
 class CompanyDetailsView(generics.RetrieveAPIView):
     """
     API endpoint that returns company details
@@ -66,6 +71,7 @@ class CompanyDetailsView(generics.RetrieveAPIView):
             return Response({"company_details": None})
 
 
+@method_decorator(updated_at_condition(SiteLogo), name='get')
 class SiteLogoView(generics.RetrieveAPIView):
     """
     API endpoint that returns site logo
@@ -99,7 +105,7 @@ class SiteLogoView(generics.RetrieveAPIView):
         Returns:
             SiteLogo: Объект логотипа сайта
         """
-        # Получаем или создаем единственный экземпляр логотипа
+        # Читаем единственный экземпляр логотипа без записи в БД
         return self.queryset.model.load()
 
     @property
@@ -114,6 +120,7 @@ class SiteLogoView(generics.RetrieveAPIView):
         return SiteLogo.objects.all()
 
 
+@method_decorator(version_condition('app_home.socialnetwork'), name='get')
 class SocialNetworkListView(generics.ListAPIView):
     """
     API endpoint that returns social networks
@@ -135,6 +142,7 @@ class SocialNetworkListView(generics.ListAPIView):
         return super().list(request, *args, **kwargs)
 
 
+@method_decorator(updated_at_condition(DeliveryPayment), name='get')
 class DeliveryPaymentView(generics.RetrieveAPIView):
     """
     API endpoint that returns delivery and payment information
@@ -149,7 +157,7 @@ class DeliveryPaymentView(generics.RetrieveAPIView):
         Returns:
             DeliveryPayment: Объект с информацией о доставке и оплате
         """
-        # Получаем или создаем единственный экземпляр информации о доставке и оплате
+        # Читаем единственный экземпляр информации о доставке и оплате без записи в БД
         return self.queryset.model.load()
 
     @property
@@ -164,6 +172,7 @@ class DeliveryPaymentView(generics.RetrieveAPIView):
         return DeliveryPayment.objects.all()
 
 
+@method_decorator(updated_at_condition(AboutUs), name='get')
 class AboutUsView(generics.RetrieveAPIView):
     """
     API endpoint that returns 'About Us' information
@@ -178,7 +187,7 @@ class AboutUsView(generics.RetrieveAPIView):
         Returns:
             AboutUs: Объект с информацией "О нас"
         """
-        # Получаем или создаем единственный экземпляр информации "О нас"
+        # Читаем единственный экземпляр информации "О нас" без записи в БД
         return self.queryset.model.load()
 
     @property
@@ -193,6 +202,7 @@ class AboutUsView(generics.RetrieveAPIView):
         return AboutUs.objects.all()
 
 
+@method_decorator(version_condition('app_home.deliveryoption'), name='get')
 class DeliveryOptionListView(generics.ListAPIView):
     """
     API endpoint that returns active delivery options
@@ -216,6 +226,7 @@ class DeliveryOptionListView(generics.ListAPIView):
         return Response({"delivery_options": serializer.data})
 
 
+@method_decorator(version_condition('app_home.store'), name='get')
 class StoreListView(generics.ListAPIView):
     """
     API endpoint that returns all stores
@@ -225,6 +236,7 @@ class StoreListView(generics.ListAPIView):
     serializer_class = StoreSerializer
 
 
+@method_decorator(version_condition('app_home.phonenumber'), name='get')
 class PhoneNumberListView(generics.ListAPIView):
     """
     API endpoint that returns active phone numbers
@@ -263,3 +275,39 @@ class FeedbackCreateView(APIView):
                 status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@method_decorator(version_condition(BOOTSTRAP_VERSION), name='get')
+class BootstrapView(APIView):
+    """
+    API endpoint that returns all home page blocks in one document
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        """
+        Возвращает данные для первой отрисовки главной страницы одним ответом.
+
+        Каждый блок совпадает с телом ответа отдельного эндпоинта
+        (slider, company-details, site-logo, social-networks, delivery-payment,
+        about-us, delivery-options, stores, phone-numbers).
+
+        Args:
+            request: HTTP-запрос; query-параметр blocks — имена блоков через запятую
+                (по умолчанию все)
+
+        Returns:
+            Response: JSON-ответ {имя блока: данные}
+        """
+        blocks = request.query_params.get('blocks')
+        if blocks:
+            names = [name for name in blocks.split(',') if name]
+            unknown = [name for name in names if name not in BLOCKS]
+            if unknown:
+                return Response(
+                    {"error": f"Неизвестные блоки: {', '.join(unknown)}", "available": list(BLOCKS)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            names = list(BLOCKS)
+        return Response(build_bootstrap(request, names))
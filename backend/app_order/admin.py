@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Prefetch
 from django.utils.html import format_html
 from .models import Order, OrderItem
+from .export import export_orders_csv
+from .rollup import order_items_count, record_items_change, record_order_created, record_status_change
 
 
 class OrderItemInline(admin.TabularInline):
@@ -33,6 +36,7 @@ class OrderAdmin(admin.ModelAdmin):
         "order_summary"
     )
     list_filter = ("status", "created_at", "delivery_option", "user")
+    list_select_related = ("delivery_option",)
     search_fields = ("first_name", "last_name", "email", "phone", "address", "user__username", "id")
     list_editable = ("status",)
     readonly_fields = ("created_at", "updated_at", "total_amount")
@@ -43,6 +47,8 @@ class OrderAdmin(admin.ModelAdmin):
     
     # Встраиваем элементы заказа
     inlines = [OrderItemInline]
+
+    actions = ["export_csv"]
     
     # Настройка отображения деталей заказа
     fieldsets = (
@@ -57,16 +63,51 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # Количество позиций и названия товаров для order_summary — без запросов на строку
+        return super().get_queryset(request).annotate(
+            items_count=Count("order_items"),
+        ).prefetch_related(
+            Prefetch(
+                "order_items",
+                queryset=OrderItem.objects.select_related("product_variant__product").order_by("id"),
+            ),
+        )
+
     def order_summary(self, obj):
         """Отображает краткое описание заказа в списке"""
-        if obj.order_items.exists():
-            items_count = obj.order_items.count()
-            items_names = ", ".join([item.product_variant.product.name[:30] for item in obj.order_items.all()[:3]])
-            if obj.order_items.count() > 3:
+        if obj.items_count:
+            items = list(obj.order_items.all())
+            items_names = ", ".join([item.product_variant.product.name[:30] for item in items[:3]])
+            if obj.items_count > 3:
                 items_names += "..."
-            return f"{items_count} товар(ов): {items_names}"
+            return f"{obj.items_count} товар(ов): {items_names}"
         return "Нет товаров"
     order_summary.short_description = "Содержимое заказа"
+    order_summary.admin_order_field = "items_count"
+
+    @admin.action(description="Выгрузить выбранные заказы в CSV")
+    def export_csv(self, request, queryset):
+        # Выгрузке не нужны аннотации и prefetch списка заказов
+        return export_orders_csv(Order.objects.filter(pk__in=queryset.values("pk")))
+
+    def save_model(self, request, obj, form, change):
+        # Сводка (app_order.rollup) сравнивает статус и товары с сохраненными до правки;
+        # список (list_editable) и форма заказа сохраняются в транзакции админки
+        previous = Order.objects.filter(pk=obj.pk).values("status").first() if change else None
+        obj._rollup_items_count = order_items_count(obj) if previous else 0
+        super().save_model(request, obj, form, change)
+        if previous:
+            record_status_change(obj, previous["status"])
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        order = form.instance
+        items_count = order_items_count(order)
+        if change:
+            record_items_change(order, items_count - getattr(order, "_rollup_items_count", items_count))
+        else:
+            record_order_created(order, items_count=items_count)
 
     def get_readonly_fields(self, request, obj=None):
         # Сделать поля только для чтения при редактировании (но не при создании)
@@ -86,7 +127,23 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_filter = ('order__status', 'product_variant__product__name', 'order__created_at')
     search_fields = ('order__id', 'product_variant__product__name', 'order__first_name', 'order__last_name')
     readonly_fields = ('total_price',)
-    
+    # Все, что нужно для __str__ заказа и варианта товара в колонках списка
+    list_select_related = (
+        'order',
+        'product_variant__product',
+        'product_variant__size',
+        'product_variant__fabric',
+        'product_variant__picture_title',
+    )
+
     def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.select_related('order', 'product_variant__product', 'product_variant__size')
+        return super().get_queryset(request).annotate(
+            line_total=ExpressionWrapper(
+                F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+        )
+
+    def total_price(self, obj):
+        return obj.total_price
+    total_price.short_description = 'Общая стоимость'
+    total_price.admin_order_field = 'line_total'
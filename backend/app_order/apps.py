@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AppOrderConfig(AppConfig):
     name = 'app_order'
     verbose_name = 'Заказы'
+
+    def ready(self):
+        from . import signals
+        post_migrate.connect(signals.seed_daily_stats, sender=self)
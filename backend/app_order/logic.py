@@ -3,10 +3,33 @@
 """
 from decimal import Decimal
 from django.db import transaction
+from django.db.models import Count, DecimalField, OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from app_order.models import Order, OrderItem
+from app_order.rollup import record_order_created, record_status_change
 from app_cart.models import Cart
 from app_home.models import DeliveryOption
+from app_catalog.models import ProductImage, active_images_prefetch
+
+
+def order_items_prefetch():
+    """
+    Prefetch элементов заказа со всем, что нужно OrderItemSerializer:
+    вариант с атрибутами и краткие сведения о товаре без запросов на элемент.
+    """
+    return Prefetch(
+        'order_items',
+        queryset=OrderItem.objects.select_related(
+            'product_variant__size',
+            'product_variant__fabric',
+            'product_variant__picture_title',
+            'product_variant__product__category',
+            'product_variant__product__subcategory',
+        ).prefetch_related(
+            active_images_prefetch('product_variant__product__images'),
+        ),
+    )
 
 
 def create_order_from_cart(user, cart, delivery_option_id, first_name, last_name, email, phone, address):
@@ -28,12 +51,19 @@ def create_order_from_cart(user, cart, delivery_option_id, first_name, last_name
     """
     # Получаем вариант доставки
     delivery_option = DeliveryOption.objects.get(id=delivery_option_id)
-    
-    # Рассчитываем общую сумму заказа
-    total_amount = cart.get_total_price()
-    
-    # Создаем заказ в транзакции
+
     with transaction.atomic():
+        # Блокируем корзину, чтобы параллельное оформление не скопировало те же строки
+        Cart.objects.select_for_update().filter(pk=cart.pk).exists()
+
+        # Снимок строк корзины одним запросом: из него берутся и элементы заказа, и сумма
+        lines = list(
+            cart.items.order_by('id').values_list('id', 'product_variant_id', 'quantity', 'product_variant__price')
+        )
+        if not lines:
+            raise ValueError('Корзина пуста')
+
+        total_amount = sum((price * quantity for _, _, quantity, price in lines), Decimal('0.00'))
         order = Order.objects.create(
             user=user if user.is_authenticated else None,
             first_name=first_name,
@@ -44,19 +74,17 @@ def create_order_from_cart(user, cart, delivery_option_id, first_name, last_name
             delivery_option=delivery_option,
             total_amount=total_amount
         )
-        
-        # Создаем элементы заказа из содержимого корзины
-        for cart_item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                product_variant=cart_item.product_variant,
-                quantity=cart_item.quantity,
-                price=cart_item.product_variant.price
-            )
-        
-        # Очищаем корзину после создания заказа
-        cart.items.all().delete()
-    
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_variant_id=variant_id, quantity=quantity, price=price)
+            for _, variant_id, quantity, price in lines
+        ])
+
+        record_order_created(order, items_count=sum(quantity for _, _, quantity, _ in lines))
+
+        # Очищаем корзину: удаляются только скопированные строки
+        cart.items.filter(id__in=[item_id for item_id, _, _, _ in lines]).delete()
+
     return order
 
 
@@ -71,15 +99,18 @@ def update_order_status(order_id, new_status):
     Returns:
         bool: True, если статус успешно обновлен, иначе False
     """
+    # Проверяем, является ли новый статус допустимым
+    valid_statuses = [choice[0] for choice in Order.STATUS_CHOICES]
+    if new_status not in valid_statuses:
+        return False
     try:
-        order = Order.objects.get(id=order_id)
-        # Проверяем, является ли новый статус допустимым
-        valid_statuses = [choice[0] for choice in Order.STATUS_CHOICES]
-        if new_status in valid_statuses:
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(id=order_id)
+            old_status = order.status
             order.status = new_status
             order.save(update_fields=['status', 'updated_at'])
-            return True
-        return False
+            record_status_change(order, old_status)
+        return True
     except Order.DoesNotExist:
         return False
 
@@ -94,8 +125,38 @@ def get_user_orders(user):
     Returns:
         QuerySet: Заказы пользователя, отсортированные по дате создания (новые первыми)
     """
-    return Order.objects.filter(user=user).order_by('-created_at')
+    return Order.objects.filter(user=user).prefetch_related(order_items_prefetch()).order_by('-created_at')
+
+
+
+def get_user_order_summaries(user):
+    """
+    Возвращает краткие сведения о заказах пользователя для истории заказов.
+
+    Количество позиций и изображение первого товара считаются коррелированными
+    подзапросами, поэтому страница собирается одним запросом без загрузки
+    элементов заказа.
+
+    Args:
+        user: Пользователь
 
+    Returns:
+        QuerySet: Заказы пользователя с аннотациями items_count и first_image
+    """
+    order_items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    first_product = OrderItem.objects.filter(
+        order=OuterRef(OuterRef('pk')),
+    ).order_by('id').values('product_variant__product')[:1]
+    first_image = ProductImage.objects.filter(
+        product=Subquery(first_product),
+        is_active=True,
+    ).order_by('-created_at', '-id').values('image')[:1]
+    return Order.objects.filter(user=user).only(
+        'id', 'status', 'total_amount', 'created_at',
+    ).annotate(
+        items_count=Coalesce(Subquery(order_items.annotate(value=Count('id')).values('value')), 0),
+        first_image=Subquery(first_image),
+    ).order_by('-created_at', '-id')
 
 def get_order_details(order_id):
     """
@@ -108,7 +169,7 @@ def get_order_details(order_id):
         Order: Объект заказа или None, если заказ не найден
     """
     try:
-        return Order.objects.prefetch_related('order_items__product_variant__product', 'order_items__product_variant__size').get(id=order_id)
+        return Order.objects.prefetch_related(order_items_prefetch()).get(id=order_id)
     except Order.DoesNotExist:
         return None
 
@@ -140,12 +201,15 @@ def cancel_order(order_id):
         bool: True, если заказ успешно отменен, иначе False
     """
     try:
-        order = Order.objects.get(id=order_id)
-        if order.status != 'cancelled':
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(id=order_id)
+            if order.status == 'cancelled':
+                return False
+            old_status = order.status
             order.status = 'cancelled'
             order.save(update_fields=['status', 'updated_at'])
-            return True
-        return False
+            record_status_change(order, old_status)
+        return True
     except Order.DoesNotExist:
         return False
 
@@ -176,18 +240,65 @@ def get_recent_orders(limit=10):
     return Order.objects.select_related('user', 'delivery_option').order_by('-created_at')[:limit]
 
 
-def get_orders_statistics():
+def order_status_aggregates():
+    """
+    Агрегаты для статистики заказов: общее количество, выручка и количество
+    по каждому статусу. Все значения считаются за один проход условными Count/Sum.
+    """
+    aggregates = {
+        'total': Count('id'),
+        'total_revenue': Coalesce(
+            Sum('total_amount'), Decimal('0.00'), output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+    }
+    for status, _ in Order.STATUS_CHOICES:
+        aggregates[status] = Count('id', filter=Q(status=status))
+    return aggregates
+
+
+def get_orders_statistics(date_from=None, date_to=None, by_delivery_option=False):
     """
     Возвращает статистику по заказам.
-    
+
+    Args:
+        date_from: Начало периода (datetime, включительно) или None
+        date_to: Конец периода (datetime, не включительно) или None
+        by_delivery_option: Добавить разбивку по вариантам доставки
+
     Returns:
-        dict: Словарь с количеством заказов по статусам
+        dict: Количество заказов по статусам, общее количество и выручка;
+        при by_delivery_option — еще список by_delivery_option с теми же
+        значениями для каждого варианта доставки
     """
-    stats = {}
+    orders = Order.objects.order_by()
+    # Границы по created_at позволяют выбрать период по индексу order_created_idx
+    if date_from is not None:
+        orders = orders.filter(created_at__gte=date_from)
+    if date_to is not None:
+        orders = orders.filter(created_at__lt=date_to)
+
+    aggregates = order_status_aggregates()
+    stats = orders.aggregate(**aggregates)
+    if by_delivery_option:
+        stats['by_delivery_option'] = list(
+            orders.values('delivery_option_id', 'delivery_option__name')
+            .annotate(**aggregates)
+            .order_by('delivery_option_id')
+        )
+    return stats
+
+
+def get_user_order_stats(user):
+    """
+    Возвращает количество заказов пользователя по статусам одним запросом.
+
+    Args:
+        user: Пользователь
+
+    Returns:
+        dict: total_orders и <статус>_orders для каждого статуса
+    """
+    aggregates = {'total_orders': Count('id')}
     for status, _ in Order.STATUS_CHOICES:
-        stats[status] = Order.objects.filter(status=status).count()
-    
-    stats['total'] = Order.objects.count()
-    stats['total_revenue'] = sum([order.total_amount for order in Order.objects.all()], Decimal('0.00'))
-    
-    return stats
\ No newline at end of file
+        aggregates[f'{status}_orders'] = Count('id', filter=Q(status=status))
+    return Order.objects.filter(user=user).order_by().aggregate(**aggregates)
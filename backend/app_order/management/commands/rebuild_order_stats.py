@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app_order.rollup import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневную сводку заказов (OrderDailyStats) по всем заказам'
+
+    def handle(self, *args, **options):
+        count = rebuild_daily_stats()
+        self.stdout.write(self.style.SUCCESS(f'Строк сводки: {count}'))
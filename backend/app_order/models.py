@@ -33,6 +33,14 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-created_at']
+        indexes = [
+            # get_user_orders: заказы пользователя, новые первыми
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            # get_orders_by_status и фильтр по статусу в админке
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+            # get_recent_orders и список заказов в админке
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ]
 
     def __str__(self):
         return f'Заказ #{self.id} - {self.first_name} {self.last_name}'
@@ -60,3 +68,40 @@ class OrderItem(models.Model):
         if self.price is not None:
             return self.price * self.quantity
         return 0
+
+
+class OrderDailyStats(models.Model):
+    """
+    Дневная сводка заказов по варианту доставки (app_order.rollup).
+
+    Строка обновляется в той же транзакции, что и заказ: при оформлении и
+    смене статуса (app_order.logic, админка) и при удалении заказа. Изменения
+    в обход этих путей (например, update() по queryset) исправляет команда
+    rebuild_order_stats.
+    """
+    date = models.DateField(verbose_name='Дата')
+    # Без ограничения FK: удаление варианта доставки не должно трогать сводку
+    delivery_option = models.ForeignKey(
+        DeliveryOption, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        related_name='+', verbose_name='Вариант доставки'
+    )
+    orders_count = models.IntegerField(default=0, verbose_name='Заказов')
+    items_count = models.IntegerField(default=0, verbose_name='Товаров')
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Выручка')
+    pending_count = models.IntegerField(default=0, verbose_name='В ожидании')
+    confirmed_count = models.IntegerField(default=0, verbose_name='Подтверждено')
+    processing_count = models.IntegerField(default=0, verbose_name='В обработке')
+    shipped_count = models.IntegerField(default=0, verbose_name='Отправлено')
+    delivered_count = models.IntegerField(default=0, verbose_name='Доставлено')
+    cancelled_count = models.IntegerField(default=0, verbose_name='Отменено')
+
+    class Meta:
+        verbose_name = 'Дневная статистика заказов'
+        verbose_name_plural = 'Дневная статистика заказов'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'delivery_option'], name='order_daily_stats_uniq'),
+        ]
+
+    def __str__(self):
+        return f'Статистика заказов за {self.date}'
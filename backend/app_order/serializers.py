@@ -1,15 +1,16 @@
 from rest_framework import serializers
 from .models import Order, OrderItem
-from app_catalog.serializers import ProductVariantSerializer
+from app_catalog.serializers import ProductVariantSerializer, ProductSummarySerializer, build_media_url
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_variant = ProductVariantSerializer(read_only=True)
+    product = ProductSummarySerializer(source='product_variant.product', read_only=True)
     total_price = serializers.ReadOnlyField()
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'product_variant', 'quantity', 'price', 'total_price']
+        fields = ['id', 'product_variant', 'product', 'quantity', 'price', 'total_price']
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -26,6 +27,25 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'total_amount', 'created_at', 'updated_at']
 
 
+
+class OrderListSerializer(serializers.ModelSerializer):
+    """
+    Краткие сведения о заказе для истории заказов.
+
+    Ожидает queryset из get_user_order_summaries(): количество позиций и
+    изображение первого товара берутся из аннотаций, без элементов заказа.
+    """
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    items_count = serializers.IntegerField(read_only=True)
+    image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        fields = ['id', 'status', 'total_amount', 'items_count', 'image_url', 'created_at']
+
+    def get_image_url(self, obj):
+        return build_media_url(self.context.get('request'), obj.first_image)
+
 class CreateOrderSerializer(serializers.Serializer):
     delivery_option_id = serializers.IntegerField()
     first_name = serializers.CharField(max_length=100)
@@ -37,3 +57,22 @@ class CreateOrderSerializer(serializers.Serializer):
     def create(self, validated_data):
         # Логика создания заказа будет реализована в представлении
         pass
+
+
+class DateRangeQuerySerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        date_from, date_to = attrs.get('date_from'), attrs.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise serializers.ValidationError('date_from не может быть позже date_to')
+        return attrs
+
+
+class OrderStatisticsQuerySerializer(DateRangeQuerySerializer):
+    by_delivery_option = serializers.BooleanField(required=False, default=False)
+
+
+class OrderExportQuerySerializer(DateRangeQuerySerializer):
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES, required=False)
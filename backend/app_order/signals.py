@@ -0,0 +1,20 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import Order, OrderDailyStats
+from .rollup import order_items_count, rebuild_daily_stats, record_order_deleted
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_from_stats(sender, instance, **kwargs):
+    """Убирает заказ из дневной сводки, пока его позиции еще не удалены"""
+    record_order_deleted(instance, order_items_count(instance))
+
+
+def seed_daily_stats(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Заполняет дневную сводку после миграций, если она пуста, а заказы уже есть"""
+    if using != DEFAULT_DB_ALIAS:
+        return
+    if not OrderDailyStats.objects.exists() and Order.objects.exists():
+        rebuild_daily_stats()
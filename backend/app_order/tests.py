@@ -1,10 +1,22 @@
+from datetime import timedelta
+from unittest import skipUnless
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth.models import User
+from rest_framework.test import APIClient
 from app_home.models import DeliveryOption
 from app_catalog.models import Category, Subcategory, Size, Product, ProductVariant
 from app_cart.models import Cart, CartItem
-from app_order.models import Order, OrderItem
-from app_order.logic import create_order_from_cart, update_order_status, get_user_orders, get_order_details, cancel_order
+from app_order.models import Order, OrderItem, OrderDailyStats
+from app_order.rollup import get_rollup_statistics, rebuild_daily_stats
+from app_home.csv_export import escape_formula
+from app_order.serializers import OrderSerializer
+from app_order.logic import (
+    create_order_from_cart, update_order_status, get_user_orders, get_order_details, cancel_order,
+    get_orders_by_status, get_orders_statistics, get_user_order_stats
+)
 
 
 class OrderLogicTestCase(TestCase):
@@ -82,6 +94,31 @@ class OrderLogicTestCase(TestCase):
         # Проверяем, что корзина очищена
         self.assertEqual(self.cart.items.count(), 0)
 
+    def test_create_order_query_count_is_constant(self):
+        """Тест: число запросов при оформлении не зависит от размера корзины"""
+        for index in range(20):
+            variant = ProductVariant.objects.create(product=self.product, price=10.00 + index, is_active=True)
+            CartItem.objects.create(cart=self.cart, product_variant=variant, quantity=1)
+
+        # Вариант доставки, SAVEPOINT, блокировка корзины, снимок строк,
+        # заказ, элементы заказа, строка сводки за день (UPDATE, затем
+        # SAVEPOINT, INSERT, RELEASE), очистка корзины, RELEASE
+        with self.assertNumQueries(12):
+            order = create_order_from_cart(
+                user=self.user,
+                cart=self.cart,
+                delivery_option_id=self.delivery_option.id,
+                first_name='Иван',
+                last_name='Иванов',
+                email='ivan@example.com',
+                phone='+79991234567',
+                address='ул. Тестовая, д. 1'
+            )
+
+        self.assertEqual(order.order_items.count(), 21)
+        self.assertEqual(order.total_amount, 200 + sum(10 + index for index in range(20)))
+        self.assertEqual(self.cart.items.count(), 0)
+
     def test_update_order_status(self):
         """Тест обновления статуса заказа"""
         order = create_order_from_cart(
@@ -187,4 +224,364 @@ class OrderLogicTestCase(TestCase):
         self.assertEqual(retrieved_order.address, 'ул. Тестовая, д. 1')
         self.assertEqual(retrieved_order.delivery_option, self.delivery_option)
         self.assertEqual(retrieved_order.total_amount, 200.00)
-        self.assertEqual(retrieved_order.status, 'pending')
\ No newline at end of file
+        self.assertEqual(retrieved_order.status, 'pending')
+
+    def test_order_details_serialize_without_per_item_queries(self):
+        """Тест краткого описания товара в элементах заказа без запросов на элемент"""
+        for index in range(5):
+            product = Product.objects.create(
+                name=f'Товар {index}', category=self.category, subcategory=self.subcategory, is_active=True
+            )
+            variant = ProductVariant.objects.create(product=product, size=self.size, price=10.00, is_active=True)
+            CartItem.objects.create(cart=self.cart, product_variant=variant, quantity=1)
+        order = create_order_from_cart(
+            user=self.user,
+            cart=self.cart,
+            delivery_option_id=self.delivery_option.id,
+            first_name='Иван',
+            last_name='Иванов',
+            email='ivan@example.com',
+            phone='+79991234567',
+            address='ул. Тестовая, д. 1'
+        )
+
+        # Заказ, элементы с вариантами и товарами, изображения
+        with self.assertNumQueries(3):
+            data = OrderSerializer(get_order_details(order.id)).data
+        self.assertEqual(len(data['order_items']), 6)
+        product = data['order_items'][0]['product']
+        self.assertEqual(product['category'], 'Тестовая категория')
+        self.assertIsNone(product['image_url'])
+
+
+    def test_create_order_retry_with_idempotency_key(self):
+        """Тест: повтор оформления с тем же Idempotency-Key возвращает тот же заказ"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        data = {
+            'delivery_option_id': self.delivery_option.id,
+            'first_name': 'Иван',
+            'last_name': 'Иванов',
+            'email': 'ivan@example.com',
+            'phone': '+79991234567',
+            'address': 'ул. Тестовая, д. 1',
+        }
+        first = client.post('/api/orders/create/', data, HTTP_IDEMPOTENCY_KEY='checkout-1')
+        retry = client.post('/api/orders/create/', data, HTTP_IDEMPOTENCY_KEY='checkout-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+        # Без ключа повтор выполняется заново: корзина уже пуста
+        response = client.post('/api/orders/create/', data)
+        self.assertEqual(response.status_code, 400)
+
+
+    def test_order_history_is_paginated_summary(self):
+        """Тест истории заказов: краткие сведения постранично одним запросом"""
+        self.cart_item.delete()
+        for index in range(3):
+            CartItem.objects.create(cart=self.cart, product_variant=self.product_variant, quantity=index + 1)
+            create_order_from_cart(
+                user=self.user,
+                cart=self.cart,
+                delivery_option_id=self.delivery_option.id,
+                first_name='Иван',
+                last_name='Иванов',
+                email='ivan@example.com',
+                phone='+79991234567',
+                address='ул. Тестовая, д. 1'
+            )
+        orders = list(Order.objects.filter(user=self.user).order_by('-created_at', '-id'))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        # Заказы страницы одним запросом (без сессии и проверки токена)
+        with self.assertNumQueries(1):
+            first_page = client.get('/api/orders/?page_size=2').json()
+        self.assertEqual([order['id'] for order in first_page['results']], [order.id for order in orders[:2]])
+        self.assertEqual(
+            set(first_page['results'][0]),
+            {'id', 'status', 'total_amount', 'items_count', 'image_url', 'created_at'}
+        )
+        self.assertEqual(first_page['results'][0]['items_count'], 1)
+
+        second_page = client.get(first_page['next']).json()
+        self.assertEqual([order['id'] for order in second_page['results']], [order.id for order in orders[2:]])
+        self.assertIsNone(second_page['next'])
+
+    def create_order(self, user, delivery_option, total_amount, status='pending'):
+        return Order.objects.create(
+            user=user, first_name='Иван', last_name='Иванов', email='ivan@example.com', phone='+79991234567',
+            address='ул. Тестовая, д. 1', delivery_option=delivery_option, total_amount=total_amount, status=status
+        )
+
+    def test_orders_statistics_in_one_query(self):
+        """Тест сводной статистики одним агрегирующим запросом"""
+        pickup = DeliveryOption.objects.create(name='Самовывоз', is_active=True)
+        self.create_order(self.user, self.delivery_option, 100)
+        self.create_order(self.user, self.delivery_option, 50, status='delivered')
+        self.create_order(None, pickup, 25, status='cancelled')
+
+        with self.assertNumQueries(1):
+            stats = get_orders_statistics()
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual(stats['total_revenue'], 175)
+        self.assertEqual(stats['pending'], 1)
+        self.assertEqual(stats['delivered'], 1)
+        self.assertEqual(stats['cancelled'], 1)
+        self.assertEqual(stats['shipped'], 0)
+
+        with self.assertNumQueries(2):
+            stats = get_orders_statistics(by_delivery_option=True)
+        breakdown = {row['delivery_option__name']: row for row in stats['by_delivery_option']}
+        self.assertEqual(breakdown['Доставка курьером']['total'], 2)
+        self.assertEqual(breakdown['Доставка курьером']['total_revenue'], 150)
+        self.assertEqual(breakdown['Самовывоз']['cancelled'], 1)
+
+    def test_orders_statistics_date_range(self):
+        """Тест статистики за период"""
+        order = self.create_order(self.user, self.delivery_option, 100)
+        old = self.create_order(self.user, self.delivery_option, 40)
+        Order.objects.filter(pk=old.pk).update(created_at=order.created_at - timedelta(days=10))
+
+        stats = get_orders_statistics(date_from=order.created_at - timedelta(days=1))
+        self.assertEqual(stats['total'], 1)
+        self.assertEqual(stats['total_revenue'], 100)
+
+        stats = get_orders_statistics(date_to=order.created_at - timedelta(days=1))
+        self.assertEqual(stats['total'], 1)
+        self.assertEqual(stats['total_revenue'], 40)
+
+    def test_orders_statistics_endpoint_is_staff_only(self):
+        """Тест доступа к сводной статистике только для сотрудников"""
+        self.create_order(self.user, self.delivery_option, 100)
+        rebuild_daily_stats()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/orders/statistics/').status_code, 403)
+
+        staff = User.objects.create_user(username='staff', password='testpass', is_staff=True)
+        client.force_authenticate(staff)
+        response = client.get('/api/orders/statistics/', {'by_delivery_option': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 1)
+        self.assertEqual(len(response.json()['by_delivery_option']), 1)
+
+        response = client.get('/api/orders/statistics/', {'date_from': '2026-02-01', 'date_to': '2026-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_user_order_stats(self):
+        """Тест статистики заказов пользователя одним запросом"""
+        self.create_order(self.user, self.delivery_option, 100)
+        self.create_order(self.user, self.delivery_option, 100, status='shipped')
+        self.create_order(None, self.delivery_option, 100)
+
+        with self.assertNumQueries(1):
+            stats = get_user_order_stats(self.user)
+        self.assertEqual(stats['total_orders'], 2)
+        self.assertEqual(stats['pending_orders'], 1)
+        self.assertEqual(stats['shipped_orders'], 1)
+        self.assertEqual(stats['cancelled_orders'], 0)
+
+    def test_daily_stats_follow_order_lifecycle(self):
+        """Тест: дневная сводка обновляется при оформлении и смене статуса"""
+        order = create_order_from_cart(
+            user=self.user,
+            cart=self.cart,
+            delivery_option_id=self.delivery_option.id,
+            first_name='Иван',
+            last_name='Иванов',
+            email='ivan@example.com',
+            phone='+79991234567',
+            address='ул. Тестовая, д. 1'
+        )
+        stats = get_rollup_statistics()
+        self.assertEqual(stats['total'], 1)
+        self.assertEqual(stats['total_items'], 2)
+        self.assertEqual(stats['total_revenue'], 200)
+        self.assertEqual(stats['pending'], 1)
+
+        update_order_status(order.id, 'shipped')
+        cancel_order(order.id)
+        stats = get_rollup_statistics()
+        self.assertEqual((stats['pending'], stats['shipped'], stats['cancelled']), (0, 0, 1))
+
+        # Пересчет с нуля дает ту же сводку
+        fields = ['date', 'delivery_option_id', 'orders_count', 'items_count', 'revenue', 'pending_count',
+                  'shipped_count', 'cancelled_count']
+        incremental = list(OrderDailyStats.objects.values(*fields))
+        self.assertEqual(rebuild_daily_stats(), 1)
+        self.assertEqual(list(OrderDailyStats.objects.values(*fields)), incremental)
+
+    def test_rollup_statistics_date_range(self):
+        """Тест статистики из сводки за период"""
+        today = timezone.localdate()
+        OrderDailyStats.objects.create(
+            date=today, delivery_option=self.delivery_option, orders_count=2, revenue=300, pending_count=2
+        )
+        OrderDailyStats.objects.create(
+            date=today - timedelta(days=10), delivery_option=None, orders_count=1, revenue=50, delivered_count=1
+        )
+
+        with self.assertNumQueries(1):
+            stats = get_rollup_statistics(date_from=today - timedelta(days=1))
+        self.assertEqual((stats['total'], stats['total_revenue'], stats['pending']), (2, 300, 2))
+
+        stats = get_rollup_statistics(date_to=today - timedelta(days=1), by_delivery_option=True)
+        self.assertEqual((stats['total'], stats['delivered']), (1, 1))
+        self.assertEqual(stats['by_delivery_option'][0]['delivery_option_id'], None)
+
+    def test_export_orders_csv(self):
+        """Тест потоковой выгрузки заказов в CSV для сотрудников"""
+        order = create_order_from_cart(
+            user=self.user,
+            cart=self.cart,
+            delivery_option_id=self.delivery_option.id,
+            first_name='Иван',
+            last_name='Иванов',
+            email='ivan@example.com',
+            phone='+79991234567',
+            address='ул. Тестовая, д. 1'
+        )
+        self.create_order(self.user, self.delivery_option, 50, status='cancelled')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/orders/export/').status_code, 403)
+
+        staff = User.objects.create_user(username='staff', password='testpass', is_staff=True)
+        client.force_authenticate(staff)
+        response = client.get('/api/orders/export/', {'status': 'pending'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+
+        rows = [line.split(';') for line in b''.join(response.streaming_content).decode('utf-8-sig').splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0][0], 'Номер заказа')
+        self.assertEqual(rows[1][0], str(order.id))
+        self.assertEqual(rows[1][2], 'В ожидании')
+        self.assertIn('Тестовый товар', rows[1])
+        self.assertIn('M', rows[1])
+        # Значения, которые Excel выполнил бы как формулу, экранируются
+        self.assertEqual(rows[1][6], "'+79991234567")
+        for value in ('=HYPERLINK("http://evil")', '@SUM(A1)', '-1+2', '\tx', '\rx'):
+            self.assertEqual(escape_formula(value), "'" + value)
+        self.assertEqual(escape_formula('Иван'), 'Иван')
+        self.assertEqual(escape_formula(-5), -5)
+
+        response = client.get('/api/orders/export/', {'status': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+
+class OrderAdminChangelistTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass', email='admin@example.com')
+        self.client.force_login(self.admin)
+        self.delivery_option = DeliveryOption.objects.create(name='Доставка курьером', is_active=True)
+        category = Category.objects.create(name='Тестовая категория', is_active=True)
+        subcategory = Subcategory.objects.create(name='Тестовая подкатегория', category=category, is_active=True)
+        self.size = Size.objects.create(name='M', is_active=True)
+        self.product = Product.objects.create(
+            name='Тестовый товар', category=category, subcategory=subcategory, is_active=True
+        )
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(
+                first_name='Иван', last_name='Иванов', email='ivan@example.com', phone='+79991234567',
+                address='ул. Тестовая, д. 1', delivery_option=self.delivery_option, total_amount=500
+            )
+            for price in (100, 200, 50, 50):
+                variant = ProductVariant.objects.create(product=self.product, size=self.size, price=price, is_active=True)
+                OrderItem.objects.create(order=order, product_variant=variant, quantity=1, price=price)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_run_constant_number_of_queries(self):
+        """Тест: число запросов списков заказов в админке не зависит от числа строк"""
+        self.add_orders(2)
+        order_queries = self.changelist_queries('/admin/app_order/order/')
+        item_queries = self.changelist_queries('/admin/app_order/orderitem/')
+
+        self.add_orders(10)
+        self.assertEqual(self.changelist_queries('/admin/app_order/order/'), order_queries)
+        self.assertEqual(self.changelist_queries('/admin/app_order/orderitem/'), item_queries)
+
+    def test_order_summary_uses_annotation(self):
+        """Тест краткого содержимого заказа в списке"""
+        self.add_orders(1)
+        response = self.client.get('/admin/app_order/order/')
+        self.assertContains(response, '4 товар(ов): Тестовый товар, Тестовый товар, Тестовый товар...')
+
+    def test_admin_changes_update_rollup(self):
+        """Тест: смена статуса, правка позиций и удаление в админке попадают в дневную сводку"""
+        self.add_orders(3)
+        rebuild_daily_stats()
+        first, second, third = Order.objects.order_by('id')
+        fields = ['date', 'delivery_option_id', 'orders_count', 'items_count', 'revenue', 'pending_count',
+                  'shipped_count', 'cancelled_count']
+
+        # Статус из списка (list_editable)
+        response = self.client.post('/admin/app_order/order/', {
+            'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '1',
+            'form-0-id': str(first.id), 'form-0-status': 'shipped', '_save': 'Сохранить',
+        })
+        self.assertEqual(response.status_code, 302)
+
+        # Статус и количество товара из формы заказа
+        data = {'status': 'cancelled', '_save': 'Сохранить'}
+        items = list(second.order_items.order_by('id'))
+        data.update({'order_items-TOTAL_FORMS': str(len(items)), 'order_items-INITIAL_FORMS': str(len(items)),
+                     'order_items-MIN_NUM_FORMS': '0', 'order_items-MAX_NUM_FORMS': '1000'})
+        for index, item in enumerate(items):
+            data.update({
+                f'order_items-{index}-id': str(item.id), f'order_items-{index}-order': str(second.id),
+                f'order_items-{index}-product_variant': str(item.product_variant_id),
+                f'order_items-{index}-quantity': '3' if index == 0 else '1', f'order_items-{index}-price': str(item.price),
+            })
+        response = self.client.post(f'/admin/app_order/order/{second.id}/change/', data)
+        self.assertEqual(response.status_code, 302)
+
+        # Удаление действием списка
+        response = self.client.post('/admin/app_order/order/', {
+            'action': 'delete_selected', '_selected_action': [str(third.id)], 'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Order.objects.filter(pk=third.pk).exists())
+
+        stats = get_rollup_statistics()
+        self.assertEqual((stats['total'], stats['total_items'], stats['pending']), (2, 10, 0))
+        self.assertEqual((stats['shipped'], stats['cancelled']), (1, 1))
+        incremental = list(OrderDailyStats.objects.values(*fields))
+        rebuild_daily_stats()
+        self.assertEqual(list(OrderDailyStats.objects.values(*fields)), incremental)
+
+@skipUnless(connection.vendor == 'sqlite', 'Планы запросов проверяются на SQLite')
+class OrderIndexUsageTestCase(TestCase):
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return '\n'.join(row[3] for row in cursor.fetchall())
+
+    def test_user_orders_use_user_created_index(self):
+        user = User.objects.create_user(username='indexuser', password='testpass')
+        plan = self.query_plan(get_user_orders(user))
+        self.assertIn('USING INDEX order_user_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_orders_by_status_use_status_index(self):
+        plan = self.query_plan(get_orders_by_status('pending'))
+        self.assertIn('USING INDEX order_status_created_idx', plan)
+
+    def test_recent_orders_use_created_index(self):
+        plan = self.query_plan(Order.objects.order_by('-created_at', '-id')[:100])
+        self.assertIn('USING INDEX order_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
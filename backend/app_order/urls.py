@@ -8,4 +8,6 @@ urlpatterns = [
     path('<int:pk>/update-status/', views.update_order_status_view, name='order-update-status'),
     path('<int:pk>/cancel/', views.cancel_order_view, name='order-cancel'),
     path('stats/', views.get_order_stats, name='order-stats'),
+    path('statistics/', views.get_orders_statistics_view, name='order-statistics'),
+    path('export/', views.export_orders_view, name='order-export'),
 ]
\ No newline at end of file
@@ -1,24 +1,53 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.http import Http404
+from django.utils import timezone
 from .models import Order
-from .serializers import OrderSerializer, CreateOrderSerializer
-from .logic import create_order_from_cart, get_user_orders, get_order_details, update_order_status, cancel_order
+from .serializers import (
+    OrderSerializer, OrderListSerializer, CreateOrderSerializer, OrderStatisticsQuerySerializer,
+    OrderExportQuerySerializer
+)
+from .logic import (
+    create_order_from_cart, get_user_order_summaries, get_order_details, update_order_status, cancel_order,
+    get_user_order_stats
+)
+from .rollup import get_rollup_statistics
+from .export import export_orders_csv, filter_orders
 from app_cart.models import Cart
+from app_catalog.pagination import KeysetPagination
+from app_home.idempotency import idempotent
+
+
+class OrderHistoryPagination(KeysetPagination):
+    """
+    Keyset-пагинация истории заказов: новые первыми (индекс order_user_created_idx).
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
 
 
 class OrderListView(generics.ListAPIView):
     """
     Представление для получения списка заказов пользователя.
+
+    Каждый заказ содержит статус, сумму, количество позиций и изображение
+    первого товара; полный состав заказа отдает только OrderDetailView.
+    Используется keyset-пагинация по (created_at, id): ссылка на следующую
+    страницу приходит в поле "next". Страница собирается одним запросом к БД.
+
+    Query Parameters:
+        page_size (int, optional): Размер страницы (по умолчанию 20, максимум 100)
+        cursor (str, optional): Курсор следующей страницы из поля "next"
     """
-    serializer_class = OrderSerializer
+    serializer_class = OrderListSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderHistoryPagination
 
     def get_queryset(self):
-        return get_user_orders(self.request.user)
+        return get_user_order_summaries(self.request.user)
 
 
 class OrderDetailView(generics.RetrieveAPIView):
@@ -41,6 +70,7 @@ class OrderDetailView(generics.RetrieveAPIView):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def create_order(request):
     """
     Создает новый заказ из корзины пользователя.
@@ -88,7 +118,8 @@ def create_order(request):
                 address=address
             )
             
-            order_serializer = OrderSerializer(order)
+            order = get_order_details(order.id)
+            order_serializer = OrderSerializer(order, context={'request': request})
             return Response(order_serializer.data, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response(
@@ -194,14 +225,55 @@ def get_order_stats(request):
     Returns:
         Response: JSON-ответ со статистикой
     """
-    orders = get_user_orders(request.user)
-    stats = {
-        'total_orders': orders.count(),
-        'pending_orders': orders.filter(status='pending').count(),
-        'confirmed_orders': orders.filter(status='confirmed').count(),
-        'processing_orders': orders.filter(status='processing').count(),
-        'shipped_orders': orders.filter(status='shipped').count(),
-        'delivered_orders': orders.filter(status='delivered').count(),
-        'cancelled_orders': orders.filter(status='cancelled').count(),
-    }
-    return Response(stats)
\ No newline at end of file
+    return Response(get_user_order_stats(request.user))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_orders_statistics_view(request):
+    """
+    Возвращает сводную статистику по всем заказам для сотрудников.
+
+    Значения читаются из дневной сводки OrderDailyStats, поэтому стоимость
+    запроса зависит от количества дней в периоде, а не от количества заказов.
+
+    Query Parameters:
+        date_from (date, optional): Начало периода, включительно (ГГГГ-ММ-ДД)
+        date_to (date, optional): Конец периода, включительно (ГГГГ-ММ-ДД)
+        by_delivery_option (bool, optional): Добавить разбивку по вариантам доставки
+
+    Returns:
+        Response: JSON-ответ со статистикой
+    """
+    serializer = OrderStatisticsQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    stats = get_rollup_statistics(
+        date_from=serializer.validated_data.get('date_from'),
+        date_to=serializer.validated_data.get('date_to'),
+        by_delivery_option=serializer.validated_data['by_delivery_option']
+    )
+    return Response(stats)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_orders_view(request):
+    """
+    Выгружает заказы в CSV для сотрудников (одна строка на элемент заказа).
+
+    Ответ отдается потоком, поэтому расход памяти не зависит от размера выгрузки.
+
+    Query Parameters:
+        date_from (date, optional): Начало периода, включительно (ГГГГ-ММ-ДД)
+        date_to (date, optional): Конец периода, включительно (ГГГГ-ММ-ДД)
+        status (str, optional): Статус заказа
+
+    Returns:
+        StreamingHttpResponse: CSV-файл с заказами
+    """
+    serializer = OrderExportQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    orders = filter_orders(Order.objects.all(), **serializer.validated_data)
+    return export_orders_csv(orders, filename=f'orders-{timezone.localdate():%Y-%m-%d}.csv')
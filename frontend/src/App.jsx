@@ -98,12 +98,29 @@ function parsePrice(value) {
   return Number.isFinite(num) ? num : null;
 }
 
+// Страница keyset-пагинации каталога: { next, results }
+async function fetchCatalogPage(url, signal) {
+  const res = await fetch(toProxiedUrl(url), { signal });
+  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+  const data = await res.json();
+  return {
+    results: Array.isArray(data?.results) ? data.results : [],
+    next: typeof data?.next === "string" ? data.next : null,
+  };
+}
+
 function getActiveImages(product) {
   const images = Array.isArray(product?.images) ? product.images : [];
   return images.filter((img) => img && img.is_active !== false);
 }
 
 function getPriceRange(product) {
+  // Карточка списка содержит готовый диапазон цен, детальная запись — варианты
+  if (product?.min_price != null && product?.max_price != null) {
+    const min = Number(product.min_price);
+    const max = Number(product.max_price);
+    if (Number.isFinite(min) && Number.isFinite(max)) return { min, max };
+  }
   const variants = Array.isArray(product?.variants) ? product.variants : [];
   const prices = variants
     .filter((variant) => variant && variant.is_active !== false)
@@ -116,6 +133,38 @@ function getPriceRange(product) {
   };
 }
 
+// Query-параметры списка и фасетов каталога (app_catalog.filters.ProductFilter)
+function buildCatalogQuery({
+  categoryId,
+  subcategoryId,
+  sizeIds,
+  fabricIds,
+  priceFrom,
+  priceTo,
+}) {
+  const query = new URLSearchParams();
+  if (categoryId) query.set("category_id", String(categoryId));
+  if (subcategoryId) query.set("subcategory", String(subcategoryId));
+  if (sizeIds.length > 0) query.set("size", sizeIds.join(","));
+  if (fabricIds.length > 0) query.set("fabric", fabricIds.join(","));
+  const minPrice = parsePrice(priceFrom);
+  const maxPrice = parsePrice(priceTo);
+  if (minPrice !== null) query.set("min_price", String(minPrice));
+  if (maxPrice !== null) query.set("max_price", String(maxPrice));
+  return query.toString();
+}
+
+// Режим сортировки карточек → параметр ordering списка (ProductListView.orderings).
+// Порядок задает сервер: клиентская сортировка загруженных страниц перемешала бы
+// их с еще не загруженными
+const SORT_ORDERINGS = {
+  newest: "new",
+  promo: "promo",
+  price_asc: "price_asc",
+  price_desc: "price_desc",
+  name: "name",
+};
+
 const ACCESS_TOKEN_KEY = "blakitny_access_token";
 const REFRESH_TOKEN_KEY = "blakitny_refresh_token";
 
@@ -1825,6 +1874,12 @@ function App() {
   const [authModalOpen, setAuthModalOpen] = useState(false);
   const [authMode, setAuthMode] = useState("login");
   const [catalogProducts, setCatalogProducts] = useState([]);
+  const [catalogNextUrl, setCatalogNextUrl] = useState(null);
+  const [catalogLoadingMore, setCatalogLoadingMore] = useState(false);
+  const catalogGenerationRef = useRef(0);
+  const [catalogFacets, setCatalogFacets] = useState(null);
+  const [activeProductDetail, setActiveProductDetail] = useState(null);
+  const [activeProductLoading, setActiveProductLoading] = useState(false);
   const [fabrics, setFabrics] = useState([]);
   const [selectedSizes, setSelectedSizes] = useState([]);
   const [selectedFabrics, setSelectedFabrics] = useState([]);
@@ -1847,11 +1902,21 @@ function App() {
   const activeCatalogCategories = useMemo(() => {
     return categories.filter((item) => item?.is_active !== false);
   }, [categories]);
-  const activeProduct = useMemo(() => {
-    return (
-      catalogProducts.find((product) => product.id === activeProductId) || null
-    );
-  }, [catalogProducts, activeProductId]);
+  // Карточки списка облегченные: изображения и варианты есть только в детальной записи
+  const activeProduct =
+    activeProductDetail && activeProductDetail.id === activeProductId
+      ? activeProductDetail
+      : null;
+  const activeVariants = useMemo(() => {
+    const variants = Array.isArray(activeProduct?.variants)
+      ? activeProduct.variants
+      : [];
+    return variants.filter((variant) => variant && variant.is_active !== false);
+  }, [activeProduct]);
+  const selectedVariant =
+    activeVariants.find((variant) => variant.id === selectedVariantId) ||
+    activeVariants[0] ||
+    null;
   const activeProductImages = useMemo(() => {
     return activeProduct ? getActiveImages(activeProduct) : [];
   }, [activeProduct]);
@@ -1872,97 +1937,36 @@ function App() {
     return [...primary, ...rest];
   }, [subcategories, selectedCategoryId]);
   const availableSizes = useMemo(() => {
-    const sizeMap = new Map();
-    catalogProducts.forEach((product) => {
-      const variants = Array.isArray(product?.variants) ? product.variants : [];
-      variants.forEach((variant) => {
-        if (!variant || variant.is_active === false) return;
-        const size = variant?.size;
-        if (!size || size.is_active === false || !size.id) return;
-        const key = String(size.id);
-        if (!sizeMap.has(key)) {
-          sizeMap.set(key, size);
-        }
-      });
-    });
-    return Array.from(sizeMap.values());
-  }, [catalogProducts]);
-  const filteredProducts = useMemo(() => {
-    const sizeSet = new Set(selectedSizes.map((id) => String(id)));
-    const fabricSet = new Set(selectedFabrics.map((id) => String(id)));
-    const minPrice = parsePrice(priceFrom);
-    const maxPrice = parsePrice(priceTo);
-
-    const filtered = catalogProducts.filter((product) => {
-      if (selectedSubcategoryId) {
-        const subcategoryId = product?.subcategory?.id;
-        if (
-          !subcategoryId ||
-          String(subcategoryId) !== String(selectedSubcategoryId)
-        ) {
-          return false;
-        }
-      }
-      if (selectedCategoryId) {
-        const categoryId = product?.category?.id;
-        if (!categoryId || String(categoryId) !== String(selectedCategoryId)) {
-          return false;
-        }
-      }
-      if (fabricSet.size > 0) {
-        const fabricId = product?.fabric_type?.id;
-        if (!fabricId || !fabricSet.has(String(fabricId))) return false;
-      }
-
-      if (sizeSet.size > 0) {
-        const variants = Array.isArray(product?.variants)
-          ? product.variants
-          : [];
-        const hasSize = variants.some((variant) => {
-          if (!variant || variant.is_active === false) return false;
-          const sizeId = variant?.size?.id;
-          return sizeId && sizeSet.has(String(sizeId));
-        });
-        if (!hasSize) return false;
-      }
-
-      const priceRange = getPriceRange(product);
-      if (minPrice !== null) {
-        if (!priceRange || priceRange.min < minPrice) return false;
-      }
-      if (maxPrice !== null) {
-        if (!priceRange || priceRange.max > maxPrice) return false;
-      }
-
-      return true;
-    });
-
-    const sorted = [...filtered];
-    sorted.sort((a, b) => {
-      if (sortMode === "price_asc" || sortMode === "price_desc") {
-        const priceA = getPriceRange(a)?.min ?? Number.POSITIVE_INFINITY;
-        const priceB = getPriceRange(b)?.min ?? Number.POSITIVE_INFINITY;
-        return sortMode === "price_asc" ? priceA - priceB : priceB - priceA;
-      }
-      if (sortMode === "name") {
-        return String(a?.name || "").localeCompare(String(b?.name || ""), "ru");
-      }
-      if (sortMode === "promo") {
-        return Number(b?.is_promotion) - Number(a?.is_promotion);
-      }
-      return Number(b?.is_new) - Number(a?.is_new);
-    });
-    return sorted;
-  }, [
-    catalogProducts,
-    priceFrom,
-    priceTo,
-    selectedFabrics,
-    selectedCategoryId,
-    selectedSubcategoryId,
-    selectedSizes,
-    sortMode,
-  ]);
+    const sizes = Array.isArray(catalogFacets?.sizes)
+      ? catalogFacets.sizes
+      : [];
+    return sizes.filter((size) => size?.id && size.count > 0);
+  }, [catalogFacets]);
+  const catalogQuery = useMemo(
+    () =>
+      buildCatalogQuery({
+        categoryId: selectedCategoryId,
+        subcategoryId: selectedSubcategoryId,
+        sizeIds: selectedSizes,
+        fabricIds: selectedFabrics,
+        priceFrom,
+        priceTo,
+      }),
+    [
+      priceFrom,
+      priceTo,
+      selectedCategoryId,
+      selectedFabrics,
+      selectedSizes,
+      selectedSubcategoryId,
+    ],
+  );
+  // Фильтры и порядок применяет сервер: фасетам порядок не нужен
+  const catalogListQuery = useMemo(() => {
+    const query = new URLSearchParams(catalogQuery);
+    query.set("ordering", SORT_ORDERINGS[sortMode] || "name");
+    return query.toString();
+  }, [catalogQuery, sortMode]);
 
   useEffect(() => {
     if (selectedSizes.length === 0) return;
@@ -1984,17 +1988,35 @@ function App() {
   }, [activeProductId]);
 
   useEffect(() => {
-    if (!activeProduct) {
-      setSelectedVariantId(null);
-      setAddQuantity(1);
+    if (!activeProductId) {
+      setActiveProductDetail(null);
       return;
     }
-    const variants = Array.isArray(activeProduct?.variants)
-      ? activeProduct.variants.filter((v) => v?.is_active !== false)
-      : [];
-    setSelectedVariantId(variants[0]?.id ?? null);
+    const controller = new AbortController();
+
+    async function loadProductDetail() {
+      setActiveProductLoading(true);
+      try {
+        const res = await fetch(`/api/catalog/products/${activeProductId}/`, {
+          signal: controller.signal,
+        });
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        setActiveProductDetail(await res.json());
+      } catch (e) {
+        if (e?.name === "AbortError") return;
+        setActiveProductDetail(null);
+      }
+      setActiveProductLoading(false);
+    }
+
+    loadProductDetail();
+    return () => controller.abort();
+  }, [activeProductId]);
+
+  useEffect(() => {
+    setSelectedVariantId(activeVariants[0]?.id ?? null);
     setAddQuantity(1);
-  }, [activeProduct]);
+  }, [activeVariants]);
 
   useEffect(() => {
     if (activeImageIndex < activeProductImages.length) return;
@@ -2326,13 +2348,13 @@ function App() {
         const url = query.size
           ? `/api/catalog/products/?${query.toString()}`
           : "/api/catalog/products/";
-        const res = await fetch(url, { signal });
-        if (!res.ok) throw new Error(`HTTP ${res.status}`);
-        const data = await res.json();
-        const list = Array.isArray(data) ? data : [];
-        setCatalogProducts(list);
+        catalogGenerationRef.current += 1;
+        const page = await fetchCatalogPage(url, signal);
+        setCatalogProducts(page.results);
+        setCatalogNextUrl(page.next);
       } catch {
         setCatalogProducts([]);
+        setCatalogNextUrl(null);
       }
     }
 
@@ -2374,24 +2396,6 @@ function App() {
     const controller = new AbortController();
 
     async function syncCatalogData() {
-      try {
-        const productQuery = new URLSearchParams();
-        if (selectedCategoryId) {
-          productQuery.set("category_id", String(selectedCategoryId));
-        }
-        const productsUrl = productQuery.size
-          ? `/api/catalog/products/?${productQuery.toString()}`
-          : "/api/catalog/products/";
-        const productsRes = await fetch(productsUrl, {
-          signal: controller.signal,
-        });
-        if (!productsRes.ok) throw new Error(`HTTP ${productsRes.status}`);
-        const productsData = await productsRes.json();
-        setCatalogProducts(Array.isArray(productsData) ? productsData : []);
-      } catch {
-        setCatalogProducts([]);
-      }
-
       if (!selectedCategoryId) {
         setSubcategories([]);
         setSelectedSubcategoryId(null);
@@ -2422,6 +2426,70 @@ function App() {
     return () => controller.abort();
   }, [pageReady, selectedCategoryId]);
 
+  useEffect(() => {
+    if (!pageReady) return;
+    const controller = new AbortController();
+
+    async function syncCatalogProducts() {
+      try {
+        // Фильтры или порядок изменились: список загружается с первой страницы, без курсора
+        catalogGenerationRef.current += 1;
+        const page = await fetchCatalogPage(
+          `/api/catalog/products/?${catalogListQuery}`,
+          controller.signal,
+        );
+        setCatalogProducts(page.results);
+        setCatalogNextUrl(page.next);
+      } catch (e) {
+        if (e?.name === "AbortError") return;
+        setCatalogProducts([]);
+        setCatalogNextUrl(null);
+      }
+    }
+
+    syncCatalogProducts();
+    return () => controller.abort();
+  }, [pageReady, catalogListQuery]);
+
+  useEffect(() => {
+    if (!pageReady) return;
+    const controller = new AbortController();
+
+    async function syncCatalogFacets() {
+      const suffix = catalogQuery ? `?${catalogQuery}` : "";
+      try {
+        const res = await fetch(`/api/catalog/products/facets/${suffix}`, {
+          signal: controller.signal,
+        });
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        setCatalogFacets(await res.json());
+      } catch (e) {
+        if (e?.name === "AbortError") return;
+        setCatalogFacets(null);
+      }
+    }
+
+    syncCatalogFacets();
+    return () => controller.abort();
+  }, [pageReady, catalogQuery]);
+
+  const loadMoreProducts = async () => {
+    if (!catalogNextUrl || catalogLoadingMore) return;
+    const generation = catalogGenerationRef.current;
+    setCatalogLoadingMore(true);
+    try {
+      const page = await fetchCatalogPage(catalogNextUrl);
+      // Фильтры или порядок изменились, пока страница загружалась: список уже другой
+      if (generation !== catalogGenerationRef.current) return;
+      setCatalogProducts((prev) => [...prev, ...page.results]);
+      setCatalogNextUrl(page.next);
+    } catch {
+      return;
+    } finally {
+      setCatalogLoadingMore(false);
+    }
+  };
+
   const openAuth = (mode) => {
     setAuthMode(mode);
     setAuthModalOpen(true);
@@ -2851,9 +2919,9 @@ function App() {
                           {activeProduct.description}
                         </div>
                       ) : null}
-                      {activeProduct.picture_title ? (
+                      {selectedVariant?.picture_title?.name ? (
                         <div className="productSpec">
-                          Рисунок: {activeProduct.picture_title}
+                          Рисунок: {selectedVariant.picture_title.name}
                         </div>
                       ) : null}
                       {activeProduct.binding ? (
@@ -2861,47 +2929,43 @@ function App() {
                           Переплёт: {activeProduct.binding}
                         </div>
                       ) : null}
-                      {activeProduct.fabric_type?.name ? (
+                      {selectedVariant?.fabric?.name ? (
                         <div className="productSpec">
-                          Ткань: {activeProduct.fabric_type.name}
+                          Ткань: {selectedVariant.fabric.name}
                         </div>
                       ) : null}
                     </div>
-                    {Array.isArray(activeProduct.variants) &&
-                    activeProduct.variants.length > 0 ? (
+                    {activeVariants.length > 0 ? (
                       <div className="productVariants">
                         <div className="variantsTitle">Размеры</div>
                         <div className="variantsList">
-                          {activeProduct.variants
-                            .filter((variant) => variant?.is_active !== false)
-                            .map((variant) => (
-                              <button
-                                type="button"
-                                className="variantChip"
-                                key={variant.id}
-                                onClick={() => setSelectedVariantId(variant.id)}
-                                style={{
-                                  borderColor:
-                                    variant.id === selectedVariantId
-                                      ? "rgba(196, 151, 111, 0.8)"
-                                      : "color-mix(in srgb, var(--border) 70%, transparent)",
-                                  boxShadow:
-                                    variant.id === selectedVariantId
-                                      ? "0 0 0 2px rgba(196, 151, 111, 0.2)"
-                                      : "none",
-                                }}
-                              >
-                                <span>{variant?.size?.name || "Размер"}</span>
-                                <span>
-                                  {formatPrice(Number(variant.price))} ₽
-                                </span>
-                              </button>
-                            ))}
+                          {activeVariants.map((variant) => (
+                            <button
+                              type="button"
+                              className="variantChip"
+                              key={variant.id}
+                              onClick={() => setSelectedVariantId(variant.id)}
+                              style={{
+                                borderColor:
+                                  variant.id === selectedVariantId
+                                    ? "rgba(196, 151, 111, 0.8)"
+                                    : "color-mix(in srgb, var(--border) 70%, transparent)",
+                                boxShadow:
+                                  variant.id === selectedVariantId
+                                    ? "0 0 0 2px rgba(196, 151, 111, 0.2)"
+                                    : "none",
+                              }}
+                            >
+                              <span>{variant?.size?.name || "Размер"}</span>
+                              <span>
+                                {formatPrice(Number(variant.price))} ₽
+                              </span>
+                            </button>
+                          ))}
                         </div>
                       </div>
                     ) : null}
-                    {activeProduct.variants &&
-                    activeProduct.variants.length > 0 ? (
+                    {activeVariants.length > 0 ? (
                       <div
                         style={{
                           display: "flex",
@@ -2957,22 +3021,9 @@ function App() {
                               redirectToAuth();
                               return;
                             }
-                            const variants = Array.isArray(
-                              activeProduct?.variants,
-                            )
-                              ? activeProduct.variants
-                              : [];
-                            const selected =
-                              variants.find(
-                                (variant) => variant?.id === selectedVariantId,
-                              ) || variants[0];
+                            const selected = selectedVariant;
                             if (!selected) return;
-                            const images = Array.isArray(activeProduct?.images)
-                              ? activeProduct.images
-                              : [];
-                            const activeImage = images.find(
-                              (img) => img?.is_active !== false,
-                            );
+                            const activeImage = activeProductImages[0];
                             addToCart(
                               {
                                 productId: activeProduct.id,
@@ -2984,9 +3035,8 @@ function App() {
                                 attributes: {
                                   binding: activeProduct.binding ?? null,
                                   pictureTitle:
-                                    activeProduct.picture_title ?? null,
-                                  fabric:
-                                    activeProduct.fabric_type?.name ?? null,
+                                    selected?.picture_title?.name ?? null,
+                                  fabric: selected?.fabric?.name ?? null,
                                   category:
                                     activeProduct.category?.name ?? null,
                                   subcategory:
@@ -3020,7 +3070,7 @@ function App() {
                   ← Вернуться в каталог
                 </button>
                 <div className="card" style={{ padding: 18 }}>
-                  Товар не найден
+                  {activeProductLoading ? "Загрузка…" : "Товар не найден"}
                 </div>
               </section>
             )
@@ -3202,7 +3252,8 @@ function App() {
                   </div>
                   <div className="catalogToolbar card">
                     <div className="catalogCount">
-                      Товаров: {filteredProducts.length}
+                      Товаров:{" "}
+                      {catalogFacets?.total ?? catalogProducts.length}
                     </div>
                     <div className="sortRow">
                       <label className="sortLabel" htmlFor="catalogSort">
@@ -3223,14 +3274,13 @@ function App() {
                     </div>
                   </div>
                   <div className="catalogGridWrap">
-                    {filteredProducts.length === 0 ? (
+                    {catalogProducts.length === 0 ? (
                       <div className="catalogStatus">
                         Подходящих товаров пока нет
                       </div>
                     ) : null}
                     <div className="catalogGrid">
-                      {filteredProducts.map((product) => {
-                        const images = getActiveImages(product);
+                      {catalogProducts.map((product) => {
                         const range = getPriceRange(product);
                         const priceLabel = range
                           ? range.min === range.max
@@ -3247,9 +3297,9 @@ function App() {
                             onClick={() => openProduct(product.id)}
                           >
                             <div className="productMedia">
-                              {images[0]?.image ? (
+                              {product.image_url ? (
                                 <img
-                                  src={toProxiedUrl(images[0].image)}
+                                  src={toProxiedUrl(product.image_url)}
                                   alt={product.name}
                                 />
                               ) : (
@@ -3273,9 +3323,9 @@ function App() {
                             <div className="productBody">
                               <div className="productTitle">{product.name}</div>
                               <div className="productMeta">
-                                {product.subcategory?.name ||
-                                  product.category?.name ||
-                                  "Категория"}
+                                {product.variants_count > 0
+                                  ? `Вариантов: ${product.variants_count}`
+                                  : "Нет в наличии"}
                               </div>
                               <div className="productPrice">{priceLabel}</div>
                             </div>
@@ -3283,6 +3333,16 @@ function App() {
                         );
                       })}
                     </div>
+                    {catalogNextUrl ? (
+                      <button
+                        type="button"
+                        className="resetBtn"
+                        onClick={loadMoreProducts}
+                        disabled={catalogLoadingMore}
+                      >
+                        {catalogLoadingMore ? "Загрузка…" : "Показать ещё"}
+                      </button>
+                    ) : null}
                   </div>
                 </div>
               </div>
@@ -7,7 +7,12 @@ import {
   useRef,
   useState,
 } from "react";
-import type { CartContextValue, CartItem, CartState } from "./types";
+import type {
+  CartContextValue,
+  CartItem,
+  CartOperation,
+  CartState,
+} from "./types";
 const ACCESS_TOKEN_KEY = "blakitny_access_token";
 function readAccessToken() {
   try {
@@ -47,16 +52,6 @@ export function useCart() {
 export function CartProvider({ children }: { children: React.ReactNode }) {
   const [state, setState] = useState<CartState>({ items: [], error: null });
   const loadingRef = useRef(false);
-  const productCacheRef = useRef<
-    Map<
-      number,
-      {
-        name: string;
-        image?: string | null;
-        attributes?: CartItem["attributes"];
-      }
-    >
-  >(new Map());
 
   const getTotalPrice = useCallback(() => {
     return state.items.reduce(
@@ -69,6 +64,34 @@ export function CartProvider({ children }: { children: React.ReactNode }) {
     return state.items.reduce((sum, item) => sum + item.quantity, 0);
   }, [state.items]);
 
+  const applyServerCart = useCallback((data: any) => {
+    const serverItems: any[] = Array.isArray(data?.items) ? data.items : [];
+    const items: CartItem[] = serverItems.map((ci) => {
+      const variant = ci?.product_variant;
+      const product = ci?.product;
+      return {
+        id: ci?.id,
+        productId: Number(product?.id ?? variant?.product ?? 0),
+        productName: String(product?.name || "Товар"),
+        productImage: toProxiedUrl(product?.image_url),
+        productVariantId: Number(variant?.id ?? 0),
+        sizeName: String(variant?.size?.name ?? ""),
+        price: Number(variant?.price ?? 0),
+        quantity: Number(ci?.quantity ?? 1),
+        attributes: product
+          ? {
+              binding: product?.binding ?? null,
+              pictureTitle: variant?.picture_title?.name ?? null,
+              fabric: variant?.fabric?.name ?? null,
+              category: product?.category ?? null,
+              subcategory: product?.subcategory ?? null,
+            }
+          : null,
+      };
+    });
+    setState({ items, error: null });
+  }, []);
+
   const reloadFromServer = useCallback(async () => {
     const token = readAccessToken();
     if (!token) {
@@ -82,58 +105,35 @@ export function CartProvider({ children }: { children: React.ReactNode }) {
         headers: { Authorization: `Bearer ${token}` },
       });
       if (!res.ok) return;
-      const data = await res.json();
-      const serverItems: any[] = Array.isArray(data?.items) ? data.items : [];
-      const productIds = serverItems
-        .map((ci) => Number(ci?.product_variant?.product ?? 0))
-        .filter((id) => Number.isFinite(id) && id > 0);
-      const uniqueIds = Array.from(new Set(productIds));
-      const missing = uniqueIds.filter(
-        (id) => !productCacheRef.current.has(id),
-      );
-      if (missing.length > 0) {
-        await Promise.all(
-          missing.map(async (id) => {
-            const productRes = await fetch(`/api/catalog/products/${id}/`);
-            if (!productRes.ok) return;
-            const product = await productRes.json();
-            const images: Array<{ image?: string; is_active?: boolean }> =
-              Array.isArray(product?.images) ? product.images : [];
-            const activeImage = images.find((img) => img?.is_active !== false);
-            productCacheRef.current.set(id, {
-              name: String(product?.name ?? ""),
-              image: toProxiedUrl(activeImage?.image),
-              attributes: {
-                binding: product?.binding ?? null,
-                pictureTitle: product?.picture_title ?? null,
-                fabric: product?.fabric_type?.name ?? null,
-                category: product?.category?.name ?? null,
-                subcategory: product?.subcategory?.name ?? null,
-              },
-            });
-          }),
-        );
-      }
-      const items: CartItem[] = serverItems.map((ci) => {
-        const productId = Number(ci?.product_variant?.product ?? 0);
-        const cached = productCacheRef.current.get(productId);
-        return {
-          id: ci?.id,
-          productId,
-          productName: cached?.name || "Товар",
-          productImage: cached?.image ?? null,
-          productVariantId: Number(ci?.product_variant?.id ?? 0),
-          sizeName: String(ci?.product_variant?.size?.name ?? ""),
-          price: Number(ci?.product_variant?.price ?? 0),
-          quantity: Number(ci?.quantity ?? 1),
-          attributes: cached?.attributes ?? null,
-        };
-      });
-      setState({ items, error: null });
+      applyServerCart(await res.json());
     } finally {
       loadingRef.current = false;
     }
-  }, []);
+  }, [applyServerCart]);
+
+  // Все изменения идут одним запросом в /api/cart/batch/, который
+  // возвращает корзину целиком, поэтому повторная загрузка не нужна.
+  const sendCartOperations = useCallback(
+    async (operations: CartOperation[]) => {
+      const token = readAccessToken();
+      if (!token) {
+        setState((prev) => ({ ...prev, error: "Требуется авторизация" }));
+        return false;
+      }
+      const res = await fetch("/api/cart/batch/", {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          Authorization: `Bearer ${token}`,
+        },
+        body: JSON.stringify({ operations }),
+      });
+      if (!res.ok) return false;
+      applyServerCart(await res.json());
+      return true;
+    },
+    [applyServerCart],
+  );
 
   useEffect(() => {
     reloadFromServer();
@@ -152,31 +152,20 @@ export function CartProvider({ children }: { children: React.ReactNode }) {
         }));
         return;
       }
-      const token = readAccessToken();
-      if (!token) {
-        setState((prev) => ({ ...prev, error: "Требуется авторизация" }));
-        return;
-      }
       try {
-        const res = await fetch("/api/cart/add/", {
-          method: "POST",
-          headers: {
-            "Content-Type": "application/json",
-            Authorization: `Bearer ${token}`,
-          },
-          body: JSON.stringify({
+        const ok = await sendCartOperations([
+          {
+            op: "add",
             product_variant_id: item.productVariantId,
             quantity,
-          }),
-        });
-        if (!res.ok) {
+          },
+        ]);
+        if (!ok) {
           setState((prev) => ({
             ...prev,
             error: "Ошибка при добавлении товара",
           }));
-          return;
         }
-        await reloadFromServer();
       } catch {
         setState((prev) => ({
           ...prev,
@@ -184,35 +173,20 @@ export function CartProvider({ children }: { children: React.ReactNode }) {
         }));
       }
     },
-    [reloadFromServer],
+    [sendCartOperations],
   );
 
   const removeFromCart = useCallback(
     async (productVariantId: number) => {
-      const token = readAccessToken();
-      const item = state.items.find(
-        (i) => i.productVariantId === productVariantId,
-      );
-      if (!token) {
-        setState((prev) => ({ ...prev, error: "Требуется авторизация" }));
-        return;
-      }
-      if (!item?.id) {
-        await reloadFromServer();
-        return;
-      }
       try {
-        const res = await fetch(`/api/cart/remove/${item.id}/`, {
-          method: "DELETE",
-          headers: { Authorization: `Bearer ${token}` },
-        });
-        if (!res.ok) return;
-        await reloadFromServer();
+        await sendCartOperations([
+          { op: "remove", product_variant_id: productVariantId },
+        ]);
       } catch {
         return;
       }
     },
-    [state.items, reloadFromServer],
+    [sendCartOperations],
   );
 
   const updateQuantity = useCallback(
@@ -222,52 +196,28 @@ export function CartProvider({ children }: { children: React.ReactNode }) {
         return;
       }
       const capped = Math.min(99, newQuantity);
-      const token = readAccessToken();
-      const item = state.items.find(
-        (i) => i.productVariantId === productVariantId,
-      );
-      if (!token) {
-        setState((prev) => ({ ...prev, error: "Требуется авторизация" }));
-        return;
-      }
-      if (!item?.id) {
-        await reloadFromServer();
-        return;
-      }
       try {
-        const res = await fetch(`/api/cart/update/${item.id}/`, {
-          method: "PUT",
-          headers: {
-            "Content-Type": "application/json",
-            Authorization: `Bearer ${token}`,
+        await sendCartOperations([
+          {
+            op: "update",
+            product_variant_id: productVariantId,
+            quantity: capped,
           },
-          body: JSON.stringify({ quantity: capped }),
-        });
-        if (!res.ok) return;
-        await reloadFromServer();
+        ]);
       } catch {
         return;
       }
     },
-    [state.items, removeFromCart, reloadFromServer],
+    [removeFromCart, sendCartOperations],
   );
 
   const clearCart = useCallback(async () => {
-    const token = readAccessToken();
-    if (!token) {
-      setState((prev) => ({ ...prev, error: "Требуется авторизация" }));
-      return;
-    }
     try {
-      await fetch("/api/cart/clear/", {
-        method: "DELETE",
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      await reloadFromServer();
+      await sendCartOperations([{ op: "clear" }]);
     } catch {
       return;
     }
-  }, [reloadFromServer]);
+  }, [sendCartOperations]);
 
   const value = useMemo<CartContextValue>(
     () => ({
@@ -16,6 +16,12 @@ export type CartState = {
   error?: string | null;
 };
 
+export type CartOperation =
+  | { op: "add"; product_variant_id: number; quantity: number }
+  | { op: "update"; product_variant_id: number; quantity: number }
+  | { op: "remove"; product_variant_id: number }
+  | { op: "clear" };
+
 export type CartContextValue = {
   state: CartState;
   addToCart: (